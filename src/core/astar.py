@@ -2,13 +2,16 @@
 #Implementazione algoritmo A*
 import heapq #libreria per gestire code a priorità
 import time #misurare il tempo
-from typing import Callable, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 #Callable qualsiasi oggetto chiama bile come una funzione
 
 
 #Tutti i risultati di una ricerca
 class RisultatoRicerca:
 
+    # Attributi fissi: niente __dict__ per ogni ricerca
+    __slots__ = ("percorso", "costo_stimato", "nodi_espansi", "nodi_generati", "tempo_esecuzione", "successo")
+
     def __init__(self):
         self.percorso: Optional[List[str]] = None   #percorso, lista di nodi
         self.costo_stimato: float = float('inf')   #costo totale a seconda della funzione usata
@@ -46,10 +49,10 @@ class RicercaAStar:
         risultato = RisultatoRicerca()
         tempo_inizio = time.time()
 
-        # Validazione input
-        if nodo_iniziale not in self.grafo.ottieni_nodi():
+        # Validazione input (ricerca nel dizionario di adiacenza, senza costruire la lista dei nodi)
+        if nodo_iniziale not in self.grafo.adiacenza:
             return risultato  # Fallimento
-        if nodo_obiettivo not in self.grafo.ottieni_nodi():
+        if nodo_obiettivo not in self.grafo.adiacenza:
             return risultato  # Fallimento
 
         # Caso base: start == goal
@@ -126,6 +129,75 @@ class RicercaAStar:
         return risultato
 
 
+    #Con h=0 la ricerca non guarda l'obiettivo finché non lo estrae dalla frontiera: una sola esplorazione
+    #da nodo_iniziale, fotografata alla prima estrazione di ogni obiettivo, dà per ognuno lo stesso risultato
+    #di pianifica(nodo_iniziale, obiettivo), contatori compresi. Il tempo è quello trascorso fino all'estrazione
+    def pianifica_da_sorgente(self, nodo_iniziale: str, obiettivi: Iterable[str]) -> Dict[str, RisultatoRicerca]:
+        if self.euristica is not euristica_nulla:
+            raise ValueError("pianifica_da_sorgente richiede l'euristica nulla")
+
+        tempo_inizio = time.time()
+        risultati = {obiettivo: RisultatoRicerca() for obiettivo in obiettivi}
+
+        # Validazione input: obiettivi inesistenti falliscono subito come in pianifica
+        if nodo_iniziale not in self.grafo.adiacenza:
+            return risultati
+        mancanti = {obiettivo for obiettivo in risultati if obiettivo in self.grafo.adiacenza}
+
+        # Caso base: start == goal
+        if nodo_iniziale in mancanti:
+            risultato = risultati[nodo_iniziale]
+            risultato.percorso = [nodo_iniziale]
+            risultato.costo_stimato = 0.0
+            risultato.successo = True
+            risultato.tempo_esecuzione = time.time() - tempo_inizio
+            mancanti.discard(nodo_iniziale)
+
+        # Stesse strutture e stesso ordine di estrazione di pianifica
+        frontiera = [(0, 0, nodo_iniziale)]
+        contatore = 1
+        predecessore = {}
+        costo_g = {nodo_iniziale: 0}
+        in_frontiera = {nodo_iniziale}
+        nodi_espansi = 0
+        nodi_generati = 0
+
+        while frontiera and mancanti:
+            _, _, nodo_corrente = heapq.heappop(frontiera)
+            in_frontiera.discard(nodo_corrente)
+            nodi_espansi += 1
+
+            if nodo_corrente in mancanti:
+                risultato = risultati[nodo_corrente]
+                risultato.percorso = self._ricostruisci_percorso(predecessore, nodo_iniziale, nodo_corrente)
+                risultato.costo_stimato = costo_g[nodo_corrente]
+                risultato.nodi_espansi = nodi_espansi
+                risultato.nodi_generati = nodi_generati
+                risultato.successo = True
+                risultato.tempo_esecuzione = time.time() - tempo_inizio
+                mancanti.discard(nodo_corrente)
+
+            for vicino, lunghezza, tipo in self.grafo.ottieni_vicini(nodo_corrente):
+                nodi_generati += 1
+                nuovo_costo_g = costo_g[nodo_corrente] + self.funzione_costo(nodo_corrente, vicino, lunghezza, tipo)
+
+                if vicino not in costo_g or nuovo_costo_g < costo_g[vicino]:
+                    costo_g[vicino] = nuovo_costo_g
+                    if vicino not in in_frontiera:
+                        heapq.heappush(frontiera, (nuovo_costo_g + 0.0, contatore, vicino))
+                        contatore += 1
+                        in_frontiera.add(vicino)
+                    predecessore[vicino] = nodo_corrente
+
+        # Obiettivi non raggiungibili: pianifica avrebbe esplorato tutta la componente
+        for obiettivo in mancanti:
+            risultati[obiettivo].nodi_espansi = nodi_espansi
+            risultati[obiettivo].nodi_generati = nodi_generati
+            risultati[obiettivo].tempo_esecuzione = time.time() - tempo_inizio
+
+        return risultati
+
+
     #Ricostruisce il percorso seguendo i predecessori
     def _ricostruisci_percorso( self,predecessore: dict,start: str,goal: str ) -> List[str]:
         percorso = [goal] #partiamo dal goal
@@ -140,6 +212,58 @@ class RicercaAStar:
 
 
 
+#Pianificatore riutilizzabile tra test: grafo, euristica e costi si fissano una volta
+#e ogni richiesta porta il proprio contesto (orario, affollamento)
+#funzione_costo: costi che non dipendono dal contesto (es. statici)
+#factory: factory(orario, affollamento) -> funzione_costo, per costi che dipendono dal contesto
+class PianificatoreAStar:
+
+    def __init__(self, grafo1, euristica: Callable[[str, str], float],
+                 funzione_costo: Callable[[str, str, float, str], float] = None, factory=None):
+        if (funzione_costo is None) == (factory is None):
+            raise ValueError("Serve una funzione_costo oppure una factory")
+
+        self.factory = factory
+        self._ricerca = RicercaAStar(grafo1, funzione_costo, euristica)
+
+    def pianifica(self, nodo_iniziale: str, nodo_obiettivo: str, contesto: Tuple[int, float] = None) -> RisultatoRicerca:
+        if self.factory is None:
+            return self._ricerca.pianifica(nodo_iniziale, nodo_obiettivo)
+
+        if contesto is None:
+            raise ValueError("Questo pianificatore richiede il contesto (orario, affollamento)")
+
+        # Il tempo di preparazione dei costi del contesto fa parte del tempo di pianificazione
+        tempo_inizio = time.time()
+        self._ricerca.funzione_costo = self.factory(*contesto)
+        tempo_costi = time.time() - tempo_inizio
+
+        risultato = self._ricerca.pianifica(nodo_iniziale, nodo_obiettivo)
+        risultato.tempo_esecuzione += tempo_costi
+        return risultato
+
+    #Vero se la ricerca non dipende dall'obiettivo (h=0): si può usare pianifica_da_sorgente
+    @property
+    def indipendente_dall_obiettivo(self) -> bool:
+        return self._ricerca.euristica is euristica_nulla
+
+    #Tutti gli obiettivi da una partenza con una sola esplorazione (solo con h=0)
+    def pianifica_da_sorgente(self, nodo_iniziale: str, obiettivi: Iterable[str],
+                              contesto: Tuple[int, float] = None) -> Dict[str, RisultatoRicerca]:
+        tempo_costi = 0.0
+        if self.factory is not None:
+            if contesto is None:
+                raise ValueError("Questo pianificatore richiede il contesto (orario, affollamento)")
+            tempo_inizio = time.time()
+            self._ricerca.funzione_costo = self.factory(*contesto)
+            tempo_costi = time.time() - tempo_inizio
+
+        risultati = self._ricerca.pianifica_da_sorgente(nodo_iniziale, obiettivi)
+        for risultato in risultati.values():
+            risultato.tempo_esecuzione += tempo_costi
+        return risultati
+
+
 #h(n)=0 per ogni n: si comporta come Dijkstra/ ricerca a costo uniforme
 #f(n)=g(n)
 def euristica_nulla(nodo_corrente: str, nodo_obiettivo: str) -> float:
@@ -179,7 +303,7 @@ def costo_statico_da_dizionario(costi_medi: dict):
 
     def costo(n1: str, n2: str, lunghezza: float, tipo: str) -> float:
         #ordina sempre nello stesso modo perchè grafo non orientato a-b = b-a
-        chiave = tuple(sorted([n1, n2]))
+        chiave = (n1, n2) if n1 < n2 else (n2, n1)
         #recupera il costo dal dizionario, se per qualche motivo l'arco non è nel dizionario restituisce la lunghezza
         return costi_medi.get(chiave, lunghezza)
 
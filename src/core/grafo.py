@@ -56,6 +56,20 @@ class Grafo:
         return None
 
 
+    #restituisce ogni corridoio una sola volta (nodo1, nodo2, lunghezza, tipo)
+    #la coppia di nodi è ordinata, come le chiavi usate per i costi statici
+    def ottieni_archi(self) -> List[Tuple[str, str, float, str]]:
+        archi = []
+        visti = set()
+        for nodo, vicini in self.adiacenza.items():
+            for vicino, lunghezza, tipo in vicini:
+                chiave = tuple(sorted([nodo, vicino]))
+                if chiave not in visti:
+                    visti.add(chiave)
+                    archi.append((chiave[0], chiave[1], lunghezza, tipo))
+        return archi
+
+
 
 #crea un grafo semplice
 def crea_grafo_semplice() -> Grafo:
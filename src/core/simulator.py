@@ -28,6 +28,16 @@ class SimulatoreCosti:
             random.seed(seed)
             np.random.seed(seed)
 
+    #Parametri che definiscono il simulatore (per manifest e risultati salvati)
+    def parametri(self) -> dict:
+        return {
+            "velocita_media": self.velocita_media,
+            "modello_congestione": self.modello_congestione,
+            "probabilita_evento": self.probabilita_evento,
+            "magnitudo_eventi": list(self.magnitudo_eventi),
+            "rumore_std": self.rumore_std
+        }
+
     def tempo_percorrenza(self, lunghezza, orario, affollamento, tipo_corridoio):
         tempo_base = lunghezza / self.velocita_media
         fattore_orario = self._calcola_fattore_orario(orario)
@@ -48,6 +58,48 @@ class SimulatoreCosti:
         return max(tempo_totale, tempo_base * 0.9)
 
 
+    #Versione vettoriale di tempo_percorrenza: stessi fattori, un campione per elemento degli array
+    #tipi può essere un solo tipo per tutti i campioni o un array di tipi
+    #rng: generatore da usare (np.random.Generator), di default lo stato globale di numpy
+    def tempo_percorrenza_batch(self, lunghezze, orari, affollamenti, tipi, rng=None) -> np.ndarray:
+        if rng is None:
+            rng = np.random
+
+        lunghezze = np.asarray(lunghezze, dtype=float)
+        orari = np.asarray(orari, dtype=int)
+        affollamenti = np.asarray(affollamenti, dtype=float)
+        tipi = np.broadcast_to(np.asarray(tipi), lunghezze.shape)
+        n = lunghezze.shape[0]
+
+        tempo_base = lunghezze / self.velocita_media
+
+        # Fattore orario e di tipo letti da tabelle costruite con le funzioni scalari
+        tabella_orari = np.array([self._calcola_fattore_orario(h) for h in range(24)])
+        fattore_orario = tabella_orari[orari]
+
+        fattore_tipo = np.ones(n)
+        affollamento_effettivo = affollamenti.copy()
+        for tipo in np.unique(tipi):
+            maschera = tipi == tipo
+            fattore_tipo[maschera] = self._calcola_fattore_tipo(tipo)
+            if tipo == "centrale":
+                affollamento_effettivo[maschera] = np.minimum(1.0, affollamenti[maschera] + 0.3)
+            elif tipo == "isolato":
+                affollamento_effettivo[maschera] = np.maximum(0.0, affollamenti[maschera] - 0.3)
+
+        fattore_affollamento = self._calcola_fattore_affollamento_batch(affollamento_effettivo)
+
+        # Eventi imprevisti e rumore, estratti per tutti i campioni in una volta
+        eventi = rng.random(n) < self.probabilita_evento
+        magnitudo = rng.uniform(self.magnitudo_eventi[0], self.magnitudo_eventi[1], n)
+        fattore_eventi = np.where(eventi, magnitudo, 1.0)
+        rumore = rng.normal(1.0, self.rumore_std, n)
+
+        tempo_totale = (tempo_base * fattore_orario * fattore_affollamento
+                        * fattore_tipo * fattore_eventi * rumore)
+        return np.maximum(tempo_totale, tempo_base * 0.9)
+
+
 
     #A questa ora, quanto è più lento/veloce muoversi?
     def _calcola_fattore_orario(self, orario: int) -> float:
@@ -88,6 +140,20 @@ class SimulatoreCosti:
             return 1.0 + affollamento_effettivo  # Default lineare
 
 
+    #Come _calcola_fattore_affollamento ma su un array di affollamenti già aggiustati per tipo
+    def _calcola_fattore_affollamento_batch(self, affollamento_effettivo: np.ndarray) -> np.ndarray:
+        if self.modello_congestione == "quadratico":
+            return 1.0 + (affollamento_effettivo ** 2) * 2.5
+
+        elif self.modello_congestione == "soglia":
+            soglia = 0.6
+            eccesso = (affollamento_effettivo - soglia) / (1 - soglia)
+            return np.where(affollamento_effettivo < soglia, 1.0, 1.0 + eccesso * 2.0)
+
+        else:  # lineare e default
+            return 1.0 + affollamento_effettivo
+
+
 
     #Modifica l'affollamento tenendo conto del tipo di corridoio
     def _aggiusta_affollamento_per_tipo( self, affollamento_base: float,tipo: str) -> float:
@@ -0,0 +1,325 @@
+#Simulazione ad eventi discreti di molti trasportatori che si muovono contemporaneamente nell'ospedale
+#Ogni agente pianifica il percorso con A*, mentre lo percorre occupa i corridoi
+#e l'occupazione aumenta l'affollamento visto dagli agenti pianificati dopo di lui
+import heapq
+import random
+import time
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from src.core.astar import RicercaAStar, euristica_nulla, costo_statico_da_dizionario
+from src.ml.modelli import stima_costi_archi
+
+
+#Un trasportatore con la sua richiesta e lo stato del viaggio
+@dataclass
+class Agente:
+    identificativo: int
+    origine: str
+    destinazione: str
+    tempo_partenza: float  # secondi dall'inizio della simulazione
+    percorso: List[str] = field(default_factory=list)
+    posizione: int = 0  # indice dell'arco che sta percorrendo
+    tempo_arrivo: Optional[float] = None
+    latenza_pianificazione: float = 0.0  # secondi reali spesi da A*
+
+
+#Riassunto di una simulazione
+@dataclass
+class RisultatiSimulazione:
+    politica: str
+    agenti_generati: int
+    agenti_completati: int
+    agenti_falliti: int  # nessun percorso trovato
+
+    durata_simulata_ore: float  # fino all'arrivo dell'ultimo agente
+    throughput_orario: float  # agenti arrivati per ora simulata
+
+    # Tempi di viaggio (simulati)
+    tempo_viaggio_medio: float
+    tempo_viaggio_std: float
+    tempo_viaggio_p95: float
+
+    # Latenza del pianificatore (reale)
+    latenza_media: float
+    latenza_p50: float
+    latenza_p95: float
+    latenza_max: float
+
+    occupazione_massima: int  # massimo numero di agenti contemporanei in un corridoio
+    eventi_processati: int
+    tempo_esecuzione: float  # secondi reali per l'intera simulazione
+
+    def __str__(self) -> str:
+        return (
+            f"=== Politica {self.politica} ===\n"
+            f"Agenti: {self.agenti_completati}/{self.agenti_generati} arrivati ({self.agenti_falliti} falliti)\n"
+            f"Throughput: {self.throughput_orario:.1f} agenti/ora su {self.durata_simulata_ore:.2f}h simulate\n"
+            f"Tempo di viaggio: {self.tempo_viaggio_medio:.1f} ± {self.tempo_viaggio_std:.1f}s "
+            f"(p95 {self.tempo_viaggio_p95:.1f}s)\n"
+            f"Latenza pianificazione: {self.latenza_media * 1000:.3f}ms media, "
+            f"p50 {self.latenza_p50 * 1000:.3f}ms, p95 {self.latenza_p95 * 1000:.3f}ms, "
+            f"max {self.latenza_max * 1000:.3f}ms\n"
+            f"Occupazione massima corridoio: {self.occupazione_massima}\n"
+            f"Eventi: {self.eventi_processati} in {self.tempo_esecuzione:.2f}s reali"
+        )
+
+
+#Politica: dato l'orario e l'affollamento attuale di ogni arco restituisce la funzione costo per A*
+#(orario, affollamento_arco(chiave)) -> funzione_costo(n1, n2, lunghezza, tipo)
+Politica = Callable[[int, Callable[[Tuple[str, str]], float]], Callable[[str, str, float, str], float]]
+
+
+#Politica con costi statici: ignora l'occupazione dei corridoi
+def politica_statica(costi_statici: dict) -> Politica:
+    funzione = costo_statico_da_dizionario(costi_statici)
+
+    def politica(orario, affollamento_arco):
+        return funzione
+
+    return politica
+
+
+#Politica costruita da una factory (orario, affollamento) -> funzione_costo
+#come quella di crea_funzione_costo_ml_dinamica, ma l'affollamento è quello del singolo arco
+#Una stima per arco visitato: per i modelli ML conviene politica_da_modello
+def politica_da_factory(factory) -> Politica:
+
+    def politica(orario, affollamento_arco):
+
+        def funzione_costo(n1: str, n2: str, lunghezza: float, tipo: str) -> float:
+            chiave = (n1, n2) if n1 < n2 else (n2, n1)
+            return factory(orario, affollamento_arco(chiave))(n1, n2, lunghezza, tipo)
+
+        return funzione_costo
+
+    return politica
+
+
+#Politica ML con i costi di tutti gli archi calcolati una volta per pianificazione:
+#l'affollamento di ogni corridoio entra in una sola predici_batch e A* legge i costi da un dizionario
+def politica_da_modello(modello, grafo) -> Politica:
+    archi = grafo.ottieni_archi()
+    chiavi = [(n1, n2) for n1, n2, _, _ in archi]
+    lunghezze = np.array([lunghezza for _, _, lunghezza, _ in archi], dtype=float)
+    tipi = np.array([tipo for _, _, _, tipo in archi])
+
+    def politica(orario, affollamento_arco):
+        affollamenti = np.array([affollamento_arco(chiave) for chiave in chiavi], dtype=float)
+        costi = dict(zip(chiavi, stima_costi_archi(modello, lunghezze, tipi, orario, affollamenti).tolist()))
+
+        def funzione_costo(n1: str, n2: str, lunghezza: float, tipo: str) -> float:
+            return costi[(n1, n2) if n1 < n2 else (n2, n1)]
+
+        return funzione_costo
+
+    return politica
+
+
+class SimulatoreTrasporti:
+
+    def __init__(
+            self,
+            grafo,
+            simulatore,
+            politica: Politica,
+            nome_politica: str = "politica",
+            capacita_corridoio: float = 10.0,  # agenti che portano un corridoio al 100% di affollamento aggiuntivo
+            affollamento_base: Union[float, Callable[[int], float]] = 0.3,  # valore fisso o funzione dell'orario
+            euristica=euristica_nulla,
+            ora_inizio: int = 8,
+            seed: int = None
+    ):
+        self.grafo = grafo
+        self.simulatore = simulatore  # ground truth dei tempi di attraversamento
+        self.politica = politica
+        self.nome_politica = nome_politica
+        self.capacita_corridoio = capacita_corridoio
+        self.affollamento_base = affollamento_base
+        self.euristica = euristica
+        self.ora_inizio = ora_inizio
+
+        # Generatore separato per la domanda: politiche diverse vedono gli stessi agenti
+        self._rng = random.Random(seed)
+        self.seed = seed
+
+        # Informazioni sugli archi (lunghezza, tipo) per chiave ordinata
+        self._archi = {(n1, n2): (lunghezza, tipo) for n1, n2, lunghezza, tipo in grafo.ottieni_archi()}
+
+        # Stato della simulazione
+        self.occupazione: Dict[Tuple[str, str], int] = {}
+        self.agenti: List[Agente] = []
+        self._eventi = []
+        self._contatore = 0
+        self._occupazione_massima = 0
+
+    #Orario (0-23) corrispondente a un istante della simulazione
+    def _orario(self, tempo: float) -> int:
+        return int(self.ora_inizio + tempo // 3600) % 24
+
+    def _affollamento_di_base(self, orario: int) -> float:
+        if callable(self.affollamento_base):
+            return self.affollamento_base(orario)
+        return self.affollamento_base
+
+    #Affollamento di un corridoio: quello di base più il contributo degli agenti che lo occupano
+    def affollamento_arco(self, chiave: Tuple[str, str], orario: int) -> float:
+        aggiuntivo = self.occupazione.get(chiave, 0) / self.capacita_corridoio
+        return min(1.0, self._affollamento_di_base(orario) + aggiuntivo)
+
+    #Inserisce un evento nella coda (tempo, contatore, tipo, agente)
+    def _programma(self, tempo: float, tipo: str, agente: Optional[Agente]) -> None:
+        heapq.heappush(self._eventi, (tempo, self._contatore, tipo, agente))
+        self._contatore += 1
+
+    def _nuova_richiesta(self, tempo: float, nodi: List[str], coppie) -> Agente:
+        if coppie:
+            origine, destinazione = self._rng.choice(coppie)
+        else:
+            origine, destinazione = self._rng.sample(nodi, 2)
+        agente = Agente(len(self.agenti), origine, destinazione, tempo)
+        self.agenti.append(agente)
+        return agente
+
+    #L'agente entra nel prossimo arco del suo percorso e ne prenota la fine
+    def _entra_arco(self, agente: Agente, tempo: float) -> None:
+        n1 = agente.percorso[agente.posizione]
+        n2 = agente.percorso[agente.posizione + 1]
+        chiave = (n1, n2) if n1 < n2 else (n2, n1)
+        lunghezza, tipo = self._archi[chiave]
+
+        orario = self._orario(tempo)
+        affollamento = self.affollamento_arco(chiave, orario)  # prima di entrare
+        durata = self.simulatore.tempo_percorrenza(lunghezza, orario, affollamento, tipo)
+
+        self.occupazione[chiave] = self.occupazione.get(chiave, 0) + 1
+        self._occupazione_massima = max(self._occupazione_massima, self.occupazione[chiave])
+        self._programma(tempo + durata, "fine_arco", agente)
+
+    def _pianifica(self, agente: Agente, tempo: float) -> bool:
+        orario = self._orario(tempo)
+
+        def affollamento_arco(chiave):
+            return self.affollamento_arco(chiave, orario)
+
+        inizio = time.perf_counter()
+        funzione_costo = self.politica(orario, affollamento_arco)
+        risultato = RicercaAStar(self.grafo, funzione_costo, self.euristica).pianifica(
+            agente.origine, agente.destinazione
+        )
+        agente.latenza_pianificazione = time.perf_counter() - inizio
+
+        if not risultato.successo:
+            return False
+        agente.percorso = risultato.percorso
+        return True
+
+    #Esegue la simulazione
+    #agenti_per_ora: intensità degli arrivi (processo di Poisson)
+    #durata_ore: finestra in cui vengono generate le richieste, gli agenti già partiti arrivano comunque
+    #coppie: lista opzionale di (origine, destinazione), altrimenti coppie casuali di nodi
+    def esegui(self, agenti_per_ora: float = 1000, durata_ore: float = 1.0, coppie: List[Tuple[str, str]] = None) -> RisultatiSimulazione:
+
+        inizio_reale = time.perf_counter()
+
+        # Reset stato
+        self._rng.seed(self.seed)
+        self.occupazione = {}
+        self.agenti = []
+        self._eventi = []
+        self._contatore = 0
+        self._occupazione_massima = 0
+
+        nodi = self.grafo.ottieni_nodi()
+        fine_richieste = durata_ore * 3600
+        intervallo_medio = 3600 / agenti_per_ora
+
+        eventi_processati = 0
+        falliti = 0
+        tempo = 0.0
+
+        # Primo arrivo, i successivi vengono generati uno alla volta
+        self._programma(self._rng.expovariate(1 / intervallo_medio), "arrivo", None)
+
+        while self._eventi:
+            tempo, _, tipo, agente = heapq.heappop(self._eventi)
+            eventi_processati += 1
+
+            if tipo == "arrivo":
+                if tempo > fine_richieste:
+                    continue
+                # Programma la richiesta successiva
+                self._programma(tempo + self._rng.expovariate(1 / intervallo_medio), "arrivo", None)
+
+                agente = self._nuova_richiesta(tempo, nodi, coppie)
+                if not self._pianifica(agente, tempo):
+                    falliti += 1
+                elif len(agente.percorso) == 1:
+                    agente.tempo_arrivo = tempo
+                else:
+                    self._entra_arco(agente, tempo)
+
+            elif tipo == "fine_arco":
+                # Libera il corridoio appena percorso
+                n1 = agente.percorso[agente.posizione]
+                n2 = agente.percorso[agente.posizione + 1]
+                chiave = (n1, n2) if n1 < n2 else (n2, n1)
+                self.occupazione[chiave] -= 1
+
+                agente.posizione += 1
+                if agente.posizione == len(agente.percorso) - 1:
+                    agente.tempo_arrivo = tempo
+                else:
+                    self._entra_arco(agente, tempo)
+
+        return self._riassumi(falliti, eventi_processati, time.perf_counter() - inizio_reale)
+
+    def _riassumi(self, falliti: int, eventi_processati: int, tempo_esecuzione: float) -> RisultatiSimulazione:
+        arrivati = [a for a in self.agenti if a.tempo_arrivo is not None]
+        tempi_viaggio = np.array([a.tempo_arrivo - a.tempo_partenza for a in arrivati])
+        latenze = np.array([a.latenza_pianificazione for a in self.agenti])
+
+        durata_ore = max((a.tempo_arrivo for a in arrivati), default=0.0) / 3600
+
+        # Con liste vuote tutte le statistiche valgono 0
+        def statistica(valori, funzione):
+            return float(funzione(valori)) if len(valori) else 0.0
+
+        return RisultatiSimulazione(
+            politica=self.nome_politica,
+            agenti_generati=len(self.agenti),
+            agenti_completati=len(arrivati),
+            agenti_falliti=falliti,
+            durata_simulata_ore=durata_ore,
+            throughput_orario=len(arrivati) / durata_ore if durata_ore > 0 else 0.0,
+            tempo_viaggio_medio=statistica(tempi_viaggio, np.mean),
+            tempo_viaggio_std=statistica(tempi_viaggio, np.std),
+            tempo_viaggio_p95=statistica(tempi_viaggio, lambda v: np.percentile(v, 95)),
+            latenza_media=statistica(latenze, np.mean),
+            latenza_p50=statistica(latenze, np.median),
+            latenza_p95=statistica(latenze, lambda v: np.percentile(v, 95)),
+            latenza_max=statistica(latenze, np.max),
+            occupazione_massima=self._occupazione_massima,
+            eventi_processati=eventi_processati,
+            tempo_esecuzione=tempo_esecuzione
+        )
+
+
+#Esegue la stessa domanda con politiche diverse
+#politiche: dizionario nome -> politica
+def confronta_politiche(grafo, simulatore, politiche: Dict[str, Politica], agenti_per_ora: float = 1000,
+                        durata_ore: float = 1.0, coppie=None, seed: int = 42, **parametri) -> Dict[str, RisultatiSimulazione]:
+    risultati = {}
+
+    for nome, politica in politiche.items():
+        # Stessi eventi casuali del simulatore per ogni politica
+        random.seed(seed)
+        np.random.seed(seed)
+
+        sim_agenti = SimulatoreTrasporti(grafo, simulatore, politica, nome_politica=nome, seed=seed, **parametri)
+        risultati[nome] = sim_agenti.esegui(agenti_per_ora, durata_ore, coppie)
+        print(risultati[nome])
+        print()
+
+    return risultati
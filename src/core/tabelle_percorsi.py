@@ -0,0 +1,128 @@
+#Tabelle precalcolate dei percorsi minimi tra tutte le coppie di nodi
+#Una tabella per ogni fascia oraria e livello di affollamento: distanze e nodo successivo
+#Costruite offline (Floyd-Warshall vettoriale con NumPy), rispondono in O(lunghezza del percorso)
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional
+
+
+#Floyd-Warshall su una matrice di costi (inf dove non c'è arco)
+#Restituisce distanze e matrice del nodo successivo (-1 se la destinazione non è raggiungibile)
+def floyd_warshall(pesi: np.ndarray):
+    n = pesi.shape[0]
+    distanze = pesi.astype(float).copy()
+    np.fill_diagonal(distanze, 0.0)
+
+    successivo = np.where(np.isfinite(distanze), np.arange(n)[None, :], -1)
+
+    # Per ogni nodo intermedio k aggiorna in blocco tutte le coppie (i, j)
+    for k in range(n):
+        via_k = distanze[:, k, None] + distanze[None, k, :]
+        migliore = via_k < distanze
+        distanze = np.where(migliore, via_k, distanze)
+        successivo = np.where(migliore, successivo[:, k, None], successivo)
+
+    return distanze, successivo
+
+
+class TabellePercorsiMinimi:
+
+    #costi_archi: (orario, affollamento) -> costo di ogni arco, nell'ordine di grafo.ottieni_archi(),
+    #es. TensoreCosti.costi_contesto o stima_costi_archi su un modello: una chiamata vettoriale per contesto
+    #fasce_orarie: gruppi di ore che condividono una tabella, di default una fascia per ora
+    #livelli_affollamento: livelli per cui costruire una tabella, la query usa il più vicino
+    def __init__(self, grafo, costi_archi: Callable[[int, float], np.ndarray],
+                 fasce_orarie: List[List[int]] = None, livelli_affollamento=None):
+        self.grafo = grafo
+        self.costi_archi = costi_archi
+        self.fasce_orarie = fasce_orarie if fasce_orarie is not None else [[ora] for ora in range(24)]
+        self.livelli = np.asarray(livelli_affollamento if livelli_affollamento is not None else np.linspace(0.0, 1.0, 11))
+
+        self.nodi = grafo.ottieni_nodi()
+        self.indice = {nodo: i for i, nodo in enumerate(self.nodi)}
+
+        # Estremi degli archi come indici di nodo, nell'ordine di ottieni_archi
+        archi = grafo.ottieni_archi()
+        self._da = np.array([self.indice[n1] for n1, _, _, _ in archi], dtype=np.intp)
+        self._a = np.array([self.indice[n2] for _, n2, _, _ in archi], dtype=np.intp)
+
+        # Da orario a fascia: ogni ora 0-23 deve stare in una e una sola fascia
+        self._fascia_di_ora = {}
+        for f, ore in enumerate(self.fasce_orarie):
+            for ora in ore:
+                if ora not in range(24):
+                    raise ValueError(f"Ora {ora} non valida nella fascia {f}: le ore vanno da 0 a 23")
+                if ora in self._fascia_di_ora:
+                    raise ValueError(f"Ora {ora} presente sia nella fascia {self._fascia_di_ora[ora]} sia nella fascia {f}")
+                self._fascia_di_ora[ora] = f
+        mancanti = sorted(set(range(24)) - set(self._fascia_di_ora))
+        if mancanti:
+            raise ValueError(f"Ore non coperte da nessuna fascia: {mancanti}")
+
+        # Tipo più piccolo che contiene tutti gli indici dei nodi (-1 = irraggiungibile)
+        self._tipo_indici = np.int16 if len(self.nodi) < np.iinfo(np.int16).max else np.int32
+
+        self.distanze: np.ndarray = None  # float32 (fasce, livelli, nodi, nodi)
+        self.successivo: np.ndarray = None  # int16/int32 (fasce, livelli, nodi, nodi)
+
+    #Matrice dei costi degli archi per un contesto, da un solo vettore di costi (archi non orientati)
+    def _matrice_costi(self, orario: int, affollamento: float) -> np.ndarray:
+        n = len(self.nodi)
+        pesi = np.full((n, n), np.inf)
+        costi = np.asarray(self.costi_archi(orario, affollamento), dtype=float)
+
+        np.minimum.at(pesi, (self._da, self._a), costi)
+        np.minimum.at(pesi, (self._a, self._da), costi)
+        return pesi
+
+    #Costruisce tutte le tabelle, Floyd-Warshall eseguito in parallelo sui processi
+    #L'ora rappresentativa di una fascia è quella centrale
+    def costruisci(self, num_processi: int = None) -> None:
+
+        # costi_archi può essere una closure non serializzabile: le matrici si calcolano qui
+        matrici = []
+        for ore in self.fasce_orarie:
+            orario = ore[len(ore) // 2]
+            for livello in self.livelli:
+                matrici.append(self._matrice_costi(orario, float(livello)))
+
+        if num_processi == 1:
+            risultati = [floyd_warshall(m) for m in matrici]
+        else:
+            with ProcessPoolExecutor(max_workers=num_processi) as esecutore:
+                risultati = list(esecutore.map(floyd_warshall, matrici))
+
+        forma = (len(self.fasce_orarie), len(self.livelli), len(self.nodi), len(self.nodi))
+        self.distanze = np.stack([d for d, _ in risultati]).astype(np.float32).reshape(forma)
+        self.successivo = np.stack([s for _, s in risultati]).astype(self._tipo_indici).reshape(forma)
+
+    #Indici della tabella da usare per un contesto
+    def _tabella(self, orario: int, affollamento: float):
+        fascia = self._fascia_di_ora[orario]
+        livello = int(np.abs(self.livelli - affollamento).argmin())
+        return fascia, livello
+
+    #Costo del percorso minimo (inf se non esiste)
+    def distanza(self, start: str, goal: str, orario: int, affollamento: float) -> float:
+        fascia, livello = self._tabella(orario, affollamento)
+        return float(self.distanze[fascia, livello, self.indice[start], self.indice[goal]])
+
+    #Percorso minimo ricostruito seguendo la tabella dei successivi
+    def percorso(self, start: str, goal: str, orario: int, affollamento: float) -> Optional[List[str]]:
+        fascia, livello = self._tabella(orario, affollamento)
+        successivo = self.successivo[fascia, livello]
+
+        i = self.indice[start]
+        j = self.indice[goal]
+        if successivo[i, j] < 0:
+            return None
+
+        percorso = [start]
+        while i != j:
+            i = successivo[i, j]
+            percorso.append(self.nodi[i])
+        return percorso
+
+    #Memoria occupata dalle tabelle in byte
+    def memoria(self) -> int:
+        return self.distanze.nbytes + self.successivo.nbytes
@@ -0,0 +1,240 @@
+#Aggregazione in streaming delle metriche di pianificazione, con memoria costante
+#Ogni test aggiorna medie e varianze (Welford), minimi e massimi e degli sketch di quantili;
+#aggregatori di processi diversi si uniscono e danno gli stessi campi di MetricheAggregate
+import math
+import numpy as np
+from typing import Dict
+
+from src.evaluation.metriche import MetricheAggregate, MetrichePercorso
+
+
+#Media, varianza (ddof=0 come np.std), minimo e massimo in un solo passaggio
+class StatisticaOnline:
+
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0  # somma dei quadrati degli scarti dalla media
+        self.minimo = math.inf
+        self.massimo = -math.inf
+
+    def aggiorna(self, x: float) -> None:
+        self.n += 1
+        delta = x - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (x - self.media)
+        self.minimo = min(self.minimo, x)
+        self.massimo = max(self.massimo, x)
+
+    #Formula di Chan per unire due insiemi di osservazioni
+    def unisci(self, altra: "StatisticaOnline") -> "StatisticaOnline":
+        if altra.n == 0:
+            return self
+        n = self.n + altra.n
+        delta = altra.media - self.media
+        self.m2 += altra.m2 + delta * delta * self.n * altra.n / n
+        self.media += delta * altra.n / n
+        self.n = n
+        self.minimo = min(self.minimo, altra.minimo)
+        self.massimo = max(self.massimo, altra.massimo)
+        return self
+
+    #Aggiornamento con un blocco di valori in una sola operazione
+    def aggiorna_batch(self, valori: np.ndarray) -> None:
+        valori = np.asarray(valori, dtype=np.float64)
+        if len(valori) == 0:
+            return
+        blocco = StatisticaOnline()
+        blocco.n = len(valori)
+        blocco.media = float(valori.mean())
+        blocco.m2 = float(((valori - blocco.media) ** 2).sum())
+        blocco.minimo = float(valori.min())
+        blocco.massimo = float(valori.max())
+        self.unisci(blocco)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / self.n) if self.n else 0.0
+
+
+#Sketch di quantili con errore relativo garantito (stile DDSketch)
+#Ogni valore finisce in un secchio logaritmico: il quantile stimato dista al massimo
+#accuratezza_relativa dal valore vero. Gestisce valori negativi (gap sotto l'ottimo) e zeri
+#Due sketch con la stessa accuratezza si uniscono sommando i conteggi
+class SketchQuantili:
+
+    def __init__(self, accuratezza_relativa: float = 0.01, valore_minimo: float = 1e-9):
+        self.accuratezza_relativa = accuratezza_relativa
+        self.gamma = (1 + accuratezza_relativa) / (1 - accuratezza_relativa)
+        self._log_gamma = math.log(self.gamma)
+        self.valore_minimo = valore_minimo  # sotto questo modulo il valore conta come zero
+
+        self.positivi: Dict[int, int] = {}
+        self.negativi: Dict[int, int] = {}  # indicizzati sul modulo
+        self.zeri = 0
+        self.n = 0
+
+    def _indice(self, modulo: float) -> int:
+        return math.ceil(math.log(modulo) / self._log_gamma)
+
+    def _valore(self, indice: int) -> float:
+        return 2 * self.gamma ** indice / (self.gamma + 1)
+
+    def aggiorna(self, x: float) -> None:
+        self.n += 1
+        if abs(x) < self.valore_minimo:
+            self.zeri += 1
+        elif x > 0:
+            k = self._indice(x)
+            self.positivi[k] = self.positivi.get(k, 0) + 1
+        else:
+            k = self._indice(-x)
+            self.negativi[k] = self.negativi.get(k, 0) + 1
+
+    def aggiorna_batch(self, valori: np.ndarray) -> None:
+        valori = np.asarray(valori, dtype=np.float64)
+        moduli = np.abs(valori)
+        zeri = moduli < self.valore_minimo
+        self.zeri += int(zeri.sum())
+        self.n += len(valori)
+
+        for segno, secchi in ((1, self.positivi), (-1, self.negativi)):
+            selezionati = moduli[~zeri & (np.sign(valori) == segno)]
+            if len(selezionati) == 0:
+                continue
+            indici, conteggi = np.unique(np.ceil(np.log(selezionati) / self._log_gamma).astype(np.int64),
+                                         return_counts=True)
+            for k, c in zip(indici.tolist(), conteggi.tolist()):
+                secchi[k] = secchi.get(k, 0) + c
+
+    def unisci(self, altro: "SketchQuantili") -> "SketchQuantili":
+        if altro.gamma != self.gamma:
+            raise ValueError("Sketch con accuratezza diversa")
+        for secchi, secchi_altro in ((self.positivi, altro.positivi), (self.negativi, altro.negativi)):
+            for k, c in secchi_altro.items():
+                secchi[k] = secchi.get(k, 0) + c
+        self.zeri += altro.zeri
+        self.n += altro.n
+        return self
+
+    #q in [0, 1], stessa convenzione di rango di np.quantile(method="lower")
+    def quantile(self, q: float) -> float:
+        if self.n == 0:
+            return math.nan
+        rango = int(q * (self.n - 1))
+
+        # Ordine crescente: negativi dal modulo più grande, zeri, positivi dal più piccolo
+        cumulato = 0
+        for k in sorted(self.negativi, reverse=True):
+            cumulato += self.negativi[k]
+            if cumulato > rango:
+                return -self._valore(k)
+        cumulato += self.zeri
+        if cumulato > rango:
+            return 0.0
+        for k in sorted(self.positivi):
+            cumulato += self.positivi[k]
+            if cumulato > rango:
+                return self._valore(k)
+        return self._valore(max(self.positivi))
+
+    #Numero di secchi occupati, indipendente dal numero di test
+    def dimensione(self) -> int:
+        return len(self.positivi) + len(self.negativi) + 1
+
+
+#Aggregatore di una configurazione: stessi campi di CalcolatoreMetriche.aggrega_metriche
+#più i quantili di gap, costo reale e tempo di pianificazione
+class AggregatoreOnline:
+
+    METRICHE = ("costo_reale", "gap_ottimalita", "nodi_espansi", "tempo_esecuzione", "errore_stima")
+    METRICHE_QUANTILI = ("costo_reale", "gap_ottimalita", "tempo_esecuzione")
+
+    def __init__(self, configurazione: str, accuratezza_relativa: float = 0.01):
+        self.configurazione = configurazione
+        self.statistiche = {nome: StatisticaOnline() for nome in self.METRICHE}
+        self.sketch = {nome: SketchQuantili(accuratezza_relativa) for nome in self.METRICHE_QUANTILI}
+        self.num_ottimi = 0  # gap < 1%, come aggrega_metriche
+
+    @property
+    def num_test(self) -> int:
+        return self.statistiche["costo_reale"].n
+
+    def aggiorna(self, costo_reale: float, gap_ottimalita: float, nodi_espansi: int,
+                 tempo_esecuzione: float, errore_stima: float) -> None:
+        valori = {
+            "costo_reale": costo_reale,
+            "gap_ottimalita": gap_ottimalita,
+            "nodi_espansi": nodi_espansi,
+            "tempo_esecuzione": tempo_esecuzione,
+            "errore_stima": errore_stima
+        }
+        for nome, valore in valori.items():
+            self.statistiche[nome].aggiorna(valore)
+        for nome in self.METRICHE_QUANTILI:
+            self.sketch[nome].aggiorna(valori[nome])
+        if gap_ottimalita < 0.01:
+            self.num_ottimi += 1
+
+    def aggiorna_metriche(self, metriche: MetrichePercorso) -> None:
+        self.aggiorna(metriche.costo_reale, metriche.gap_ottimalita, metriche.nodi_espansi,
+                      metriche.tempo_esecuzione, metriche.errore_stima)
+
+    #Aggiunge tutte le righe di una configurazione di una TabellaMetriche
+    def aggiorna_da_tabella(self, tabella) -> None:
+        for nome in self.METRICHE:
+            valori = tabella.colonna(nome, self.configurazione)
+            self.statistiche[nome].aggiorna_batch(valori)
+            if nome in self.sketch:
+                self.sketch[nome].aggiorna_batch(valori)
+        self.num_ottimi += int(np.count_nonzero(tabella.colonna("gap_ottimalita", self.configurazione) < 0.01))
+
+    #Unisce l'aggregatore di un altro processo (stessa configurazione)
+    def unisci(self, altro: "AggregatoreOnline") -> "AggregatoreOnline":
+        if altro.configurazione != self.configurazione:
+            raise ValueError("Aggregatori di configurazioni diverse")
+        for nome in self.METRICHE:
+            self.statistiche[nome].unisci(altro.statistiche[nome])
+        for nome in self.METRICHE_QUANTILI:
+            self.sketch[nome].unisci(altro.sketch[nome])
+        self.num_ottimi += altro.num_ottimi
+        return self
+
+    def quantile(self, metrica: str, q: float) -> float:
+        return self.sketch[metrica].quantile(q)
+
+    #Mediana, 90° e 99° percentile delle metriche con sketch
+    def quantili(self) -> Dict[str, Dict[str, float]]:
+        return {
+            nome: {f"p{int(q * 100)}": sketch.quantile(q) for q in (0.5, 0.9, 0.99)}
+            for nome, sketch in self.sketch.items()
+        }
+
+    def risultato(self) -> MetricheAggregate:
+        if self.num_test == 0:
+            raise ValueError("Nessuna metrica aggregata")
+
+        costo = self.statistiche["costo_reale"]
+        gap = self.statistiche["gap_ottimalita"]
+        nodi = self.statistiche["nodi_espansi"]
+        tempo = self.statistiche["tempo_esecuzione"]
+        errore = self.statistiche["errore_stima"]
+
+        return MetricheAggregate(
+            configurazione=self.configurazione,
+            num_test=self.num_test,
+            costo_reale_medio=costo.media,
+            costo_reale_std=costo.std,
+            costo_reale_min=costo.minimo,
+            costo_reale_max=costo.massimo,
+            gap_medio=gap.media,
+            gap_std=gap.std,
+            gap_max=gap.massimo,
+            percentuale_ottimi=self.num_ottimi / self.num_test,
+            nodi_espansi_medio=nodi.media,
+            nodi_espansi_std=nodi.std,
+            tempo_medio=tempo.media,
+            tempo_std=tempo.std,
+            errore_stima_medio=errore.media,
+            errore_stima_std=errore.std
+        )
@@ -0,0 +1,179 @@
+#Archivio colonnare dei risultati per singolo test
+#Ogni esecuzione aggiunge una parte (Parquet se pyarrow è installato, altrimenti NPZ compresso)
+#con dentro i propri dizionari (configurazioni, nodi, percorsi); manifest.json descrive l'archivio
+#e parti.jsonl elenca le parti, una riga aggiunta in coda per parte
+#La lettura carica solo le colonne richieste, una parte alla volta
+import os
+import json
+import uuid
+import numpy as np
+from datetime import datetime
+from typing import Dict, Iterator, List
+
+from src.evaluation.metriche import TabellaMetriche
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+VERSIONE_ARCHIVIO = 4
+
+# Colonne codificate della tabella -> colonna testuale ricostruita con il dizionario della parte
+COLONNE_CODIFICATE = {
+    "configurazione": "configurazione",
+    "partenza": "partenza",
+    "arrivo": "arrivo",
+    "id_percorso": "percorso"
+}
+# Colonne numeriche della tabella (id_percorso resta leggibile come codice), più le colonne testuali
+COLONNE_NUMERICHE = [nome for nome in TabellaMetriche.COLONNE if nome not in COLONNE_CODIFICATE or nome == "id_percorso"]
+COLONNE_TESTUALI = ["configurazione", "partenza", "arrivo", "percorso", "esperimento", "esecuzione"]
+
+
+#Dizionari della tabella, nell'ordine dei codici
+def _dizionari(tabella: TabellaMetriche) -> Dict[str, np.ndarray]:
+    return {
+        "configurazione": np.array(tabella.configurazioni, dtype=str),
+        "partenza": np.array(tabella.nodi, dtype=str),
+        "arrivo": np.array(tabella.nodi, dtype=str),
+        "percorso": np.array([" -> ".join(p) for p in tabella.percorsi], dtype=str)
+    }
+
+
+class ArchivioTest:
+
+    #formato: "parquet" o "npz"; se la cartella contiene già un archivio si usa il suo formato
+    def __init__(self, cartella: str, formato: str = None):
+        self.cartella = cartella
+        self._manifest_path = os.path.join(cartella, "manifest.json")
+        self._parti_path = os.path.join(cartella, "parti.jsonl")
+
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                self.manifest = json.load(f)
+            if self.manifest.get("versione") != VERSIONE_ARCHIVIO:
+                raise ValueError(f"Archivio in versione {self.manifest.get('versione')}, "
+                                 f"attesa {VERSIONE_ARCHIVIO}: usare un'altra cartella")
+        else:
+            formato = formato or ("parquet" if pq is not None else "npz")
+            self.manifest = {"versione": VERSIONE_ARCHIVIO, "formato": formato}
+
+        if self.formato == "parquet" and pq is None:
+            raise ImportError("pyarrow è necessario per gli archivi Parquet")
+
+    @property
+    def formato(self) -> str:
+        return self.manifest["formato"]
+
+    @property
+    def num_righe(self) -> int:
+        return sum(parte["righe"] for parte in self.parti())
+
+    #Riletto a ogni chiamata: vede anche le parti aggiunte da altri processi
+    def parti(self) -> List[dict]:
+        if not os.path.exists(self._parti_path):
+            return []
+        with open(self._parti_path) as f:
+            return [json.loads(riga) for riga in f if riga.strip()]
+
+    #Il manifest si scrive una volta sola, alla creazione; con più processi vince il primo
+    def _crea_manifest(self) -> None:
+        os.makedirs(self.cartella, exist_ok=True)
+        try:
+            descrittore = os.open(self._manifest_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+        except FileExistsError:
+            with open(self._manifest_path) as f:
+                self.manifest = json.load(f)
+            return
+        with os.fdopen(descrittore, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+
+    #Aggiunge tutte le righe di una TabellaMetriche come nuova parte
+    #La parte diventa visibile solo dopo essere stata scritta per intero, con una riga in coda a parti.jsonl
+    def aggiungi(self, tabella: TabellaMetriche, esperimento: str, esecuzione: str) -> str:
+        self._crea_manifest()
+
+        # Nome unico: più processi possono aggiungere parti alla stessa cartella
+        nome = f"parte_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:12]}.{self.formato}"
+        percorso = os.path.join(self.cartella, nome)
+
+        colonne = {col: tabella.colonna(col) for col in COLONNE_NUMERICHE}
+        dizionari = _dizionari(tabella)
+
+        if self.formato == "parquet":
+            campi = {col: pa.array(valori) for col, valori in colonne.items() if col != "id_percorso"}
+            for codice, testo in COLONNE_CODIFICATE.items():
+                campi[testo] = pa.DictionaryArray.from_arrays(tabella.colonna(codice), dizionari[testo])
+            pq.write_table(pa.table(campi), percorso, compression="zstd")
+        else:
+            np.savez_compressed(
+                percorso,
+                **colonne,
+                **{codice: tabella.colonna(codice) for codice in COLONNE_CODIFICATE if codice != "id_percorso"},
+                **{f"dizionario_{testo}": valori for testo, valori in dizionari.items()}
+            )
+
+        riga = json.dumps({"file": nome, "righe": len(tabella), "esperimento": esperimento, "esecuzione": esecuzione})
+        with open(self._parti_path, "a") as f:
+            f.write(riga + "\n")
+        return percorso
+
+    def _leggi_parte(self, parte: dict, colonne: List[str]) -> Dict[str, np.ndarray]:
+        percorso = os.path.join(self.cartella, parte["file"])
+        numeriche = [c for c in colonne if c in COLONNE_NUMERICHE and c != "id_percorso"]
+        # Colonne testuali codificate richieste, anche solo come codice (id_percorso)
+        codificate = [testo for codice, testo in COLONNE_CODIFICATE.items() if codice in colonne or testo in colonne]
+
+        dati = {}
+        if self.formato == "parquet":
+            tabella_arrow = pq.read_table(percorso, columns=numeriche + codificate)
+            for col in numeriche:
+                dati[col] = tabella_arrow.column(col).to_numpy()
+            for testo in codificate:
+                colonna = tabella_arrow.column(testo).unify_dictionaries().combine_chunks()
+                codici = colonna.indices.to_numpy()
+                if testo in colonne:
+                    dati[testo] = colonna.dictionary.to_numpy(zero_copy_only=False).astype(str)[codici]
+                if testo == "percorso" and "id_percorso" in colonne:
+                    dati["id_percorso"] = codici
+        else:
+            # NpzFile decomprime un array solo quando viene letto
+            with np.load(percorso) as npz:
+                for col in numeriche:
+                    dati[col] = npz[col]
+                for codice, testo in COLONNE_CODIFICATE.items():
+                    if testo not in codificate:
+                        continue
+                    codici = npz[codice]
+                    if testo in colonne:
+                        dati[testo] = npz[f"dizionario_{testo}"][codici]
+                    if codice == "id_percorso" and "id_percorso" in colonne:
+                        dati["id_percorso"] = codici
+
+        n = parte["righe"]
+        if "esperimento" in colonne:
+            dati["esperimento"] = np.full(n, parte["esperimento"])
+        if "esecuzione" in colonne:
+            dati["esecuzione"] = np.full(n, parte["esecuzione"])
+        return {col: dati[col] for col in colonne}
+
+    #Una parte alla volta, solo le colonne richieste (tutte se None)
+    #esperimento: legge solo le parti di quell'esperimento
+    def itera(self, colonne: List[str] = None, esperimento: str = None) -> Iterator[Dict[str, np.ndarray]]:
+        colonne = colonne or COLONNE_TESTUALI + COLONNE_NUMERICHE
+        for parte in self.parti():
+            if esperimento is not None and parte["esperimento"] != esperimento:
+                continue
+            yield self._leggi_parte(parte, colonne)
+
+    #Tutte le parti concatenate
+    def carica(self, colonne: List[str] = None, esperimento: str = None) -> Dict[str, np.ndarray]:
+        colonne = colonne or COLONNE_TESTUALI + COLONNE_NUMERICHE
+        blocchi = list(self.itera(colonne, esperimento))
+        if not blocchi:
+            return {col: np.empty(0) for col in colonne}
+        return {col: np.concatenate([b[col] for b in blocchi]) for col in colonne}
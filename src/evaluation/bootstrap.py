@@ -0,0 +1,115 @@
+#Intervalli di confidenza bootstrap appaiati per il confronto tra configurazioni
+#Si ricampionano i contesti (indice_test), non le singole righe: le richieste dello stesso test
+#condividono orario, affollamento e tempi campionati. Ogni ricampionamento è un vettore di conteggi
+#per contesto condiviso da tutte le statistiche, così confronta le due configurazioni sugli stessi test
+import numpy as np
+from typing import Dict, Tuple
+from dataclasses import dataclass, asdict
+
+
+@dataclass
+class IntervalloConfidenza:
+    stima: float  # valore sui test osservati
+    inferiore: float
+    superiore: float
+    livello: float
+
+    @property
+    def ampiezza(self) -> float:
+        return self.superiore - self.inferiore
+
+    #Zero fuori dall'intervallo: differenza significativa al livello scelto
+    def esclude_zero(self) -> bool:
+        return self.inferiore > 0 or self.superiore < 0
+
+    def __str__(self) -> str:
+        return f"{self.stima:.3f} [{self.inferiore:.3f}, {self.superiore:.3f}]"
+
+
+#Intervalli percentili delle medie delle righe di valori (statistiche x righe)
+#gruppi: contesto di ogni riga, si ricampionano i contesti (default: ogni riga è un contesto)
+#I valori non vengono mai copiati per ricampionamento: con le somme per contesto S (statistiche x contesti)
+#e i conteggi estratti W (ricampionamenti x contesti) le medie sono (W @ S.T) / (W @ righe per contesto)
+#I ricampionamenti sono generati a blocchi, al massimo elementi_massimi conteggi alla volta: ci si ferma
+#quando gli estremi di tutti gli intervalli si spostano meno di tolleranza (relativa all'ampiezza)
+def bootstrap_medie(
+        valori: np.ndarray,
+        livello: float = 0.95,
+        dimensione_blocco: int = 500,
+        max_ricampionamenti: int = 10000,
+        tolleranza: float = 0.01,
+        seed: int = 0,
+        gruppi: np.ndarray = None,
+        elementi_massimi: int = 1 << 22
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+
+    valori = np.atleast_2d(np.asarray(valori, dtype=np.float64))
+    n = valori.shape[1]
+
+    if gruppi is None:
+        somme = valori
+        righe_per_gruppo = np.ones(n)
+    else:
+        _, inverso = np.unique(gruppi, return_inverse=True)
+        righe_per_gruppo = np.bincount(inverso).astype(np.float64)
+        somme = np.vstack([np.bincount(inverso, weights=riga, minlength=len(righe_per_gruppo)) for riga in valori])
+    num_gruppi = len(righe_per_gruppo)
+    if num_gruppi < 2:
+        raise ValueError("Servono almeno due test per il bootstrap")
+
+    rng = np.random.default_rng(seed)
+    code = [(1 - livello) / 2 * 100, (1 + livello) / 2 * 100]
+    probabilita = np.full(num_gruppi, 1 / num_gruppi)
+    dimensione_blocco = max(1, min(dimensione_blocco, elementi_massimi // num_gruppi))
+
+    medie = []
+    estremi_precedenti = None
+    while sum(len(m) for m in medie) < max_ricampionamenti:
+        pesi = rng.multinomial(num_gruppi, probabilita, size=dimensione_blocco).astype(np.float64)
+        medie.append((pesi @ somme.T) / (pesi @ righe_per_gruppo)[:, None])  # (blocco, statistiche)
+
+        estremi = np.percentile(np.concatenate(medie), code, axis=0)  # (2, statistiche)
+        if estremi_precedenti is not None:
+            ampiezze = np.maximum(estremi[1] - estremi[0], 1e-12)
+            if np.all(np.abs(estremi - estremi_precedenti) <= tolleranza * ampiezze):
+                break
+        estremi_precedenti = estremi
+
+    return valori.mean(axis=1), estremi[0], estremi[1], sum(len(m) for m in medie)
+
+
+#Confronto appaiato tra due configurazioni di una TabellaMetriche
+#"altra" è la configurazione candidata (es. ml_rf), "base" il riferimento (es. statico)
+def confronto_bootstrap(tabella, base: str, altra: str, livello: float = 0.95, seed: int = 0,
+                        **parametri) -> Dict[str, IntervalloConfidenza]:
+
+    righe_base, righe_altra = tabella.coppie(base, altra)
+    costo_base = tabella.colonna("costo_reale")[righe_base]
+    costo_altra = tabella.colonna("costo_reale")[righe_altra]
+    gap_base = tabella.colonna("gap_ottimalita")[righe_base]
+    gap_altra = tabella.colonna("gap_ottimalita")[righe_altra]
+
+    statistiche = {
+        "risparmio_costo_medio": costo_base - costo_altra,  # positivo: "altra" costa meno
+        "percentuale_migliore_costo": (costo_base > costo_altra) * 100.0,
+        "gap_medio_base": gap_base,
+        "gap_medio_altra": gap_altra,
+        "differenza_gap_medio": gap_base - gap_altra,
+        "percentuale_ottimi_base": (gap_base < 0.01) * 100.0,
+        "percentuale_ottimi_altra": (gap_altra < 0.01) * 100.0
+    }
+
+    stime, inferiori, superiori, _ = bootstrap_medie(
+        np.vstack(list(statistiche.values())), livello=livello, seed=seed,
+        gruppi=tabella.colonna("indice_test")[righe_base], **parametri
+    )
+
+    return {
+        nome: IntervalloConfidenza(float(s), float(i), float(u), livello)
+        for nome, s, i, u in zip(statistiche, stime, inferiori, superiori)
+    }
+
+
+#Versione serializzabile in JSON
+def intervalli_a_dizionario(intervalli: Dict[str, IntervalloConfidenza]) -> Dict:
+    return {nome: asdict(intervallo) for nome, intervallo in intervalli.items()}
@@ -1,15 +1,16 @@
 
 
+import heapq
 import numpy as np
-from typing import List, Dict, Tuple
-from dataclasses import dataclass, field
+from typing import List, Dict, Tuple, Optional
+from dataclasses import dataclass
 
 #Calcolo metriche di valutazione, serve a giudicare quello che A* ha fatto (con costi statici o Ml)
 
 
 
-#con data class viene generato automaticamente l'init
-@dataclass
+#con data class viene generato automaticamente l'init, con slots niente __dict__ per ogni istanza
+@dataclass(slots=True)
 
 #Scheda di valutazione per un singolo percorso trovato da A* con una configurazione di costo
 class MetrichePercorso:
@@ -35,9 +36,13 @@ class MetrichePercorso:
     nodi_generati: int #quanti nodi ha crato in totale
     tempo_esecuzione: float  # secondi, tempo di calcolo
 
-    # Dettagli archi (per analisi fine)
-    #Salvo per ogni arco del percorso
-    dettagli_archi: List[Dict] = field(default_factory=list)
+    # Tempo reale di ogni arco del percorso, in forma compatta
+    tempi_archi: Optional[np.ndarray] = None
+
+    # Dettagli archi (per analisi fine), un dizionario per arco
+    #Solo con CalcolatoreMetriche(salva_dettagli=True), altrimenti si ricavano da tempi_archi
+    #con CalcolatoreMetriche.calcola_dettagli_archi
+    dettagli_archi: Optional[List[Dict]] = None
 
     #Stampa il risultato in modo leggibile
     def __str__(self) -> str:
@@ -94,30 +99,429 @@ class MetricheAggregate:
         )
 
 
+#Tabella colonnare delle metriche: una riga per (configurazione, test, coppia), una colonna numpy per metrica
+#I pianificatori aggiungono righe direttamente, senza creare un MetrichePercorso per test;
+#aggregazioni e confronti sono operazioni vettoriali sulle colonne
+class TabellaMetriche:
+
+    COLONNE = {
+        "configurazione": np.int16,  # codice in self.configurazioni
+        "indice_test": np.int32,  # contesto (orario, affollamento, tempi campionati)
+        "indice_coppia": np.int64,  # coppia partenza/arrivo nel contesto: con tutte le coppie supera int32
+        "orario": np.int8,
+        "affollamento": np.float64,
+        "partenza": np.int32,  # indice in self.nodi
+        "arrivo": np.int32,
+        "archi_ottimo": np.int16,  # archi del percorso ottimo reale, -1 se non noto
+        "id_percorso": np.int32,  # indice in self.percorsi
+        "lunghezza_percorso": np.int16,
+        "costo_stimato": np.float64,
+        "costo_reale": np.float64,
+        "errore_stima": np.float64,
+        "errore_relativo": np.float64,
+        "costo_ottimo": np.float64,
+        "gap_ottimalita": np.float64,
+        "nodi_espansi": np.int32,
+        "nodi_generati": np.int32,
+        "tempo_esecuzione": np.float64
+    }
+
+    def __init__(self, capacita_iniziale: int = 1024):
+        self._colonne = {nome: np.empty(capacita_iniziale, dtype=tipo) for nome, tipo in self.COLONNE.items()}
+        self.num_righe = 0
+
+        # Nomi delle configurazioni e percorsi distinti, memorizzati una sola volta
+        self.configurazioni: List[str] = []
+        self._codici_configurazione: Dict[str, int] = {}
+        self.percorsi: List[Tuple[str, ...]] = []
+        self._id_percorsi: Dict[Tuple[str, ...], int] = {}
+        self.nodi: List[str] = []
+        self._codici_nodo: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self.num_righe
+
+    def _codice(self, configurazione: str) -> int:
+        if configurazione not in self._codici_configurazione:
+            self._codici_configurazione[configurazione] = len(self.configurazioni)
+            self.configurazioni.append(configurazione)
+        return self._codici_configurazione[configurazione]
+
+    def _codice_nodo(self, nodo: str) -> int:
+        if nodo not in self._codici_nodo:
+            self._codici_nodo[nodo] = len(self.nodi)
+            self.nodi.append(nodo)
+        return self._codici_nodo[nodo]
+
+    def _id_percorso(self, percorso: List[str]) -> int:
+        chiave = tuple(percorso)
+        if chiave not in self._id_percorsi:
+            self._id_percorsi[chiave] = len(self.percorsi)
+            self.percorsi.append(chiave)
+        return self._id_percorsi[chiave]
+
+    #Raddoppia la capacità quando le colonne sono piene
+    def _garantisci_capacita(self) -> None:
+        capacita = len(self._colonne["indice_test"])
+        if self.num_righe < capacita:
+            return
+        self._garantisci_capacita_a(capacita * 2)
+
+    def _garantisci_capacita_a(self, nuova_capacita: int) -> None:
+        for nome, colonna in self._colonne.items():
+            nuova = np.empty(nuova_capacita, dtype=colonna.dtype)
+            nuova[:self.num_righe] = colonna[:self.num_righe]
+            self._colonne[nome] = nuova
+
+    #Aggiunge una riga, errori e gap sono calcolati come in calcola_metriche_percorso
+    #(indice_test, indice_coppia) identifica la richiesta ed è lo stesso per tutte le configurazioni
+    def aggiungi(self, configurazione: str, indice_test: int, orario: int, affollamento: float,
+                 percorso: List[str], costo_stimato: float, costo_reale: float, costo_ottimo: float,
+                 nodi_espansi: int, nodi_generati: int, tempo_esecuzione: float,
+                 archi_ottimo: int = -1, indice_coppia: int = 0) -> None:
+
+        self._garantisci_capacita()
+        errore_stima = abs(costo_stimato - costo_reale)
+
+        riga = {
+            "configurazione": self._codice(configurazione),
+            "indice_test": indice_test,
+            "indice_coppia": indice_coppia,
+            "orario": orario,
+            "affollamento": affollamento,
+            "partenza": self._codice_nodo(percorso[0]),
+            "arrivo": self._codice_nodo(percorso[-1]),
+            "archi_ottimo": archi_ottimo,
+            "id_percorso": self._id_percorso(percorso),
+            "lunghezza_percorso": len(percorso),
+            "costo_stimato": costo_stimato,
+            "costo_reale": costo_reale,
+            "errore_stima": errore_stima,
+            "errore_relativo": errore_stima / costo_reale if costo_reale > 0 else 0,
+            "costo_ottimo": costo_ottimo,
+            "gap_ottimalita": (costo_reale - costo_ottimo) / costo_ottimo if costo_ottimo > 0 else 0,
+            "nodi_espansi": nodi_espansi,
+            "nodi_generati": nodi_generati,
+            "tempo_esecuzione": tempo_esecuzione
+        }
+        for nome, valore in riga.items():
+            self._colonne[nome][self.num_righe] = valore
+        self.num_righe += 1
+
+    #Righe di una configurazione ordinate per indice di test e di coppia
+    def _righe(self, configurazione: str) -> np.ndarray:
+        if configurazione not in self._codici_configurazione:
+            return np.empty(0, dtype=np.int64)
+        codici = self._colonne["configurazione"][:self.num_righe]
+        righe = np.flatnonzero(codici == self._codici_configurazione[configurazione])
+        return righe[np.lexsort((self._colonne["indice_coppia"][righe], self._colonne["indice_test"][righe]))]
+
+    #Chiave unica della richiesta, crescente nell'ordine di _righe
+    def _chiavi(self, righe: np.ndarray, num_coppie: int) -> np.ndarray:
+        return self._colonne["indice_test"][righe].astype(np.int64) * num_coppie + self._colonne["indice_coppia"][righe]
+
+    #Colonna (vista sulle righe usate), eventualmente solo per una configurazione
+    def colonna(self, nome: str, configurazione: str = None) -> np.ndarray:
+        if configurazione is None:
+            return self._colonne[nome][:self.num_righe]
+        return self._colonne[nome][self._righe(configurazione)]
+
+    def num_test(self, configurazione: str) -> int:
+        return len(self._righe(configurazione))
+
+    def percorso(self, id_percorso: int) -> List[str]:
+        return list(self.percorsi[id_percorso])
+
+    #Dimensioni correnti (righe, configurazioni, nodi, percorsi), per salvare solo le aggiunte successive
+    def posizione(self) -> Tuple[int, int, int, int]:
+        return self.num_righe, len(self.configurazioni), len(self.nodi), len(self.percorsi)
+
+    #Righe e voci dei dizionari aggiunte dopo posizione: i dizionari crescono solo in coda
+    def stato_da(self, posizione: Tuple[int, int, int, int]) -> Dict:
+        righe, configurazioni, nodi, percorsi = posizione
+        return {
+            "colonne": {nome: colonna[righe:self.num_righe].copy() for nome, colonna in self._colonne.items()},
+            "configurazioni": self.configurazioni[configurazioni:],
+            "nodi": self.nodi[nodi:],
+            "percorsi": self.percorsi[percorsi:]
+        }
+
+    #Inverso di stato_da: accoda righe e voci salvate a partire dalla posizione corrente
+    def accoda_stato(self, stato: Dict) -> None:
+        for configurazione in stato["configurazioni"]:
+            self._codice(configurazione)
+        for nodo in stato["nodi"]:
+            self._codice_nodo(nodo)
+        for percorso in stato["percorsi"]:
+            self._id_percorso(percorso)
+
+        nuove = len(stato["colonne"]["indice_test"])
+        while len(self._colonne["indice_test"]) < self.num_righe + nuove:
+            self._garantisci_capacita_a(2 * len(self._colonne["indice_test"]))
+        for nome, valori in stato["colonne"].items():
+            self._colonne[nome][self.num_righe:self.num_righe + nuove] = valori
+        self.num_righe += nuove
+
+    #Stessi campi di CalcolatoreMetriche.aggrega_metriche
+    def aggrega(self, configurazione: str) -> MetricheAggregate:
+        righe = self._righe(configurazione)
+        if len(righe) == 0:
+            raise ValueError("Nessuna metrica per la configurazione")
+        return self._aggrega_righe(configurazione, righe)
+
+    #Aggregati per lunghezza della rotta (archi del percorso ottimo reale)
+    #limiti: estremi inferiori delle fasce, es. (1, 3, 6) -> fasce 1-2, 3-5, 6+; None: una fascia per lunghezza
+    def aggrega_per_lunghezza(self, configurazione: str, limiti: List[int] = None) -> Dict[str, MetricheAggregate]:
+        righe = self._righe(configurazione)
+        archi = self._colonne["archi_ottimo"][righe]
+        righe, archi = righe[archi >= 0], archi[archi >= 0]
+        if len(righe) == 0:
+            return {}
+
+        per_valore = limiti is None
+        limiti = np.unique(archi).tolist() if per_valore else sorted(limiti)
+        fasce = np.searchsorted(limiti, archi, side="right") - 1
+
+        risultati = {}
+        for f, inizio in enumerate(limiti):
+            selezionate = righe[fasce == f]
+            if len(selezionate) == 0:
+                continue
+            fine = limiti[f + 1] - 1 if f + 1 < len(limiti) else None
+            if per_valore or fine == inizio:
+                nome = str(inizio)
+            else:
+                nome = f"{inizio}-{fine}" if fine is not None else f"{inizio}+"
+            risultati[nome] = self._aggrega_righe(configurazione, selezionate)
+        return risultati
+
+    def _aggrega_righe(self, configurazione: str, righe: np.ndarray) -> MetricheAggregate:
+        costi_reali = self._colonne["costo_reale"][righe]
+        gaps = self._colonne["gap_ottimalita"][righe]
+        nodi_espansi = self._colonne["nodi_espansi"][righe]
+        tempi = self._colonne["tempo_esecuzione"][righe]
+        errori_stima = self._colonne["errore_stima"][righe]
+
+        return MetricheAggregate(
+            configurazione=configurazione,
+            num_test=len(righe),
+            costo_reale_medio=float(costi_reali.mean()),
+            costo_reale_std=float(costi_reali.std()),
+            costo_reale_min=float(costi_reali.min()),
+            costo_reale_max=float(costi_reali.max()),
+            gap_medio=float(gaps.mean()),
+            gap_std=float(gaps.std()),
+            gap_max=float(gaps.max()),
+            percentuale_ottimi=float(np.count_nonzero(gaps < 0.01) / len(righe)),
+            nodi_espansi_medio=float(nodi_espansi.mean()),
+            nodi_espansi_std=float(nodi_espansi.std()),
+            tempo_medio=float(tempi.mean()),
+            tempo_std=float(tempi.std()),
+            errore_stima_medio=float(errori_stima.mean()),
+            errore_stima_std=float(errori_stima.std())
+        )
+
+    #Righe delle due configurazioni allineate sugli stessi test (solo test riusciti per entrambe)
+    def coppie(self, base: str, altra: str) -> Tuple[np.ndarray, np.ndarray]:
+        righe_base = self._righe(base)
+        righe_altra = self._righe(altra)
+        num_coppie = int(self.colonna("indice_coppia").max()) + 1 if self.num_righe else 1
+        _, i_base, i_altra = np.intersect1d(
+            self._chiavi(righe_base, num_coppie),
+            self._chiavi(righe_altra, num_coppie),
+            assume_unique=True, return_indices=True
+        )
+        return righe_base[i_base], righe_altra[i_altra]
+
+    #Stesso risultato di CalcolatoreMetriche.analisi_quando_ml_aiuta(base, altra)
+    def confronta(self, base: str, altra: str) -> Dict:
+        righe_base, righe_altra = self.coppie(base, altra)
+        n = len(righe_base)
+        if n == 0:
+            raise ValueError("Nessun test in comune tra le configurazioni")
+
+        differenze_costo = self._colonne["costo_reale"][righe_base] - self._colonne["costo_reale"][righe_altra]
+        differenze_nodi = (self._colonne["nodi_espansi"][righe_base].astype(np.int64)
+                           - self._colonne["nodi_espansi"][righe_altra])
+
+        return {
+            "percentuale_ml_migliore_costo": np.count_nonzero(differenze_costo > 0) / n * 100,
+            "percentuale_ml_migliore_efficienza": np.count_nonzero(differenze_nodi > 0) / n * 100,
+            "risparmio_costo_medio": float(differenze_costo.mean()),
+            "risparmio_costo_std": float(differenze_costo.std()),
+            "risparmio_nodi_medio": float(differenze_nodi.mean()),
+            "risparmio_nodi_std": float(differenze_nodi.std()),
+        }
+
+    #Condizioni dei test in cui "altra" costa meno di "base" (vittorie) e degli altri (sconfitte)
+    def vittorie_sconfitte(self, base: str, altra: str) -> Dict:
+        righe_base, righe_altra = self.coppie(base, altra)
+        totale = len(righe_base)
+        if totale == 0:
+            return None
+
+        differenze = self._colonne["costo_reale"][righe_base] - self._colonne["costo_reale"][righe_altra]
+        affollamenti = self._colonne["affollamento"][righe_base]
+        orari = self._colonne["orario"][righe_base].astype(np.float64)
+
+        def statistiche(valori: np.ndarray) -> Dict:
+            return {
+                "medio": float(valori.mean()),
+                "std": float(valori.std()),
+                "min": float(valori.min()),
+                "max": float(valori.max())
+            }
+
+        def riassunto(maschera: np.ndarray) -> Dict:
+            return {
+                "num_casi": int(maschera.sum()),
+                "percentuale": float(maschera.sum() / totale * 100),
+                "affollamento": statistiche(affollamenti[maschera]),
+                "orario": {"medio": float(orari[maschera].mean()), "std": float(orari[maschera].std())}
+            }
+
+        vince = differenze > 0  # "altra" costa meno
+        perde = ~vince
+
+        stats_vince = None
+        if vince.any():
+            stats_vince = riassunto(vince)
+            stats_vince["risparmio"] = statistiche(differenze[vince])
+
+        stats_perde = None
+        if perde.any():
+            stats_perde = riassunto(perde)
+            penalita = statistiche(-differenze[perde])
+            stats_perde["penalita"] = {
+                "media": penalita["medio"], "std": penalita["std"], "min": penalita["min"], "max": penalita["max"]
+            }
+
+        return {
+            "total_casi": totale,
+            "ml_vince": stats_vince,
+            "ml_perde": stats_perde
+        }
+
+
+#Mondo "reale" di un test: un tempo campionato dal simulatore per ogni arco, una volta sola
+#Il percorso ottimo per qualunque goal e il costo reale dei percorsi di tutte le configurazioni
+#si leggono dagli stessi array, così ottimo e percorsi valutati vedono gli stessi tempi
+class ScenarioOracolo:
+
+    #rng: generatore per il campionamento, di default lo stato globale di numpy
+    def __init__(self, grafo, simulatore, orario: int, affollamento: float, rng=None):
+        self.grafo = grafo
+        self.orario = orario
+        self.affollamento = affollamento
+
+        archi = grafo.ottieni_archi()
+        self.indice = {(n1, n2): i for i, (n1, n2, _, _) in enumerate(archi)}
+        self.tempi = simulatore.tempo_percorrenza_batch(
+            [lunghezza for _, _, lunghezza, _ in archi],
+            np.full(len(archi), orario),
+            np.full(len(archi), affollamento),
+            [tipo for _, _, _, tipo in archi],
+            rng=rng
+        )
+
+        # Alberi dei cammini minimi già calcolati, per nodo di partenza
+        self._alberi: Dict[str, Tuple[Dict[str, float], Dict[str, str]]] = {}
+        self._archi_alberi: Dict[str, Dict[str, int]] = {}  # archi dei percorsi ottimi, per nodo di partenza
+
+    def _indice_arco(self, n1: str, n2: str) -> int:
+        return self.indice[(n1, n2) if n1 < n2 else (n2, n1)]
+
+    def tempo_arco(self, n1: str, n2: str) -> float:
+        return float(self.tempi[self._indice_arco(n1, n2)])
+
+    #Dijkstra completo da start: distanze e predecessori verso tutti i nodi
+    def albero(self, start: str) -> Tuple[Dict[str, float], Dict[str, str]]:
+        if start in self._alberi:
+            return self._alberi[start]
+
+        distanze = {start: 0.0}
+        predecessori = {}
+        archi = {start: 0}
+        chiusi = set()
+        frontiera = [(0.0, start)]
+        while frontiera:
+            distanza, nodo = heapq.heappop(frontiera)
+            if nodo in chiusi:
+                continue
+            chiusi.add(nodo)
+            for vicino, _, _ in self.grafo.ottieni_vicini(nodo):
+                nuova = distanza + self.tempi[self._indice_arco(nodo, vicino)]
+                if nuova < distanze.get(vicino, float('inf')):
+                    distanze[vicino] = nuova
+                    predecessori[vicino] = nodo
+                    archi[vicino] = archi[nodo] + 1
+                    heapq.heappush(frontiera, (nuova, vicino))
+
+        self._alberi[start] = (distanze, predecessori)
+        self._archi_alberi[start] = archi
+        return self._alberi[start]
+
+    def costo_ottimo(self, start: str, goal: str) -> float:
+        return float(self.albero(start)[0].get(goal, float('inf')))
+
+    #Lunghezza della rotta: numero di archi del percorso ottimo, -1 se goal non è raggiungibile
+    def archi_ottimo(self, start: str, goal: str) -> int:
+        self.albero(start)
+        return self._archi_alberi[start].get(goal, -1)
+
+    def percorso_ottimo(self, start: str, goal: str) -> Optional[List[str]]:
+        distanze, predecessori = self.albero(start)
+        if goal not in distanze:
+            return None
+        percorso = [goal]
+        while percorso[-1] != start:
+            percorso.append(predecessori[percorso[-1]])
+        percorso.reverse()
+        return percorso
+
+    #Tempi degli archi di un percorso, nello stesso mondo dell'ottimo
+    def tempi_percorso(self, percorso: List[str]) -> np.ndarray:
+        indici = [self._indice_arco(percorso[i], percorso[i + 1]) for i in range(len(percorso) - 1)]
+        return self.tempi[indici]
+
+    def costo_percorso(self, percorso: List[str]) -> float:
+        return float(self.tempi_percorso(percorso).sum())
+
+
 #Valuta quello che A* ha fatto
 class CalcolatoreMetriche:
 
-    def __init__(self, grafo, simulatore):
+    def __init__(self, grafo, simulatore, salva_dettagli: bool = False):
 
            # simulatore: Istanza SimulatoreCosti (per ground truth)
+           # salva_dettagli: riempie dettagli_archi di ogni MetrichePercorso
 
         self.grafo = grafo
         self.simulatore = simulatore
+        self.salva_dettagli = salva_dettagli
+
+    #Scenario campionato per un test: ottimo e costi reali dagli stessi tempi
+    def crea_scenario(self, orario: int, affollamento: float, rng=None) -> ScenarioOracolo:
+        return ScenarioOracolo(self.grafo, self.simulatore, orario, affollamento, rng)
 
     #Calcola metriche per un singolo percorso
-    def calcola_metriche_percorso(self,risultato_astar, configurazione: str, costo_ottimo: float,orario: int,affollamento: float) -> MetrichePercorso:
+    def calcola_metriche_percorso(self,risultato_astar, configurazione: str, costo_ottimo: float,orario: int,affollamento: float,
+                                  scenario: ScenarioOracolo = None) -> MetrichePercorso:
            # risultato_astar: RisultatoRicerca da A*
             #configurazione: Nome config
            # costo_ottimo: Costo del percorso ottimo reale
             #orario: Ora del test
             #affollamento: Affollamento del test
+            #scenario: se indicato il costo reale viene dai suoi tempi invece che da nuovi campioni
 
         percorso = risultato_astar.percorso
 
         # Calcola costo REALE del percorso usando il simulatore
-        costo_reale, dettagli = self._calcola_costo_reale_percorso(
-            percorso, orario, affollamento
-        )
+        if scenario is not None:
+            tempi_archi = scenario.tempi_percorso(percorso)
+        else:
+            tempi_archi = np.array(self._tempi_reali_percorso(percorso, orario, affollamento))
+        costo_reale = float(sum(tempi_archi.tolist()))
 
         # Errore di stima
         errore_stima = abs(risultato_astar.costo_stimato - costo_reale) #Errore assoluto in secondi
@@ -140,21 +544,48 @@ class CalcolatoreMetriche:
             nodi_espansi=risultato_astar.nodi_espansi,
             nodi_generati=risultato_astar.nodi_generati,
             tempo_esecuzione=risultato_astar.tempo_esecuzione,
-            dettagli_archi=dettagli
+            tempi_archi=tempi_archi,
+            dettagli_archi=self.calcola_dettagli_archi(percorso, tempi_archi) if self.salva_dettagli else None
+        )
+
+    #Come calcola_metriche_percorso ma scrive una riga in una TabellaMetriche
+    def registra_percorso(self, tabella: TabellaMetriche, indice_test: int, risultato_astar, configurazione: str,
+                          costo_ottimo: float, orario: int, affollamento: float,
+                          scenario: ScenarioOracolo = None, indice_coppia: int = 0) -> None:
+
+        percorso = risultato_astar.percorso
+        if scenario is not None:
+            costo_reale = scenario.costo_percorso(percorso)
+            archi_ottimo = scenario.archi_ottimo(percorso[0], percorso[-1])
+        else:
+            costo_reale = sum(self._tempi_reali_percorso(percorso, orario, affollamento))
+            archi_ottimo = -1
+
+        tabella.aggiungi(
+            configurazione=configurazione,
+            indice_test=indice_test,
+            orario=orario,
+            affollamento=affollamento,
+            percorso=percorso,
+            costo_stimato=risultato_astar.costo_stimato,
+            costo_reale=costo_reale,
+            costo_ottimo=costo_ottimo,
+            nodi_espansi=risultato_astar.nodi_espansi,
+            nodi_generati=risultato_astar.nodi_generati,
+            tempo_esecuzione=risultato_astar.tempo_esecuzione,
+            archi_ottimo=archi_ottimo,
+            indice_coppia=indice_coppia
         )
 
     #Prende il percorso trovato da A* e calcola quanto costerebbe davvero nel mondo reale
-    def _calcola_costo_reale_percorso(self,percorso: List[str],orario: int,affollamento: float) -> Tuple[float, List[Dict]]:
-        costo_totale = 0.0
-        dettagli = []
+    #Restituisce il tempo reale di ogni arco
+    def _tempi_reali_percorso(self, percorso: List[str], orario: int, affollamento: float) -> List[float]:
+        tempi = []
 
         #Scorro gli archi uno alla volta
         for i in range(len(percorso) - 1):
-            nodo1 = percorso[i]
-            nodo2 = percorso[i + 1]
-
             # Recupera info arco dal grafo
-            arco_info = self.grafo.ottieni_arco(nodo1, nodo2)
+            arco_info = self.grafo.ottieni_arco(percorso[i], percorso[i + 1])
             if arco_info is None:
                 # Arco non esiste (non dovrebbe mai succedere)
                 continue
@@ -162,24 +593,32 @@ class CalcolatoreMetriche:
             lunghezza, tipo = arco_info
 
             # Calcola tempo reale usando simulatore
-            tempo_reale = self.simulatore.tempo_percorrenza(
-                lunghezza, orario, affollamento, tipo
-            )
+            tempi.append(self.simulatore.tempo_percorrenza(lunghezza, orario, affollamento, tipo))
+
+        return tempi
 
-            #Costo reale totale
-            costo_totale += tempo_reale
+    #Costo reale totale e lista dettagliata degli archi
+    def _calcola_costo_reale_percorso(self,percorso: List[str],orario: int,affollamento: float) -> Tuple[float, List[Dict]]:
+        tempi = self._tempi_reali_percorso(percorso, orario, affollamento)
+        return sum(tempi), self.calcola_dettagli_archi(percorso, tempi)
 
-            #Lista dettagliata archi
+    #Dettagli per arco (da, a, lunghezza, tipo, tempo reale) ricavati dai tempi compatti
+    def calcola_dettagli_archi(self, percorso: List[str], tempi_archi) -> List[Dict]:
+        dettagli = []
+        tempi = iter(tempi_archi)
+        for i in range(len(percorso) - 1):
+            arco_info = self.grafo.ottieni_arco(percorso[i], percorso[i + 1])
+            if arco_info is None:
+                continue
+            lunghezza, tipo = arco_info
             dettagli.append({
-                "da": nodo1,
-                "a": nodo2,
+                "da": percorso[i],
+                "a": percorso[i + 1],
                 "lunghezza": lunghezza,
                 "tipo": tipo,
-                "tempo_reale": tempo_reale
+                "tempo_reale": float(next(tempi))
             })
-
-        return costo_totale, dettagli #restituisce il costo totale e la lista dettagliata degli archi
-
+        return dettagli
 
     #Serve a trovare il meglio possibile, percorso con costo reale minore
     #Restituisce il percorso ottimo e il costo reale
@@ -209,9 +648,7 @@ class CalcolatoreMetriche:
             return None, float('inf')
 
         # Calcola costo reale (dovrebbe coincidere con costo_stimato)
-        costo_reale, _ = self._calcola_costo_reale_percorso(
-            risultato.percorso, orario, affollamento
-        )
+        costo_reale = sum(self._tempi_reali_percorso(risultato.percorso, orario, affollamento))
 
         return risultato.percorso, costo_reale
 
@@ -1,8 +1,15 @@
+import os
+import sys
 import json
 import glob
 import pandas as pd
 from pathlib import Path
 
+# Aggiungi la root del progetto al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.evaluation.archivio_test import ArchivioTest
+
 
 #Genera una tabella riassuntiva dei risultati JSON
 class AnalizzatoreRisultati:
@@ -11,6 +18,12 @@ class AnalizzatoreRisultati:
         self.results_dir = results_dir
         self.esperimenti = self._carica_esperimenti()
 
+        # Archivi dei singoli test: si legge solo il manifest, i dati quando servono
+        self.archivi = {
+            Path(manifest).parent.name: ArchivioTest(str(Path(manifest).parent))
+            for manifest in glob.glob(f"{self.results_dir}/*_test/manifest.json")
+        }
+
     def _carica_esperimenti(self):
         esperimenti = {}
 
@@ -28,6 +41,22 @@ class AnalizzatoreRisultati:
 
         return esperimenti
 
+    #Risultati per test di tutti gli archivi, solo le colonne richieste
+    #esperimento: limita la lettura alle parti di quell'esperimento
+    def carica_test(self, colonne: list = None, esperimento: str = None) -> pd.DataFrame:
+        blocchi = [
+            pd.DataFrame(blocco)
+            for blocco in self.itera_test(colonne, esperimento)
+        ]
+        if not blocchi:
+            return pd.DataFrame(columns=colonne)
+        return pd.concat(blocchi, ignore_index=True)
+
+    #Una parte alla volta, per analisi su più righe di quante ne stiano in memoria
+    def itera_test(self, colonne: list = None, esperimento: str = None):
+        for archivio in self.archivi.values():
+            yield from archivio.itera(colonne, esperimento)
+
     def tabella_riepilogativa(self) -> pd.DataFrame:
         righe = []
 
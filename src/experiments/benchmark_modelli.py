@@ -0,0 +1,169 @@
+# Confronta i modelli di costo sullo stesso dataset: accuratezza e costo di addestramento e inferenza
+
+import sys
+import os
+
+# Aggiungi la root del progetto al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import pickle
+import numpy as np
+
+from src.core.grafo import crea_grafo_complesso
+from src.core.simulator import SimulatoreCosti
+from src.ml.dataset import split_train_test
+from src.ml.cache import CacheArtefatti
+from src.ml.modelli import ModelloRegressioneLineare, ModelloRandomForest, ModelloGradientBoosting
+from src.ml.foresta_compatta import ForestaCompatta, memoria_foresta_sklearn
+
+
+#Misura un modello: tempo di addestramento, latenza batch e su singola riga, dimensione e metriche di test
+def misura_modello(modello, X_train, y_train, X_test, y_test, num_stime_singole: int = 200) -> dict:
+
+    inizio = time.perf_counter()
+    modello.addestra(X_train, y_train)
+    tempo_addestramento = time.perf_counter() - inizio
+
+    inizio = time.perf_counter()
+    modello.predici_batch(X_test)
+    tempo_batch = time.perf_counter() - inizio
+
+    # Latenza per arco come la vede A*: una chiamata a stima per corridoio
+    righe = X_test[:num_stime_singole]
+    inizio = time.perf_counter()
+    for lunghezza, orario, affollamento in righe:
+        modello.stima(lunghezza, orario, affollamento)
+    latenza_singola = (time.perf_counter() - inizio) / len(righe)
+
+    metriche = modello.valuta(X_test, y_test)
+
+    return {
+        "tempo_addestramento": tempo_addestramento,
+        "latenza_batch_per_riga": tempo_batch / len(X_test),
+        "latenza_singola": latenza_singola,
+        "dimensione_byte": len(pickle.dumps(modello)),
+        "mae": float(metriche["mae"]),
+        "rmse": float(metriche["rmse"]),
+        "mape": float(metriche["mape"]),
+        "r2": float(metriche["r2"])
+    }
+
+
+def esegui_benchmark(campioni_per_cella: int = 200, seed: int = 42) -> dict:
+    grafo = crea_grafo_complesso()
+    sim = SimulatoreCosti(
+        modello_congestione="quadratico",
+        probabilita_evento=0.10,
+        magnitudo_eventi=(1.3, 1.8),
+        rumore_std=0.12,
+        seed=seed
+    )
+
+    X, y, _ = CacheArtefatti().ottieni_dataset(grafo, sim, campioni_per_cella=campioni_per_cella, seed=seed)
+    X_train, X_test, y_train, y_test = split_train_test(X, y, test_size=0.2, seed=seed)
+    print(f"Dataset: {len(X_train)} train, {len(X_test)} test")
+
+    modelli = [
+        ModelloRegressioneLineare(),
+        ModelloRandomForest(numero_alberi=100, profondita_massima=10, seed=seed),
+        ModelloGradientBoosting(seed=seed)
+    ]
+
+    risultati = {}
+    for modello in modelli:
+        risultati[str(modello)] = misura_modello(modello, X_train, y_train, X_test, y_test)
+
+    print("\n" + "=" * 110)
+    print("BENCHMARK MODELLI DI COSTO")
+    print("=" * 110)
+    print(f"{'Modello':<22} {'Fit (s)':<10} {'Batch (µs/riga)':<17} {'Singola (ms)':<14} "
+          f"{'Dim. (KB)':<11} {'MAE':<8} {'RMSE':<8} {'MAPE':<8}")
+    print("-" * 110)
+    for nome, r in risultati.items():
+        print(f"{nome:<22} {r['tempo_addestramento']:<10.3f} {r['latenza_batch_per_riga'] * 1e6:<17.2f} "
+              f"{r['latenza_singola'] * 1000:<14.3f} {r['dimensione_byte'] / 1024:<11.1f} "
+              f"{r['mae']:<8.3f} {r['rmse']:<8.3f} {r['mape']:<7.1f}%")
+
+    return risultati
+
+
+#Confronta il percorso float64 con quello float32 (dataset, addestramento e foresta esportata)
+#Riporta la memoria risparmiata e la differenza di accuratezza
+def confronta_float32(campioni_per_cella: int = 200, seed: int = 42) -> dict:
+    grafo = crea_grafo_complesso()
+    sim = SimulatoreCosti(
+        modello_congestione="quadratico",
+        probabilita_evento=0.10,
+        magnitudo_eventi=(1.3, 1.8),
+        rumore_std=0.12,
+        seed=seed
+    )
+
+    cache = CacheArtefatti()
+    X64, y64, _ = cache.ottieni_dataset(grafo, sim, campioni_per_cella=campioni_per_cella, seed=seed)
+    X32, y32, _ = cache.ottieni_dataset(grafo, sim, campioni_per_cella=campioni_per_cella, seed=seed, dtype=np.float32)
+
+    X64_train, X64_test, y64_train, y64_test = split_train_test(X64, y64, test_size=0.2, seed=seed)
+    X32_train, X32_test, y32_train, _ = split_train_test(X32, y32, test_size=0.2, seed=seed)
+
+    rf64 = ModelloRandomForest(numero_alberi=100, profondita_massima=10, seed=seed)
+    rf64.addestra(X64_train, y64_train)
+    rf32 = ModelloRandomForest(numero_alberi=100, profondita_massima=10, seed=seed)
+    rf32.addestra(X32_train, y32_train)
+    compatta = ForestaCompatta(rf32)
+
+    # Tutti valutati sullo stesso test set in float64
+    mae = {
+        "rf_float64": float(rf64.valuta(X64_test, y64_test)["mae"]),
+        "rf_float32": float(rf32.valuta(X64_test, y64_test)["mae"]),
+        "compatta_float32": float(compatta.valuta(X64_test, y64_test)["mae"])
+    }
+    differenza_massima = float(np.abs(rf32.predici_batch(X32_test) - compatta.predici_batch(X32_test)).max())
+
+    inizio = time.perf_counter()
+    rf32.predici_batch(X32_test)
+    tempo_sklearn = time.perf_counter() - inizio
+    inizio = time.perf_counter()
+    compatta.predici_batch(X32_test)
+    tempo_compatta = time.perf_counter() - inizio
+
+    risultati = {
+        "memoria_dataset_float64": X64.nbytes + y64.nbytes,
+        "memoria_dataset_float32": X32.nbytes + y32.nbytes,
+        "memoria_foresta_sklearn": memoria_foresta_sklearn(rf32),
+        "memoria_foresta_compatta": compatta.memoria(),
+        "mae": mae,
+        "differenza_massima_predizioni": differenza_massima,
+        "tempo_batch_sklearn": tempo_sklearn,
+        "tempo_batch_compatta": tempo_compatta
+    }
+
+    print("\n" + "=" * 70)
+    print("CONFRONTO FLOAT64 / FLOAT32")
+    print("=" * 70)
+    print(f"Dataset:  {risultati['memoria_dataset_float64'] / 1024:.1f} KB -> "
+          f"{risultati['memoria_dataset_float32'] / 1024:.1f} KB")
+    print(f"Foresta:  {risultati['memoria_foresta_sklearn'] / 1024:.1f} KB (sklearn) -> "
+          f"{risultati['memoria_foresta_compatta'] / 1024:.1f} KB (compatta)")
+    print(f"MAE test: RF float64 {mae['rf_float64']:.4f}s, RF float32 {mae['rf_float32']:.4f}s, "
+          f"compatta {mae['compatta_float32']:.4f}s")
+    print(f"Differenza massima sklearn/compatta: {differenza_massima:.2e}s")
+    print(f"Predizione batch: sklearn {tempo_sklearn * 1000:.2f}ms, compatta {tempo_compatta * 1000:.2f}ms")
+
+    return risultati
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark dei modelli di costo H.E.A.R.T")
+    parser.add_argument("--campioni-per-cella", type=int, default=200, help="Dimensione del dataset")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--float32", action="store_true", help="Confronta il percorso float64 con quello float32")
+
+    args = parser.parse_args()
+    if args.float32:
+        confronta_float32(args.campioni_per_cella, args.seed)
+    else:
+        esegui_benchmark(args.campioni_per_cella, args.seed)
@@ -0,0 +1,166 @@
+# Ricerca degli iperparametri della Random Forest tenendo conto della latenza di inferenza
+# Per ogni configurazione misura errore di validazione e costo di una stima per arco,
+# riporta il fronte di Pareto e sceglie la configurazione più accurata entro un budget di latenza
+# La latenza misurata nel pool (configurazioni in parallelo, n_jobs=1) serve solo a selezionare i finalisti:
+# quelli sul fronte vengono riaddestrati e misurati uno alla volta con le impostazioni di esercizio
+
+import sys
+import os
+
+# Aggiungi la root del progetto al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import io
+import time
+import itertools
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from src.core.grafo import crea_grafo_complesso
+from src.core.simulator import SimulatoreCosti
+from src.ml.dataset import split_train_test
+from src.ml.cache import CacheArtefatti
+from src.ml.modelli import ModelloRandomForest
+
+
+GRIGLIA_PREDEFINITA = {
+    "numero_alberi": [10, 25, 50, 100, 200],
+    "profondita_massima": [4, 6, 8, 10, 12, None],
+    "min_campioni_foglia": [1, 5, 20]
+}
+
+# Dati di addestramento e validazione, inviati una sola volta per processo
+_dati_processo = None
+
+
+def _inizializza_processo(dati) -> None:
+    global _dati_processo
+    _dati_processo = dati
+
+
+#Latenza per arco come la vede A*: una stima alla volta
+def _misura_latenza(modello, righe) -> float:
+    inizio = time.perf_counter()
+    for lunghezza, orario, affollamento in righe:
+        modello.stima(lunghezza, orario, affollamento)
+    return (time.perf_counter() - inizio) / len(righe)
+
+
+#Addestra e misura una configurazione dentro un processo del pool
+#n_jobs=1: ogni processo usa un solo core, la parallelizzazione è tra configurazioni
+def _valuta_configurazione(parametri: dict) -> dict:
+    X_train, y_train, X_val, y_val, num_stime, seed = _dati_processo
+
+    modello = ModelloRandomForest(seed=seed, n_jobs=1, **parametri)
+
+    inizio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # niente stampe dai processi
+        modello.addestra(X_train, y_train)
+    tempo_addestramento = time.perf_counter() - inizio
+
+    metriche = modello.valuta(X_val, y_val)
+
+    # Misura di selezione: gli altri processi del pool stanno addestrando in contemporanea
+    return {
+        "parametri": parametri,
+        "mae": float(metriche["mae"]),
+        "rmse": float(metriche["rmse"]),
+        "latenza_selezione": _misura_latenza(modello, X_val[:num_stime]),
+        "tempo_addestramento": tempo_addestramento
+    }
+
+
+#Configurazioni non dominate: nessun'altra ha errore e latenza entrambi non peggiori (e almeno uno migliore)
+#chiave: "latenza" (finalisti, misura di esercizio) o "latenza_selezione" (tutte le configurazioni)
+def fronte_pareto(risultati: List[dict], chiave: str = "latenza") -> List[dict]:
+    fronte = []
+    misurati = [r for r in risultati if chiave in r]
+    for r in sorted(misurati, key=lambda r: (r[chiave], r["mae"])):
+        if not fronte or r["mae"] < fronte[-1]["mae"]:
+            fronte.append(r)
+    return fronte
+
+
+#La configurazione più accurata con latenza di esercizio entro il budget (None se nessuna lo rispetta)
+def scegli_configurazione(risultati: List[dict], budget_latenza: float):
+    ammesse = [r for r in risultati if r.get("latenza", float("inf")) <= budget_latenza]
+    return min(ammesse, key=lambda r: r["mae"]) if ammesse else None
+
+
+def ricerca(griglia: dict = None, campioni_per_cella: int = 50, num_processi: int = None,
+            num_stime: int = 200, seed: int = 42) -> List[dict]:
+
+    griglia = griglia or GRIGLIA_PREDEFINITA
+
+    grafo = crea_grafo_complesso()
+    sim = SimulatoreCosti(
+        modello_congestione="quadratico",
+        probabilita_evento=0.10,
+        magnitudo_eventi=(1.3, 1.8),
+        rumore_std=0.12,
+        seed=seed
+    )
+
+    X, y, _ = CacheArtefatti().ottieni_dataset(grafo, sim, campioni_per_cella=campioni_per_cella, seed=seed)
+    X_train, X_val, y_train, y_val = split_train_test(X, y, test_size=0.2, seed=seed)
+
+    nomi = list(griglia.keys())
+    configurazioni = [dict(zip(nomi, valori)) for valori in itertools.product(*griglia.values())]
+    print(f"Ricerca su {len(configurazioni)} configurazioni ({len(X_train)} train, {len(X_val)} validazione)")
+
+    dati = (X_train, y_train, X_val, y_val, num_stime, seed)
+    with ProcessPoolExecutor(max_workers=num_processi, initializer=_inizializza_processo,
+                             initargs=(dati,)) as esecutore:
+        risultati = list(esecutore.map(_valuta_configurazione, configurazioni))
+
+    # Finalisti misurati in serie, a macchina scarica, con n_jobs di esercizio
+    finalisti = fronte_pareto(risultati, chiave="latenza_selezione")
+    print(f"Misura della latenza di esercizio per {len(finalisti)} finalisti")
+    for r in finalisti:
+        modello = ModelloRandomForest(seed=seed, **r["parametri"])
+        with contextlib.redirect_stdout(io.StringIO()):
+            modello.addestra(X_train, y_train)
+        r["latenza"] = _misura_latenza(modello, X_val[:num_stime])
+
+    return risultati
+
+
+def stampa_risultati(risultati: List[dict], budget_latenza: float = None) -> None:
+    fronte = fronte_pareto(risultati)
+
+    print("\n" + "=" * 100)
+    print(f"FRONTE DI PARETO ({len(fronte)} su {len(risultati)} configurazioni, latenza di esercizio)")
+    print("=" * 100)
+    print(f"{'Alberi':<8} {'Profondità':<12} {'Min foglia':<12} {'MAE':<10} {'RMSE':<10} {'Latenza (ms)':<14} "
+          f"{'Selezione (ms)':<16} {'Fit (s)':<8}")
+    print("-" * 100)
+    for r in fronte:
+        p = r["parametri"]
+        print(f"{p['numero_alberi']:<8} {str(p['profondita_massima']):<12} {p['min_campioni_foglia']:<12} "
+              f"{r['mae']:<10.3f} {r['rmse']:<10.3f} {r['latenza'] * 1000:<14.3f} "
+              f"{r['latenza_selezione'] * 1000:<16.3f} {r['tempo_addestramento']:<8.2f}")
+
+    if budget_latenza is not None:
+        scelta = scegli_configurazione(risultati, budget_latenza)
+        if scelta is None:
+            print(f"\nNessuna configurazione entro {budget_latenza * 1000:.3f}ms")
+        else:
+            print(f"\nScelta entro {budget_latenza * 1000:.3f}ms: {scelta['parametri']} "
+                  f"(MAE {scelta['mae']:.3f}, {scelta['latenza'] * 1000:.3f}ms)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ricerca iperparametri Random Forest con vincolo di latenza")
+    parser.add_argument("--campioni-per-cella", type=int, default=50, help="Dimensione del dataset")
+    parser.add_argument("--processi", type=int, default=None, help="Processi del pool (default: tutti i core)")
+    parser.add_argument("--budget-latenza-ms", type=float, default=None, help="Latenza massima per stima")
+    parser.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args()
+
+    risultati = ricerca(campioni_per_cella=args.campioni_per_cella, num_processi=args.processi, seed=args.seed)
+    budget = args.budget_latenza_ms / 1000 if args.budget_latenza_ms is not None else None
+    stampa_risultati(risultati, budget)
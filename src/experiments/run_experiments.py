@@ -8,25 +8,35 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 import numpy as np
 import json
+import pickle
+import random
+import shutil
 from datetime import datetime
 
 # Import moduli del progetto
 from src.core.grafo import crea_grafo_complesso, ottieni_posizioni_grafo_complesso
 from src.core.simulator import SimulatoreCosti, calcola_costi_statici
 from src.core.astar import (
-    RicercaAStar,
+    PianificatoreAStar,
     euristica_nulla,
     euristica_distanza_euclidea,
     costo_statico_da_dizionario
 )
-from src.ml.dataset import GeneratoreDataset, split_train_test
+from src.ml.dataset import split_train_test
+from src.ml.cache import CacheArtefatti
 from src.ml.modelli import (
     ModelloRegressioneLineare,
     ModelloRandomForest,
     confronta_modelli,
-    crea_funzione_costo_ml_dinamica
+    crea_funzione_costo_ml_batch
 )
-from src.evaluation.metriche import CalcolatoreMetriche, MetrichePercorso
+from src.evaluation.metriche import CalcolatoreMetriche, TabellaMetriche
+from src.evaluation.bootstrap import confronto_bootstrap, intervalli_a_dizionario
+from src.evaluation.archivio_test import ArchivioTest
+
+
+# Checkpoint nella cartella results del progetto, qualunque sia la cartella da cui si lancia
+CARTELLA_CHECKPOINT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "results", "checkpoint"))
 
 
 # Gestisce l'esecuzione di un esperimento completo
@@ -37,19 +47,41 @@ class EsperimentoCompleto:
             nome_esperimento: str,
             grafo,
             simulatore: SimulatoreCosti,
-            seed: int = 42
+            seed: int = 42,
+            usa_cache: bool = True,
+            velocita_ottimistica: float = 2.0,
+            parametri_rf: dict = None,
+            carico: str = "singola",
+            num_coppie: int = 100,
+            num_thread: int = None
     ):
         self.nome = nome_esperimento
         self.grafo = grafo
         self.simulatore = simulatore
         self.seed = seed
+
+        # Impostazioni del pianificatore e iperparametri della Random Forest (variati dagli sweep)
+        # Solo iperparametri: entrano nell'impronta dei checkpoint e nei risultati, i thread no
+        self.velocita_ottimistica = velocita_ottimistica
+        self.parametri_rf = {"numero_alberi": 100, "profondita_massima": 10, **(parametri_rf or {})}
+
+        # Core a disposizione dell'esperimento: None usa tutta la macchina e addestra i modelli in parallelo,
+        # altrimenti (es. dentro un processo di uno sweep) i modelli si addestrano in serie con questi thread
+        self.num_thread = num_thread
+
+        # Richieste di ogni test: "singola" (start -> goal), "campione" (num_coppie coppie casuali) o "tutte"
+        if carico not in ("singola", "campione", "tutte"):
+            raise ValueError(f"Carico sconosciuto: {carico}")
+        self.carico = {"tipo": carico, "num_coppie": num_coppie if carico == "campione" else None}
+
+        # Dataset e modelli già calcolati con le stesse impostazioni vengono ricaricati dal disco
+        self.cache = CacheArtefatti(attiva=usa_cache)
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
         # Risultati
         self.modelli = {}
-        self.metriche_per_config = {}
+        self.tabella = TabellaMetriche()  # una riga per test e configurazione, con le condizioni del test
         self.risultati_aggregati = {}
-        self._condizioni_test = []
 
         # Storage per risultati completi
         self.risultati_ml_completi = {}
@@ -66,10 +98,11 @@ class EsperimentoCompleto:
         print("FASE INIZIALE: PREPARAZIONE DATI E ADDESTRAMENTO ML")
         print("=" * 70)
 
-        # Genera dataset
-        gen = GeneratoreDataset(self.grafo, self.simulatore)
+        # Genera dataset (o lo recupera dalla cache)
         # Per ogni combinazione di x e y viene testato ogni arco, non lascia il dataset sbilanciato
-        X, y = gen.genera_stratificato(
+        X, y, chiave_dataset = self.cache.ottieni_dataset(
+            self.grafo,
+            self.simulatore,
             campioni_per_cella=20,
             seed=self.seed
         )
@@ -85,13 +118,17 @@ class EsperimentoCompleto:
         # Addestra modelli
         modelli_lista = [
             ModelloRegressioneLineare(),
-            ModelloRandomForest(numero_alberi=100, profondita_massima=10, seed=self.seed)
+            ModelloRandomForest(seed=self.seed, n_jobs=self.num_thread or -1, **self.parametri_rf)
         ]
 
         risultati_ml = confronta_modelli(
             modelli_lista,
             X_train, y_train,
-            X_test, y_test
+            X_test, y_test,
+            cache=self.cache,
+            chiave_dati=self.cache.chiave_split(chiave_dataset, 0.2, self.seed),
+            num_processi=1 if self.num_thread else None,
+            num_core=self.num_thread
         )
 
         # Salva modelli
@@ -150,8 +187,8 @@ class EsperimentoCompleto:
                         "mape": float(risultati_ml["Random Forest"].get("metriche_test", {}).get("mape", 0))
                     },
                     "parametri": {
-                        "numero_alberi": 100,
-                        "profondita_massima": 10,
+                        "numero_alberi": self.parametri_rf["numero_alberi"],
+                        "profondita_massima": self.parametri_rf["profondita_massima"],
                         "seed": self.seed
                     }
                 }
@@ -174,39 +211,145 @@ class EsperimentoCompleto:
         print(f"Costi statici calcolati per {len(self.costi_statici)} archi")
 
         # Prepara euristica euclidea
+        self._prepara_euristica()
+
+        return risultati_ml
+
+    def _prepara_euristica(self):
         print("\nPreparazione euristica euclidea...")
         posizioni_metriche = ottieni_posizioni_grafo_complesso()
         self.euristica_euclidea = euristica_distanza_euclidea(
             posizioni_metriche,
-            velocita_ottimistica=2.0
+            velocita_ottimistica=self.velocita_ottimistica
         )
         print(f"Euristica euclidea preparata per {len(posizioni_metriche)} nodi")
 
-        return risultati_ml
+    # Nuovo esperimento che riusa dataset, modelli addestrati e costi statici di questo
+    # e cambia solo le impostazioni del pianificatore (la fase 1 non va ripetuta)
+    def variante(self, nome_esperimento: str, velocita_ottimistica: float = None) -> "EsperimentoCompleto":
+        altro = EsperimentoCompleto(
+            nome_esperimento,
+            self.grafo,
+            self.simulatore,
+            seed=self.seed,
+            usa_cache=self.cache.attiva,
+            velocita_ottimistica=self.velocita_ottimistica if velocita_ottimistica is None else velocita_ottimistica,
+            parametri_rf=self.parametri_rf,
+            carico=self.carico["tipo"],
+            num_coppie=self.carico["num_coppie"],
+            num_thread=self.num_thread
+        )
+        altro.cache = self.cache
+        altro.modelli = self.modelli
+        altro.risultati_ml_completi = self.risultati_ml_completi
+        altro.costi_statici = self.costi_statici
+        altro._prepara_euristica()
+        return altro
+
+    # Un pianificatore per configurazione, riusato in tutti i test
+    def _crea_pianificatori(self) -> dict:
+        # Costi statici: la funzione non dipende dal contesto, si crea una volta sola
+        costo_statico = costo_statico_da_dizionario(self.costi_statici)
+
+        return {
+            # 1. STATICO (h=0), usa il costo medio dell'arco
+            "statico": PianificatoreAStar(self.grafo, euristica_nulla, funzione_costo=costo_statico),
+
+            # 2. STATICO + EURISTICA: Stesso costo finale, meno nodi esplorati
+            "statico_euclidea": PianificatoreAStar(self.grafo, self.euristica_euclidea, funzione_costo=costo_statico),
+
+            # 3. ML LINEARE
+            # Il modello diventa una funzione di costo adattandosi alle condizioni correnti:
+            # per ogni contesto tutti gli archi sono stimati con una sola predizione batch
+            "ml_lineare": PianificatoreAStar(
+                self.grafo, euristica_nulla,
+                factory=crea_funzione_costo_ml_batch(self.modelli["lineare"], self.grafo)
+            ),
+
+            # 4. ML RANDOM FOREST
+            "ml_rf": PianificatoreAStar(
+                self.grafo, euristica_nulla,
+                factory=crea_funzione_costo_ml_batch(self.modelli["rf"], self.grafo)
+            )
+        }
+
+    # Numero di coppie pianificate in ogni test
+    def num_coppie_carico(self) -> int:
+        if self.carico["tipo"] == "singola":
+            return 1
+        n = len(self.grafo.ottieni_nodi())
+        if self.carico["tipo"] == "tutte":
+            return n * (n - 1)
+        return min(self.carico["num_coppie"], n * (n - 1))
+
+    # Coppie del carico raggruppate per partenza: (partenza, [(indice_coppia, arrivo), ...])
+    # Generate una partenza alla volta, senza costruire la lista di tutte le coppie
+    # Le coppie campionate dipendono solo dal seed: tutti i test e tutte le configurazioni vedono le stesse
+    def gruppi_carico(self, start: str, goal: str):
+        if self.carico["tipo"] == "singola":
+            yield start, [(0, goal)]
+            return
+
+        nodi = sorted(self.grafo.ottieni_nodi())
+        n = len(nodi)
+        if self.carico["tipo"] == "tutte":
+            # Coppia k = s * (n-1) + g, con g che salta la coppia (s, s)
+            for s, partenza in enumerate(nodi):
+                yield partenza, [(s * (n - 1) + g - (g > s), arrivo) for g, arrivo in enumerate(nodi) if g != s]
+            return
+
+        # Campione senza ripetizioni tra le n*(n-1) coppie ordinate, senza costruirle tutte
+        totale = n * (n - 1)
+        rng = np.random.default_rng(self.seed)
+        indici = np.sort(rng.choice(totale, size=min(self.carico["num_coppie"], totale), replace=False))
+        partenze = indici // (n - 1)
+        arrivi = indici % (n - 1)
+        arrivi += arrivi >= partenze  # salta la coppia (s, s)
+        inizi = np.flatnonzero(np.diff(partenze, prepend=-1))
+        for inizio, fine in zip(inizi.tolist(), np.append(inizi[1:], len(indici)).tolist()):
+            yield nodi[partenze[inizio]], [(k, nodi[arrivi[k]]) for k in range(inizio, fine)]
 
     # Esegue test di pianificazione con configurazioni diverse
-    def fase_2_esperimenti_pianificazione(self, num_test: int = 50, start: str = "Ingresso", goal: str = "Reparto"):
+    # ampiezza_ic: se indicata, num_test è il massimo e ci si ferma quando l'intervallo di confidenza
+    # bootstrap del risparmio medio di ML RF sullo statico è più stretto di questa ampiezza (secondi)
+    # checkpoint: cartella in cui salvare i test completati ogni checkpoint_ogni test
+    # primo_test: test da cui ripartire dopo carica_checkpoint (i precedenti sono già nella tabella)
+    # Ogni test è un contesto (orario, affollamento) in cui si pianificano tutte le coppie del carico:
+    # scenario campionato, costi ML del contesto e alberi dei cammini minimi per partenza sono condivisi.
+    # I pianificatori con euristica nulla fanno una sola ricerca per partenza e leggono tutti gli arrivi
+    # dallo stesso albero; solo quello con euristica fa un A* per coppia
+    def fase_2_esperimenti_pianificazione(self, num_test: int = 50, start: str = "Ingresso", goal: str = "Reparto",
+                                          ampiezza_ic: float = None, test_minimi: int = 20, controllo_ogni: int = 10,
+                                          checkpoint: str = None, checkpoint_ogni: int = 10, primo_test: int = 0):
 
         print("\n" + "=" * 70)
         print(f"FASE 2: ESPERIMENTI DI PIANIFICAZIONE ({num_test} test)")
         print("=" * 70)
         print("Configurazioni: statico, statico+euristica, ML lineare, ML RF")
 
+        num_coppie = self.num_coppie_carico()
+        if num_coppie > 1:
+            print(f"Carico: {num_coppie} coppie ({self.carico['tipo']}) per test")
+        # indice_test è int32 (un test per contesto), indice_coppia int64
+        if num_test > np.iinfo(TabellaMetriche.COLONNE["indice_test"]).max:
+            raise ValueError(f"Troppi test ({num_test}) per la colonna indice_test")
+
         # Calcola il costo reale dei percorsi, confronta con il costo stimato e calcola il GAP
         calcolatore = CalcolatoreMetriche(self.grafo, self.simulatore)
 
-        # Configurazioni da testare
-        configurazioni = ["statico", "statico_euclidea", "ml_lineare", "ml_rf"]
+        # Pianificatori costruiti una volta per tutti i test
+        pianificatori = self._crea_pianificatori()
 
-        # Crea una lista di risultati per ogni configurazione
-        for config in configurazioni:
-            self.metriche_per_config[config] = []
-
-        # Reset condizioni test
-        self._condizioni_test = []
+        # Reset risultati
+        if primo_test == 0:
+            self.tabella = TabellaMetriche()
+            if checkpoint is not None:
+                self._azzera_checkpoint(checkpoint)
+        else:
+            print(f"Ripresa dal test {primo_test + 1}")
 
         # Esegui test
-        for i in range(num_test):
+        for i in range(primo_test, num_test):
             # Stampa la scritta test
             if (i + 1) % 10 == 0:
                 print(f"  Test {i + 1}/{num_test}...")
@@ -218,88 +361,51 @@ class EsperimentoCompleto:
             orario = np.random.randint(0, 24)
             affollamento = np.random.uniform(0, 1)
 
-            # Memorizzo le condizioni
-            self._condizioni_test.append({
-                'orario': orario,
-                'affollamento': affollamento
-            })
-
-            # Trova percorso ottimo reale (ground truth), uso A* con costo reale
-            _, costo_ottimo = calcolatore.trova_percorso_ottimo_reale(
-                start, goal, orario, affollamento
-            )
-
-            # 1. STATICO (h=0), usa il costo medio dell'arco
-            astar_statico = RicercaAStar(
-                self.grafo,
-                costo_statico_da_dizionario(self.costi_statici),
-                euristica_nulla
-            )
-            # A* esplora il grafo e trova un percorso
-            ris_statico = astar_statico.pianifica(start, goal)
-
-            # Ricalcolo il costo reale vero
-            if ris_statico.successo:
-                metriche = calcolatore.calcola_metriche_percorso(
-                    ris_statico, "statico", costo_ottimo, orario, affollamento
-                )
-                # Confronto con quello stimato e calcolo errore gap dell'ottimo nodi espansi e tempo
-                self.metriche_per_config["statico"].append(metriche)
-
-            # 2. STATICO + EURISTICA: Stesso costo finale, meno nodi esplorati
-            astar_euclidea = RicercaAStar(
-                self.grafo,
-                costo_statico_da_dizionario(self.costi_statici),
-                self.euristica_euclidea
-            )
-            ris_euclidea = astar_euclidea.pianifica(start, goal)
-
-            if ris_euclidea.successo:
-                metriche = calcolatore.calcola_metriche_percorso(
-                    ris_euclidea, "statico_euclidea", costo_ottimo, orario, affollamento
-                )
-                self.metriche_per_config["statico_euclidea"].append(metriche)
-
-            # 3. ML LINEARE
-            # Il modello diventa una funzione di costo adattandosi alle condizioni correnti
-            funzione_ml_lin = crea_funzione_costo_ml_dinamica(
-                self.modelli["lineare"]
-            )(orario, affollamento)
-
-            astar_ml_lin = RicercaAStar(
-                self.grafo,
-                funzione_ml_lin,
-                euristica_nulla
-            )
-            ris_ml_lin = astar_ml_lin.pianifica(start, goal)
-
-            if ris_ml_lin.successo:
-                metriche = calcolatore.calcola_metriche_percorso(
-                    ris_ml_lin, "ml_lineare", costo_ottimo, orario, affollamento
-                )
-                self.metriche_per_config["ml_lineare"].append(metriche)
-
-            # 4. ML RANDOM FOREST
-            funzione_ml_rf = crea_funzione_costo_ml_dinamica(
-                self.modelli["rf"]
-            )(orario, affollamento)
-
-            astar_ml_rf = RicercaAStar(
-                self.grafo,
-                funzione_ml_rf,
-                euristica_nulla
-            )
-            ris_ml_rf = astar_ml_rf.pianifica(start, goal)
-
-            if ris_ml_rf.successo:
-                metriche = calcolatore.calcola_metriche_percorso(
-                    ris_ml_rf, "ml_rf", costo_ottimo, orario, affollamento
-                )
-                self.metriche_per_config["ml_rf"].append(metriche)
+            # Campiona una volta i tempi reali di tutti gli archi: ottimo (ground truth) e costo reale
+            # dei percorsi di ogni configurazione vengono dallo stesso albero dei cammini minimi
+            scenario = calcolatore.crea_scenario(orario, affollamento)
+
+            # Stesso contesto per tutte le configurazioni
+            contesto = (orario, affollamento)
+            # L'albero dei cammini minimi reali di ogni partenza si calcola una volta per test
+            for partenza, arrivi in self.gruppi_carico(start, goal):
+                costi_ottimi = [scenario.costo_ottimo(partenza, arrivo) for _, arrivo in arrivi]
+
+                for config, pianificatore in pianificatori.items():
+                    # A* esplora il grafo e trova un percorso, una ricerca per tutti gli arrivi se h=0
+                    if pianificatore.indipendente_dall_obiettivo:
+                        per_arrivo = pianificatore.pianifica_da_sorgente(
+                            partenza, [arrivo for _, arrivo in arrivi], contesto
+                        )
+                        risultati = [per_arrivo[arrivo] for _, arrivo in arrivi]
+                    else:
+                        risultati = [pianificatore.pianifica(partenza, arrivo, contesto) for _, arrivo in arrivi]
+
+                    # Ricalcolo il costo reale vero
+                    # Una richiesta è (test, coppia), uguale per tutte le configurazioni
+                    for (k, _), risultato, costo_ottimo in zip(arrivi, risultati, costi_ottimi):
+                        if risultato.successo:
+                            calcolatore.registra_percorso(
+                                self.tabella, i, risultato, config, costo_ottimo, orario, affollamento,
+                                scenario=scenario, indice_coppia=k
+                            )
+
+            # Arresto anticipato: la risposta è già abbastanza precisa
+            if ampiezza_ic is not None and i + 1 >= test_minimi and (i + 1) % controllo_ogni == 0:
+                intervallo = confronto_bootstrap(
+                    self.tabella, "statico", "ml_rf", seed=self.seed
+                )["risparmio_costo_medio"]
+                if intervallo.ampiezza <= ampiezza_ic:
+                    print(f"  Intervallo di confidenza raggiunto dopo {i + 1} test: "
+                          f"risparmio ML RF {intervallo} (ampiezza {intervallo.ampiezza:.2f}s)")
+                    break
+
+            if checkpoint is not None and (i + 1) % checkpoint_ogni == 0 and i + 1 < num_test:
+                self.salva_checkpoint(checkpoint, prossimo_test=i + 1)
 
         print(f"\nTest completati!")
-        for config, metriche_list in self.metriche_per_config.items():
-            print(f"  {config}: {len(metriche_list)} successi")
+        for config in self.tabella.configurazioni:
+            print(f"  {config}: {self.tabella.num_test(config)} successi")
 
     # Analizza e confronta i risultati
     def fase_3_analisi_risultati(self):
@@ -308,51 +414,54 @@ class EsperimentoCompleto:
         print("FASE 3: ANALISI RISULTATI")
         print("=" * 70)
 
-        calcolatore = CalcolatoreMetriche(self.grafo, self.simulatore)
-
         # Aggrega metriche
         print("\n### STATISTICHE AGGREGATE ###\n")
-        for config, metriche_list in self.metriche_per_config.items():
+        for config in self.tabella.configurazioni:
 
-            if metriche_list:
-                agg = calcolatore.aggrega_metriche(metriche_list)
+            if self.tabella.num_test(config):
+                agg = self.tabella.aggrega(config)
                 # Salva i risultati e dopo li scriviamo nel JSON
                 self.risultati_aggregati[config] = agg
                 print(agg)
                 print()
 
         # Confronta statico con statico euclideo misura riduzione di nodi e differenza di costo
-        analisi_euristica = self._analizza_euristica(calcolatore)
+        analisi_euristica = self._analizza_euristica()
 
         # Confronta ml con statico
-        analisi_ml_lineare, analisi_ml_rf = self._analizza_ml(calcolatore)
+        analisi_ml_lineare, analisi_ml_rf = self._analizza_ml()
 
         # In quale condizioni vince e in quale perde (affollamento medio, orari tipici, risparmi o penalità)
         vittorie_sconfitte = self._analizza_vittorie_sconfitte()
 
+        # Intervalli di confidenza dei confronti ML vs statico
+        intervalli = self._analizza_bootstrap()
+
+        # Con più coppie per test: metriche per lunghezza della rotta
+        per_lunghezza = self._analizza_per_lunghezza() if self.carico["tipo"] != "singola" else None
+
         # Salva tutte le analisi
         self.analisi_complete = {
             "euristica": analisi_euristica,
             "ml_lineare_vs_statico": analisi_ml_lineare,
             "ml_rf_vs_statico": analisi_ml_rf,
-            "vittorie_sconfitte": vittorie_sconfitte
+            "vittorie_sconfitte": vittorie_sconfitte,
+            "bootstrap": intervalli,
+            "per_lunghezza": per_lunghezza
         }
 
     # Analizza impatto euristica euclidea
-    def _analizza_euristica(self, calcolatore):
+    def _analizza_euristica(self):
         print("\n" + "=" * 70)
         print("ANALISI EURISTICA: Statico vs Statico+Euclidea")
         print("=" * 70)
 
         # Se una configurazione non ha prodotto risultati non confronto nulla
-        if "statico" not in self.metriche_per_config or "statico_euclidea" not in self.metriche_per_config:
+        if not self.tabella.num_test("statico") or not self.tabella.num_test("statico_euclidea"):
             return None
 
         # Sto usando solo per confrontare euristica con no-euristica
-        analisi = calcolatore.analisi_quando_ml_aiuta(
-            self.metriche_per_config["statico"],
-            self.metriche_per_config["statico_euclidea"]
-        )
+        analisi = self.tabella.confronta("statico", "statico_euclidea")
 
         print("\n### IMPATTO EURISTICA EUCLIDEA ###")
         # Quante volte A* euclideo ha trovato un costo migliore
@@ -373,7 +482,7 @@ class EsperimentoCompleto:
 
         return analisi
 
-    def _analizza_ml(self, calcolatore):
+    def _analizza_ml(self):
         print("\n" + "=" * 70)
         print("ANALISI ML: ML vs STATICO")
         print("=" * 70)
@@ -382,21 +491,15 @@ class EsperimentoCompleto:
         analisi_rf = None
 
         # ML Lineare
-        if "ml_lineare" in self.metriche_per_config and "statico" in self.metriche_per_config:
+        if self.tabella.num_test("ml_lineare") and self.tabella.num_test("statico"):
             print("\n### ML LINEARE vs STATICO ###")
-            analisi_lineare = calcolatore.analisi_quando_ml_aiuta(
-                self.metriche_per_config["statico"],
-                self.metriche_per_config["ml_lineare"]
-            )
+            analisi_lineare = self.tabella.confronta("statico", "ml_lineare")
             self._stampa_analisi_comparativa(analisi_lineare)
 
         # Random Forest
-        if "ml_rf" in self.metriche_per_config and "statico" in self.metriche_per_config:
+        if self.tabella.num_test("ml_rf") and self.tabella.num_test("statico"):
             print("\n### RANDOM FOREST vs STATICO ###")
-            analisi_rf = calcolatore.analisi_quando_ml_aiuta(
-                self.metriche_per_config["statico"],
-                self.metriche_per_config["ml_rf"]
-            )
+            analisi_rf = self.tabella.confronta("statico", "ml_rf")
             self._stampa_analisi_comparativa(analisi_rf)
 
         return analisi_lineare, analisi_rf
@@ -409,130 +512,109 @@ class EsperimentoCompleto:
         print("=" * 70)
 
         # Controllo se esistono i dati, quindi se ho entrambe le configurazioni
-        if "statico" not in self.metriche_per_config or "ml_rf" not in self.metriche_per_config:
+        if not self.tabella.num_test("statico") or not self.tabella.num_test("ml_rf"):
             print("Dati insufficienti per analisi")
             return None
 
-        # Esistono le condizioni? Quindi affollamento e orario
-        if not hasattr(self, '_condizioni_test') or not self._condizioni_test:
-            print("Condizioni test non salvate - analisi non disponibile")
-            return None
-
-        # Due liste di casi concreti
-        ml_vince = []
-        ml_perde = []
-
-        # Prende gli stessi test con zip
-        for i, (m_static, m_ml) in enumerate(zip(
-                self.metriche_per_config["statico"],
-                self.metriche_per_config["ml_rf"]
-        )):
-            # Controlla che non ci siano disallineamenti
-            if i >= len(self._condizioni_test):
-                break
-
-            # Recupera le condizioni di test: orario e affollamento
-            cond = self._condizioni_test[i]
-            diff = m_static.costo_reale - m_ml.costo_reale
-
-            if diff > 0:  # ML costa meno, vince
-                ml_vince.append({
-                    'crowd': cond['affollamento'],
-                    'orario': cond['orario'],
-                    'saving': diff  # quanto tempo ha risparmiato
-                })
-            else:  # Statico costa meno, ML perde
-                ml_perde.append({
-                    'crowd': cond['affollamento'],
-                    'orario': cond['orario'],
-                    'penalty': -diff  # tempo perso (è negativo ma con meno davanti diventa positivo)
-                })
-
-        total = len(ml_vince) + len(ml_perde)
-
-        if total == 0:
+        # Stessi test abbinati, condizioni (orario e affollamento) lette dalla tabella
+        risultato = self.tabella.vittorie_sconfitte("statico", "ml_rf")
+        if risultato is None:
             print("Nessun dato disponibile")
             return None
 
+        total = risultato["total_casi"]
+        stats_vince = risultato["ml_vince"]
+        stats_perde = risultato["ml_perde"]
+        num_vince = stats_vince["num_casi"] if stats_vince else 0
+        num_perde = stats_perde["num_casi"] if stats_perde else 0
+
         # Ml vince in quale percentuale di casi?
-        print(f"\n### ML RANDOM FOREST VINCE ({len(ml_vince)}/{total} = {len(ml_vince) / total * 100:.1f}%) ###")
-
-        stats_vince = None
-        # Dataset secondario dati vincenti
-        if ml_vince:
-            crowds = [v['crowd'] for v in ml_vince]  # Prende solo l'affollamento
-            orari = [v['orario'] for v in ml_vince]  # Prende solo le fasce orarie
-            savings = [v['saving'] for v in ml_vince]  # Prende solo il tempo risparmiato
-
-            # mean: media std: deviazione standard
-            print(f"  Affollamento: {np.mean(crowds):.2f} ± {np.std(crowds):.2f} "
-                  f"[{np.min(crowds):.2f}-{np.max(crowds):.2f}]")
-            print(f"  Orario medio: {np.mean(orari):.1f}h")
-            print(f"  Risparmio: {np.mean(savings):.2f}s ± {np.std(savings):.2f}s "
-                  f"(max: {np.max(savings):.2f}s)")
-
-            stats_vince = {
-                "num_casi": len(ml_vince),
-                "percentuale": len(ml_vince) / total * 100,
-                "affollamento": {
-                    "medio": float(np.mean(crowds)),
-                    "std": float(np.std(crowds)),
-                    "min": float(np.min(crowds)),
-                    "max": float(np.max(crowds))
-                },
-                "orario": {
-                    "medio": float(np.mean(orari)),
-                    "std": float(np.std(orari))
-                },
-                "risparmio": {
-                    "medio": float(np.mean(savings)),
-                    "std": float(np.std(savings)),
-                    "min": float(np.min(savings)),
-                    "max": float(np.max(savings))
-                }
-            }
+        print(f"\n### ML RANDOM FOREST VINCE ({num_vince}/{total} = {num_vince / total * 100:.1f}%) ###")
+        if stats_vince:
+            aff = stats_vince["affollamento"]
+            risparmio = stats_vince["risparmio"]
+            print(f"  Affollamento: {aff['medio']:.2f} ± {aff['std']:.2f} [{aff['min']:.2f}-{aff['max']:.2f}]")
+            print(f"  Orario medio: {stats_vince['orario']['medio']:.1f}h")
+            print(f"  Risparmio: {risparmio['medio']:.2f}s ± {risparmio['std']:.2f}s "
+                  f"(max: {risparmio['max']:.2f}s)")
 
         # Ml perde
-        print(f"\n### ML RANDOM FOREST PERDE ({len(ml_perde)}/{total} = {len(ml_perde) / total * 100:.1f}%) ###")
-
-        stats_perde = None
-        if ml_perde:
-            crowds = [p['crowd'] for p in ml_perde]
-            orari = [p['orario'] for p in ml_perde]
-            penalties = [p['penalty'] for p in ml_perde]
-
-            print(f"  Affollamento: {np.mean(crowds):.2f} ± {np.std(crowds):.2f} "
-                  f"[{np.min(crowds):.2f}-{np.max(crowds):.2f}]")
-            print(f"  Orario medio: {np.mean(orari):.1f}h")
-            print(f"  Penalità: {np.mean(penalties):.2f}s ± {np.std(penalties):.2f}s "
-                  f"(max: {np.max(penalties):.2f}s)")
-
-            stats_perde = {
-                "num_casi": len(ml_perde),
-                "percentuale": len(ml_perde) / total * 100,
-                "affollamento": {
-                    "medio": float(np.mean(crowds)),
-                    "std": float(np.std(crowds)),
-                    "min": float(np.min(crowds)),
-                    "max": float(np.max(crowds))
-                },
-                "orario": {
-                    "medio": float(np.mean(orari)),
-                    "std": float(np.std(orari))
-                },
-                "penalita": {
-                    "media": float(np.mean(penalties)),
-                    "std": float(np.std(penalties)),
-                    "min": float(np.min(penalties)),
-                    "max": float(np.max(penalties))
+        print(f"\n### ML RANDOM FOREST PERDE ({num_perde}/{total} = {num_perde / total * 100:.1f}%) ###")
+        if stats_perde:
+            aff = stats_perde["affollamento"]
+            penalita = stats_perde["penalita"]
+            print(f"  Affollamento: {aff['medio']:.2f} ± {aff['std']:.2f} [{aff['min']:.2f}-{aff['max']:.2f}]")
+            print(f"  Orario medio: {stats_perde['orario']['medio']:.1f}h")
+            print(f"  Penalità: {penalita['media']:.2f}s ± {penalita['std']:.2f}s "
+                  f"(max: {penalita['max']:.2f}s)")
+
+        return risultato
+
+    # Intervalli di confidenza bootstrap appaiati (95%) per ML lineare e RF rispetto allo statico
+    def _analizza_bootstrap(self):
+        print("\n" + "=" * 70)
+        print("INTERVALLI DI CONFIDENZA (bootstrap appaiato, 95%)")
+        print("=" * 70)
+
+        intervalli = {}
+        for config in ["ml_lineare", "ml_rf"]:
+            if min(self.tabella.num_test("statico"), self.tabella.num_test(config)) < 2:
+                continue
+
+            risultato = confronto_bootstrap(self.tabella, "statico", config, seed=self.seed)
+            intervalli[f"{config}_vs_statico"] = intervalli_a_dizionario(risultato)
+
+            risparmio = risultato["risparmio_costo_medio"]
+            print(f"\n### {config} vs statico ###")
+            print(f"  Risparmio costo medio: {risparmio}s"
+                  f"{' (significativo)' if risparmio.esclude_zero() else ''}")
+            print(f"  Migliore nel costo: {risultato['percentuale_migliore_costo']}%")
+            print(f"  Gap medio: statico {risultato['gap_medio_base']}, {config} {risultato['gap_medio_altra']}")
+            print(f"  Soluzioni ottime: statico {risultato['percentuale_ottimi_base']}%, "
+                  f"{config} {risultato['percentuale_ottimi_altra']}%")
+
+        return intervalli
+
+    # Metriche di ogni configurazione per fascia di lunghezza della rotta (archi del percorso ottimo)
+    # Fino a 8 lunghezze distinte una fascia per lunghezza, altrimenti fasce sui quantili
+    def _analizza_per_lunghezza(self, num_fasce: int = 6):
+        print("\n" + "=" * 70)
+        print("ANALISI PER LUNGHEZZA DELLA ROTTA (archi del percorso ottimo)")
+        print("=" * 70)
+
+        archi = self.tabella.colonna("archi_ottimo", "statico")
+        archi = archi[archi >= 0]
+        if len(archi) == 0:
+            print("Dati insufficienti per analisi")
+            return None
+
+        limiti = None
+        if len(np.unique(archi)) > 8:
+            limiti = np.unique(np.quantile(archi, np.linspace(0, 1, num_fasce + 1)[:-1], method="lower")).tolist()
+
+        per_config = {config: self.tabella.aggrega_per_lunghezza(config, limiti) for config in self.tabella.configurazioni}
+
+        risultati = {}
+        print(f"\n{'Archi':<8} {'Config':<18} {'Test':>7} {'Costo reale':>12} {'Gap':>8} {'Ottimi':>8} {'Nodi esp.':>10}")
+        print("-" * 75)
+        for fascia in per_config["statico"]:
+            risultati[fascia] = {}
+            for config, aggregati in per_config.items():
+                if fascia not in aggregati:
+                    continue
+                agg = aggregati[fascia]
+                risultati[fascia][config] = {
+                    "num_test": agg.num_test,
+                    "costo_reale_medio": agg.costo_reale_medio,
+                    "gap_medio": agg.gap_medio,
+                    "percentuale_ottimi": agg.percentuale_ottimi,
+                    "nodi_espansi_medio": agg.nodi_espansi_medio,
+                    "tempo_medio": agg.tempo_medio
                 }
-            }
+                print(f"{fascia:<8} {config:<18} {agg.num_test:>7} {agg.costo_reale_medio:>11.2f}s "
+                      f"{agg.gap_medio * 100:>7.1f}% {agg.percentuale_ottimi * 100:>7.1f}% {agg.nodi_espansi_medio:>10.1f}")
 
-        return {
-            "total_casi": total,
-            "ml_vince": stats_vince,
-            "ml_perde": stats_perde
-        }
+        return risultati
 
     # Stampa analisi
     def _stampa_analisi_comparativa(self, analisi: dict):
@@ -574,7 +656,9 @@ class EsperimentoCompleto:
                     "magnitudo_eventi": self.simulatore.magnitudo_eventi,
                     "rumore_std": self.simulatore.rumore_std
                 },
-                "num_test": len(self.metriche_per_config.get("statico", []))
+                "velocita_ottimistica": self.velocita_ottimistica,
+                "carico": self.carico,
+                "num_test": self.tabella.num_test("statico")
             },
 
             # RISULTATI ML (R2, MAE, RMSE, coefficienti, feature importance)
@@ -613,20 +697,134 @@ class EsperimentoCompleto:
 
         print(f"\nRisultati salvati in: {filepath}")
 
+        # Risultati dei singoli test in formato colonnare, ogni esecuzione aggiunge una parte
+        archivio = ArchivioTest(os.path.join(output_dir, f"{self.nome}_test"))
+        archivio.aggiungi(self.tabella, self.nome, self.timestamp)
+        print(f"Risultati per test ({len(self.tabella)} righe) aggiunti a: {archivio.cartella}")
+
+    # Impostazioni che devono coincidere perché un checkpoint sia riutilizzabile
+    def _impronta_checkpoint(self) -> dict:
+        return {
+            "nome": self.nome,
+            "seed": self.seed,
+            "simulatore": self.simulatore.parametri(),
+            "velocita_ottimistica": self.velocita_ottimistica,
+            "parametri_rf": self.parametri_rf,
+            "carico": self.carico
+        }
+
+    # Nuovo checkpoint vuoto: i segmenti di un'esecuzione precedente non vanno riletti
+    def _azzera_checkpoint(self, cartella: str):
+        shutil.rmtree(cartella, ignore_errors=True)
+        self._posizione_checkpoint = TabellaMetriche().posizione()
+        self._segmenti_checkpoint = 0
+
+    # Checkpoint incrementale in una cartella:
+    # modelli.pkl (modelli addestrati, risultati ML, costi statici) scritto una volta,
+    # segmento_NNNNN.pkl con le sole righe aggiunte dal salvataggio precedente,
+    # stato.pkl con test raggiunto, numero di segmenti validi e stato dei generatori casuali.
+    # stato.pkl è scritto per ultimo e in modo atomico: un'interruzione lascia valido il checkpoint precedente
+    def salva_checkpoint(self, cartella: str, prossimo_test: int):
+        os.makedirs(cartella, exist_ok=True)
+
+        percorso_modelli = os.path.join(cartella, "modelli.pkl")
+        if not os.path.exists(percorso_modelli):
+            _scrivi_pickle(percorso_modelli, {
+                "modelli": self.modelli,
+                "risultati_ml_completi": self.risultati_ml_completi,
+                "costi_statici": self.costi_statici
+            })
+
+        _scrivi_pickle(
+            os.path.join(cartella, f"segmento_{self._segmenti_checkpoint:05d}.pkl"),
+            self.tabella.stato_da(self._posizione_checkpoint)
+        )
+        self._segmenti_checkpoint += 1
+        self._posizione_checkpoint = self.tabella.posizione()
+
+        _scrivi_pickle(os.path.join(cartella, "stato.pkl"), {
+            "impostazioni": self._impronta_checkpoint(),
+            "salvato_il": datetime.now().isoformat(),
+            "timestamp": self.timestamp,
+            "prossimo_test": prossimo_test,
+            "num_segmenti": self._segmenti_checkpoint,
+            "posizione": self._posizione_checkpoint,
+            "stato_random": random.getstate(),
+            "stato_numpy": np.random.get_state()
+        })
+
+    # Ripristina lo stato salvato e restituisce il test da cui ripartire (la fase 1 non va ripetuta)
+    def carica_checkpoint(self, cartella: str) -> int:
+        with open(os.path.join(cartella, "stato.pkl"), "rb") as f:
+            stato = pickle.load(f)
+
+        if stato["impostazioni"] != self._impronta_checkpoint():
+            raise ValueError(f"Il checkpoint {cartella} appartiene a un esperimento con impostazioni diverse")
+
+        with open(os.path.join(cartella, "modelli.pkl"), "rb") as f:
+            modelli = pickle.load(f)
+
+        # Solo i segmenti registrati in stato.pkl: uno scritto dopo è di un salvataggio interrotto
+        tabella = TabellaMetriche()
+        for n in range(stato["num_segmenti"]):
+            with open(os.path.join(cartella, f"segmento_{n:05d}.pkl"), "rb") as f:
+                tabella.accoda_stato(pickle.load(f))
+        if tabella.posizione() != tuple(stato["posizione"]):
+            raise ValueError(f"Il checkpoint {cartella} è incompleto")
+
+        self.timestamp = stato["timestamp"]
+        self.tabella = tabella
+        self.modelli = modelli["modelli"]
+        self.risultati_ml_completi = modelli["risultati_ml_completi"]
+        self.costi_statici = modelli["costi_statici"]
+        self._segmenti_checkpoint = stato["num_segmenti"]
+        self._posizione_checkpoint = tabella.posizione()
+        random.setstate(stato["stato_random"])
+        np.random.set_state(stato["stato_numpy"])
+        self._prepara_euristica()
+
+        print(f"Checkpoint del {stato['salvato_il']} caricato: {stato['prossimo_test']} test già completati")
+        return stato["prossimo_test"]
+
     # Esegue il tutto
-    def esegui_completo(self, num_test: int = 50):
+    # riprendi: se esiste un checkpoint di questo esperimento continua da lì invece di ricominciare
+    def esegui_completo(self, num_test: int = 50, ampiezza_ic: float = None, riprendi: bool = False,
+                        cartella_checkpoint: str = CARTELLA_CHECKPOINT):
+
+        checkpoint = os.path.abspath(os.path.join(cartella_checkpoint, self.nome))
 
-        self.fase_1_preparazione_dati()
-        self.fase_2_esperimenti_pianificazione(num_test=num_test)
+        primo_test = 0
+        if riprendi and os.path.exists(os.path.join(checkpoint, "stato.pkl")):
+            primo_test = self.carica_checkpoint(checkpoint)
+        else:
+            if riprendi:
+                print(f"Nessun checkpoint in {checkpoint}: si ricomincia dal primo test")
+            self.fase_1_preparazione_dati()
+
+        self.fase_2_esperimenti_pianificazione(
+            num_test=num_test, ampiezza_ic=ampiezza_ic, checkpoint=checkpoint, primo_test=primo_test
+        )
         self.fase_3_analisi_risultati()
         self.salva_risultati()
 
+        # Esperimento completo: il checkpoint non serve più
+        shutil.rmtree(checkpoint, ignore_errors=True)
+
         print("\n" + "=" * 70)
         print("ESPERIMENTO COMPLETATO!")
         print("=" * 70)
 
 
-def scenario_normale():
+# Scrittura atomica: il file compare solo quando è completo
+def _scrivi_pickle(percorso: str, oggetto):
+    temporaneo = f"{percorso}.{os.getpid()}.tmp"
+    with open(temporaneo, "wb") as f:
+        pickle.dump(oggetto, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporaneo, percorso)
+
+
+def scenario_normale(usa_cache: bool = True, ampiezza_ic: float = None, riprendi: bool = False,
+                     carico: str = "singola", num_coppie: int = 100):
     print("\n" + "=" * 70)
     print("SCENARIO NORMALE: Variabilità Moderata")
     print("\n" + "=" * 70)
@@ -640,12 +838,14 @@ def scenario_normale():
         seed=42
     )
 
-    exp = EsperimentoCompleto("scenario_normale", grafo, sim, seed=42)
+    exp = EsperimentoCompleto("scenario_normale", grafo, sim, seed=42, usa_cache=usa_cache,
+                              carico=carico, num_coppie=num_coppie)
     # Lancia l'esperimento
-    exp.esegui_completo(num_test=50)
+    exp.esegui_completo(num_test=50, ampiezza_ic=ampiezza_ic, riprendi=riprendi)
 
 
-def scenario_estremo():
+def scenario_estremo(usa_cache: bool = True, ampiezza_ic: float = None, riprendi: bool = False,
+                     carico: str = "singola", num_coppie: int = 100):
     print("\n" + "=" * 70)
     print("SCENARIO ESTREMO: Alta Variabilità")
     print("\n" + "=" * 70)
@@ -659,19 +859,21 @@ def scenario_estremo():
         seed=42
     )
 
-    exp = EsperimentoCompleto("scenario_estremo", grafo, sim, seed=42)
-    exp.esegui_completo(num_test=50)
+    exp = EsperimentoCompleto("scenario_estremo", grafo, sim, seed=42, usa_cache=usa_cache,
+                              carico=carico, num_coppie=num_coppie)
+    exp.esegui_completo(num_test=50, ampiezza_ic=ampiezza_ic, riprendi=riprendi)
 
 
 # Esegue gli scenari e li confronta
-def confronta_scenari():
+def confronta_scenari(usa_cache: bool = True, ampiezza_ic: float = None, riprendi: bool = False,
+                      carico: str = "singola", num_coppie: int = 100):
     print("\n" + "=" * 70)
     print("ESECUZIONE ESPERIMENTI COMPARATIVI")
     print("=" * 70)
 
     # Esegui entrambi
-    scenario_normale()
-    scenario_estremo()
+    scenario_normale(usa_cache, ampiezza_ic, riprendi, carico, num_coppie)
+    scenario_estremo(usa_cache, ampiezza_ic, riprendi, carico, num_coppie)
 
     print("\n" + "=" * 70)
     print("TUTTI GLI ESPERIMENTI COMPLETATI")
@@ -696,12 +898,43 @@ if __name__ == "__main__":
         default=50,
         help="Numero di test per scenario"
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Rigenera dataset e modelli invece di ricaricarli dalla cache"
+    )
+    parser.add_argument(
+        "--ampiezza-ic",
+        type=float,
+        default=None,
+        help="Ferma i test quando l'intervallo di confidenza del risparmio ML RF è più stretto (secondi)"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Riprende dall'ultimo checkpoint (results/checkpoint) invece di ricominciare"
+    )
+    parser.add_argument(
+        "--carico",
+        type=str,
+        default="singola",
+        choices=["singola", "campione", "tutte"],
+        help="Coppie pianificate per test: Ingresso -> Reparto, un campione casuale o tutte le coppie"
+    )
+    parser.add_argument(
+        "--num-coppie",
+        type=int,
+        default=100,
+        help="Coppie per test con --carico campione"
+    )
 
     args = parser.parse_args()
 
+    usa_cache = not args.no_cache
+
     if args.scenario == "normale":
-        scenario_normale()
+        scenario_normale(usa_cache, args.ampiezza_ic, args.resume, args.carico, args.num_coppie)
     elif args.scenario == "estremo":
-        scenario_estremo()
+        scenario_estremo(usa_cache, args.ampiezza_ic, args.resume, args.carico, args.num_coppie)
     elif args.scenario == "entrambi":
-        confronta_scenari()
\ No newline at end of file
+        confronta_scenari(usa_cache, args.ampiezza_ic, args.resume, args.carico, args.num_coppie)
\ No newline at end of file
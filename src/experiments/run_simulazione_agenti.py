@@ -0,0 +1,66 @@
+# Confronta le politiche di instradamento sotto carico: molti trasportatori contemporanei
+# che congestionano i corridoi che scelgono
+
+import sys
+import os
+
+# Aggiungi la root del progetto al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.grafo import crea_grafo_complesso
+from src.core.simulator import SimulatoreCosti, calcola_costi_statici
+from src.core.simulazione_agenti import politica_statica, politica_da_modello, confronta_politiche
+from src.ml.dataset import GeneratoreDataset, split_train_test
+from src.ml.modelli import ModelloRegressioneLineare, ModelloRandomForest
+
+
+def esegui(agenti_per_ora: float, durata_ore: float, capacita: float, seed: int = 42):
+    grafo = crea_grafo_complesso()
+    sim = SimulatoreCosti(modello_congestione="quadratico", probabilita_evento=0.05, seed=seed)
+
+    print("\n" + "=" * 70)
+    print("PREPARAZIONE POLITICHE")
+    print("=" * 70)
+
+    gen = GeneratoreDataset(grafo, sim)
+    X, y = gen.genera_stratificato(campioni_per_cella=20, seed=seed)
+    X_train, _, y_train, _ = split_train_test(X, y, seed=seed)
+
+    modello_lin = ModelloRegressioneLineare()
+    modello_lin.addestra(X_train, y_train)
+    modello_rf = ModelloRandomForest(numero_alberi=100, profondita_massima=10, seed=seed)
+    modello_rf.addestra(X_train, y_train)
+
+    costi_statici = calcola_costi_statici(grafo, sim)
+
+    politiche = {
+        "statico": politica_statica(costi_statici),
+        # Costi di tutti i corridoi stimati con una predizione batch per pianificazione
+        "ml_lineare": politica_da_modello(modello_lin, grafo),
+        "ml_rf": politica_da_modello(modello_rf, grafo),
+    }
+
+    print("\n" + "=" * 70)
+    print(f"SIMULAZIONE: {agenti_per_ora:.0f} agenti/ora per {durata_ore}h (capacità corridoio {capacita})")
+    print("=" * 70 + "\n")
+
+    return confronta_politiche(
+        grafo, sim, politiche,
+        agenti_per_ora=agenti_per_ora,
+        durata_ore=durata_ore,
+        seed=seed,
+        capacita_corridoio=capacita
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulazione multi-agente H.E.A.R.T")
+    parser.add_argument("--agenti-per-ora", type=float, default=2000, help="Intensità delle richieste")
+    parser.add_argument("--durata-ore", type=float, default=1.0, help="Finestra di generazione delle richieste")
+    parser.add_argument("--capacita", type=float, default=10.0, help="Agenti che saturano un corridoio")
+    parser.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args()
+    esegui(args.agenti_per_ora, args.durata_ore, args.capacita, args.seed)
@@ -0,0 +1,214 @@
+# Sweep di parametri: esegue EsperimentoCompleto su una griglia di simulatori, euristiche e iperparametri
+# Le celle che condividono simulatore e modello sono raggruppate: dataset, addestramento e costi statici
+# si calcolano una volta per gruppo, i gruppi vengono distribuiti su un pool di processi
+
+import sys
+import os
+
+# Aggiungi la root del progetto al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import random
+import itertools
+import contextlib
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+from src.core.grafo import crea_grafo_complesso
+from src.core.simulator import SimulatoreCosti
+from src.ml.cache import impronta
+from src.experiments.run_experiments import EsperimentoCompleto
+
+
+PARAMETRI_SIMULATORE = ("modello_congestione", "probabilita_evento", "magnitudo_eventi", "rumore_std")
+PARAMETRI_MODELLO = ("numero_alberi", "profondita_massima")
+PARAMETRI_PIANIFICATORE = ("velocita_ottimistica",)
+
+# Attorno ai due scenari di run_experiments (normale ed estremo)
+GRIGLIA_PREDEFINITA = {
+    "modello_congestione": ["lineare", "quadratico", "soglia"],
+    "probabilita_evento": [0.03, 0.10],
+    "magnitudo_eventi": [(1.1, 1.4), (1.3, 1.8)],
+    "rumore_std": [0.06, 0.12],
+    "velocita_ottimistica": [2.0],
+    "numero_alberi": [100],
+    "profondita_massima": [10]
+}
+
+
+#Prodotto cartesiano della griglia, una cella per combinazione
+def espandi_griglia(griglia: Dict[str, list]) -> List[dict]:
+    nomi = list(griglia)
+    celle = []
+    for valori in itertools.product(*(griglia[nome] for nome in nomi)):
+        cella = dict(zip(nomi, valori))
+        cella["magnitudo_eventi"] = tuple(cella["magnitudo_eventi"])
+        celle.append(cella)
+    return celle
+
+
+def nome_cella(cella: dict) -> str:
+    return f"cella_{impronta(cella)[:10]}"
+
+
+#Celle con stesso simulatore e stessi iperparametri condividono dataset, modelli e costi statici
+def raggruppa_celle(celle: List[dict]) -> List[List[dict]]:
+    gruppi = {}
+    for cella in celle:
+        chiave = tuple(cella[nome] for nome in PARAMETRI_SIMULATORE + PARAMETRI_MODELLO)
+        gruppi.setdefault(chiave, []).append(cella)
+    return list(gruppi.values())
+
+
+#Numeri principali di una cella per la tabella riassuntiva
+def _sintesi(exp: EsperimentoCompleto) -> dict:
+    sintesi = {
+        config: {
+            "costo_reale_medio": agg.costo_reale_medio,
+            "gap_medio": agg.gap_medio,
+            "percentuale_ottimi": agg.percentuale_ottimi,
+            "nodi_espansi_medio": agg.nodi_espansi_medio
+        }
+        for config, agg in exp.risultati_aggregati.items()
+    }
+    intervalli = exp.analisi_complete.get("bootstrap", {}).get("ml_rf_vs_statico")
+    if intervalli:
+        sintesi["risparmio_ml_rf"] = intervalli["risparmio_costo_medio"]
+    return sintesi
+
+
+#Eseguito in un processo del pool: una preparazione per il gruppo, poi fase 2 e 3 per ogni cella
+def _esegui_gruppo(celle: List[dict], num_test: int, cartella: str, seed: int, usa_cache: bool,
+                   thread_per_gruppo: int) -> List[dict]:
+
+    prima = celle[0]
+    log = os.path.join(cartella, f"log_{nome_cella(prima)}.txt")
+
+    with open(log, "w") as f, contextlib.redirect_stdout(f), threadpool_limits(thread_per_gruppo):
+        sim = SimulatoreCosti(
+            modello_congestione=prima["modello_congestione"],
+            probabilita_evento=prima["probabilita_evento"],
+            magnitudo_eventi=prima["magnitudo_eventi"],
+            rumore_std=prima["rumore_std"],
+            seed=seed
+        )
+        base = EsperimentoCompleto(
+            nome_cella(prima), crea_grafo_complesso(), sim,
+            seed=seed,
+            usa_cache=usa_cache,
+            num_thread=thread_per_gruppo,  # nessun pool annidato, n_jobs della Random Forest
+            parametri_rf={nome: prima[nome] for nome in PARAMETRI_MODELLO}
+        )
+        base.fase_1_preparazione_dati()
+
+        # Ogni cella riparte dallo stato casuale dopo la preparazione: stessi contesti e stessi mondi
+        # campionati per tutte le celle del gruppo, qualunque sia la loro posizione
+        stato_random = random.getstate()
+        stato_numpy = np.random.get_state()
+
+        risultati = []
+        for cella in celle:
+            random.setstate(stato_random)
+            np.random.set_state(stato_numpy)
+            exp = base.variante(nome_cella(cella), velocita_ottimistica=cella["velocita_ottimistica"])
+            exp.fase_2_esperimenti_pianificazione(num_test=num_test)
+            exp.fase_3_analisi_risultati()
+            exp.salva_risultati(cartella)
+            risultati.append({
+                "cella": nome_cella(cella),
+                "parametri": cella,
+                "file": f"{exp.nome}_{exp.timestamp}.json",
+                "sintesi": _sintesi(exp)
+            })
+
+    return risultati
+
+
+#Esegue la griglia e scrive nella cartella un JSON per cella e un indice con la sintesi di tutte le celle
+def esegui_sweep(
+        griglia: Dict[str, list] = None,
+        num_test: int = 50,
+        num_processi: int = None,
+        cartella: str = "results/sweep",
+        seed: int = 42,
+        usa_cache: bool = True
+) -> List[dict]:
+
+    griglia = {**GRIGLIA_PREDEFINITA, **(griglia or {})}
+    celle = espandi_griglia(griglia)
+    gruppi = raggruppa_celle(celle)
+
+    num_processi = num_processi or os.cpu_count() or 1
+    num_processi = min(num_processi, len(gruppi))
+    thread_per_gruppo = max(1, (os.cpu_count() or 1) // num_processi)
+
+    os.makedirs(cartella, exist_ok=True)
+    print(f"Sweep: {len(celle)} celle in {len(gruppi)} gruppi, {num_processi} processi, {num_test} test per cella")
+
+    risultati = []
+    with ProcessPoolExecutor(max_workers=num_processi) as pool:
+        futuri = [
+            pool.submit(_esegui_gruppo, gruppo, num_test, cartella, seed, usa_cache, thread_per_gruppo)
+            for gruppo in gruppi
+        ]
+        for completati, futuro in enumerate(as_completed(futuri), 1):
+            risultati.extend(futuro.result())
+            print(f"  Gruppo {completati}/{len(gruppi)} completato")
+
+    # Stesso ordine della griglia indipendentemente dall'ordine di completamento
+    ordine = {nome_cella(cella): i for i, cella in enumerate(celle)}
+    risultati.sort(key=lambda r: ordine[r["cella"]])
+
+    indice = os.path.join(cartella, f"sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(indice, "w") as f:
+        json.dump({"griglia": griglia, "num_test": num_test, "seed": seed, "celle": risultati}, f, indent=2)
+
+    stampa_sweep(risultati)
+    print(f"\nIndice dello sweep salvato in: {indice}")
+    return risultati
+
+
+def stampa_sweep(risultati: List[dict]) -> None:
+    print("\n" + "=" * 110)
+    print("SWEEP: RISPARMIO ML RF SU STATICO")
+    print("=" * 110)
+    print(f"{'Congestione':<12} {'P evento':<9} {'Magnitudo':<12} {'Rumore':<8} {'V. eur.':<8} "
+          f"{'Alberi':<7} {'Prof.':<6} {'Risparmio RF (s) [IC 95%]':<30} {'Gap RF':<8}")
+    print("-" * 110)
+    for r in risultati:
+        p = r["parametri"]
+        risparmio = r["sintesi"].get("risparmio_ml_rf")
+        testo = (f"{risparmio['stima']:.2f} [{risparmio['inferiore']:.2f}, {risparmio['superiore']:.2f}]"
+                 if risparmio else "-")
+        gap = r["sintesi"].get("ml_rf", {}).get("gap_medio", float("nan"))
+        print(f"{p['modello_congestione']:<12} {p['probabilita_evento']:<9} {str(p['magnitudo_eventi']):<12} "
+              f"{p['rumore_std']:<8} {p['velocita_ottimistica']:<8} {p['numero_alberi']:<7} "
+              f"{str(p['profondita_massima']):<6} {testo:<30} {gap * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sweep di parametri degli esperimenti H.E.A.R.T")
+    parser.add_argument("--griglia", type=str, default=None,
+                        help="File JSON con i valori da provare per ogni parametro (sostituisce quelli predefiniti)")
+    parser.add_argument("--num-test", type=int, default=50, help="Test per cella")
+    parser.add_argument("--processi", type=int, default=None, help="Processi del pool (default: tutti i core)")
+    parser.add_argument("--cartella", type=str, default="results/sweep")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Rigenera dataset e modelli invece di ricaricarli dalla cache")
+
+    args = parser.parse_args()
+
+    griglia = None
+    if args.griglia:
+        with open(args.griglia) as f:
+            griglia = json.load(f)
+
+    esegui_sweep(griglia, args.num_test, args.processi, args.cartella, args.seed, not args.no_cache)
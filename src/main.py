@@ -5,7 +5,8 @@ import numpy as np
 from src.core.grafo import crea_grafo_complesso, ottieni_posizioni_grafo_complesso
 from src.core.simulator import SimulatoreCosti, calcola_costi_statici
 from src.core.astar import RicercaAStar, euristica_nulla, euristica_distanza_euclidea, costo_statico_da_dizionario
-from src.ml.dataset import GeneratoreDataset, split_train_test
+from src.ml.dataset import split_train_test
+from src.ml.cache import CacheArtefatti
 from src.ml.modelli import (
     ModelloRegressioneLineare,
     ModelloRandomForest,
@@ -14,8 +15,13 @@ from src.ml.modelli import (
 from src.evaluation.metriche import CalcolatoreMetriche
 from src.visualization.visualizzatore_pygame import VisualizzatoreGrafo, crea_posizioni_grafo_complesso
 
+#Seed di dataset e modelli con --cache: fisso, così ogni esecuzione li ritrova nella cache
+SEED_ADDESTRAMENTO = 42
+
 #Demo
-def main():
+#usa_cache: dataset e modelli addestrati con SEED_ADDESTRAMENTO e ricaricati dalla cache,
+#il seed della demo vale solo per lo scenario; senza, si riaddestra ad ogni esecuzione con il seed della demo
+def main(usa_cache: bool = False):
 
     #Seed casuale, ogni esecuzione è diversa
     #Ogni volta che lancio la demo cambiano orario affollamento ed eventi casuali
@@ -38,17 +44,23 @@ def main():
 
     #Addestra ML
     print("\n2. Addestramento ML")
+    #Senza --cache non si scrive nulla su disco: con un seed diverso ad ogni esecuzione non ci sarebbero hit
+    cache = CacheArtefatti(attiva=usa_cache)
+    seed_addestramento = SEED_ADDESTRAMENTO if usa_cache else seed
+
     #Generazione Dataset che copre tutto
-    gen = GeneratoreDataset(grafo, sim)
-    X, y = gen.genera_stratificato(campioni_per_cella=30, seed=seed)
-    X_train, X_test, y_train, y_test = split_train_test(X, y, seed=seed)
+    X, y, chiave_dataset = cache.ottieni_dataset(grafo, sim, campioni_per_cella=30, seed=seed_addestramento)
+    X_train, X_test, y_train, y_test = split_train_test(X, y, seed=seed_addestramento)
+    chiave_dati = cache.chiave_split(chiave_dataset, 0.2, seed_addestramento)
 
     #Addestramento dei modelli
-    modello_lin = ModelloRegressioneLineare()
-    modello_lin.addestra(X_train, y_train)
+    modello_lin = cache.ottieni_modello(ModelloRegressioneLineare(), X_train, y_train, chiave_dati)
+    modello_rf = cache.ottieni_modello(ModelloRandomForest(seed=seed_addestramento), X_train, y_train, chiave_dati)
 
-    modello_rf = ModelloRandomForest(seed=seed)
-    modello_rf.addestra(X_train, y_train)
+    if usa_cache:
+        #Da qui in poi torna il seed della demo: scenario ed eventi cambiano ad ogni esecuzione
+        random.seed(seed)
+        np.random.seed(seed)
 
     metriche_ml = modello_rf.valuta(X_test, y_test)
     print(f"Modelli addestrati su {len(X)} campioni")
@@ -96,12 +108,13 @@ def main():
     print("\n6. Pianificazione con A*...")
 
     calcolatore = CalcolatoreMetriche(grafo, sim)
-    _, costo_ottimo = calcolatore.trova_percorso_ottimo_reale(start, goal, orario, affollamento)
+    scenario = calcolatore.crea_scenario(orario, affollamento)
+    costo_ottimo = scenario.costo_ottimo(start, goal)
 
     # STATICO (h=0)
     astar_statico = RicercaAStar(grafo, costo_statico_da_dizionario(costi_statici), euristica_nulla)
     ris_statico = astar_statico.pianifica(start, goal)
-    metr_statico = calcolatore.calcola_metriche_percorso(ris_statico, "statico", costo_ottimo, orario, affollamento)
+    metr_statico = calcolatore.calcola_metriche_percorso(ris_statico, "statico", costo_ottimo, orario, affollamento, scenario=scenario)
 
     # STATICO CON EURISTICA EUCLIDEA (h≠0)
     astar_euclidea = RicercaAStar(
@@ -111,20 +124,20 @@ def main():
     )
     ris_euclidea = astar_euclidea.pianifica(start, goal)
     metr_euclidea = calcolatore.calcola_metriche_percorso(
-        ris_euclidea, "statico_euclidea", costo_ottimo, orario, affollamento
+        ris_euclidea, "statico_euclidea", costo_ottimo, orario, affollamento, scenario=scenario
     )
 
     # ML LINEARE
     funzione_lin = crea_funzione_costo_ml_dinamica(modello_lin)(orario, affollamento)
     astar_lin = RicercaAStar(grafo, funzione_lin, euristica_nulla)
     ris_lin = astar_lin.pianifica(start, goal)
-    metr_lin = calcolatore.calcola_metriche_percorso(ris_lin, "ml_lineare", costo_ottimo, orario, affollamento)
+    metr_lin = calcolatore.calcola_metriche_percorso(ris_lin, "ml_lineare", costo_ottimo, orario, affollamento, scenario=scenario)
 
     # ML RANDOM FOREST
     funzione_rf_final = crea_funzione_costo_ml_dinamica(modello_rf)(orario, affollamento)
     astar_rf = RicercaAStar(grafo, funzione_rf_final, euristica_nulla)
     ris_rf = astar_rf.pianifica(start, goal)
-    metr_rf = calcolatore.calcola_metriche_percorso(ris_rf, "ml_rf", costo_ottimo, orario, affollamento)
+    metr_rf = calcolatore.calcola_metriche_percorso(ris_rf, "ml_rf", costo_ottimo, orario, affollamento, scenario=scenario)
 
     # 7. Risultati
     print("\n" + "=" * 70)
@@ -243,8 +256,17 @@ def main():
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Demo H.E.A.R.T")
+    parser.add_argument(
+        "--cache", action="store_true",
+        help="Addestra su un seed fisso e riusa dataset e modelli dalla cache (.cache/)"
+    )
+    args = parser.parse_args()
+
     try:
-        main()
+        main(usa_cache=args.cache)
     except KeyboardInterrupt:
         print("\n\nInterruzione. Arrivederci!")
     except Exception as e:
@@ -0,0 +1,179 @@
+#Modello di costo che impara in modo incrementale dalle percorrenze osservate
+#Le osservazioni arrivano a flusso, vengono raccolte in mini-batch e il modello viene aggiornato
+#in un thread separato: chi pianifica legge sempre l'ultima versione pubblicata senza aspettare
+#La standardizzazione si stima una volta (addestramento iniziale o primo batch) e poi resta fissa:
+#se si spostasse, i coefficienti già appresi varrebbero per una scala diversa da quella delle nuove feature
+import queue
+import threading
+import numpy as np
+from typing import Iterable, Tuple
+from sklearn.linear_model import SGDRegressor
+from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+
+from src.ml.modelli import ModelloCosto
+
+
+#Osservazione: (lunghezza, orario, affollamento, tipo, tempo) come gli argomenti del simulatore più il tempo misurato
+Osservazione = Tuple[float, int, float, str, float]
+
+
+class ModelloOnline(ModelloCosto):
+
+    def __init__(
+            self,
+            dimensione_batch: int = 256,  # osservazioni per aggiornamento
+            grado: int = 2,  # feature polinomiali: catturano l'effetto non lineare dell'affollamento
+            passo: float = 0.01,
+            seed: int = 42
+    ):
+        self.dimensione_batch = dimensione_batch
+        # Le feature polinomiali dipendono solo dal numero di colonne: fit una volta sola, poi solo transform
+        self._polinomio = PolynomialFeatures(degree=grado, include_bias=False).fit(np.zeros((1, 3)))
+        self._scalatore = StandardScaler()
+        self.modello = SGDRegressor(learning_rate="invscaling", eta0=passo, random_state=seed)
+
+        # Coefficienti pubblicati (media, scala, coefficienti, intercetta) usati per le stime,
+        # array in sola lettura sostituiti in un solo assegnamento
+        self._pubblicato = None
+        self._crea_sincronizzazione()
+
+        self.addestrato = False
+        self.versione = 0
+        self.campioni_visti = 0
+
+    #Lock, coda e thread non si copiano né si serializzano: ogni copia ha i propri, con il thread fermo
+    def _crea_sincronizzazione(self) -> None:
+        self._lock_aggiornamento = threading.Lock()  # un solo aggiornamento alla volta
+        self._lock_coda = threading.Lock()  # ingerisci e ferma non si sovrappongono
+        self._coda = queue.Queue()
+        self._thread = None
+        self._attivo = False
+
+    def __getstate__(self):
+        stato = self.__dict__.copy()
+        for nome in ("_lock_aggiornamento", "_lock_coda", "_coda", "_thread", "_attivo"):
+            del stato[nome]
+        return stato
+
+    def __setstate__(self, stato):
+        self.__dict__.update(stato)
+        self._crea_sincronizzazione()
+
+    #Righe di feature come quelle di GeneratoreDataset: il tipo non è una feature, come nei modelli offline
+    @staticmethod
+    def converti_osservazioni(osservazioni: Iterable[Osservazione]) -> Tuple[np.ndarray, np.ndarray]:
+        dati = np.array([(l, o, a, t) for l, o, a, _, t in osservazioni], dtype=float).reshape(-1, 4)
+        return dati[:, :3], dati[:, 3]
+
+    #Aggiorna il modello con un mini-batch e pubblica la nuova versione
+    def aggiorna(self, X: np.ndarray, y: np.ndarray) -> None:
+        if len(X) == 0:
+            return
+
+        with self._lock_aggiornamento:
+            X_poly = self._polinomio.transform(X)
+            # Senza addestramento iniziale la scala viene dal primo batch
+            if not hasattr(self._scalatore, "mean_"):
+                self._scalatore.fit(X_poly)
+            self.modello.partial_fit(self._scalatore.transform(X_poly), y)
+
+            # Le stime in corso continuano a usare i coefficienti precedenti
+            coefficienti = (
+                self._scalatore.mean_.copy(),
+                self._scalatore.scale_.copy(),
+                self.modello.coef_.copy(),
+                self.modello.intercept_.copy()
+            )
+            for array in coefficienti:
+                array.flags.writeable = False
+            self._pubblicato = coefficienti
+            self.campioni_visti += len(X)
+            self.versione += 1
+            self.addestrato = True
+
+    #Addestramento iniziale su un dataset (es. quello sintetico): più passate a mini-batch
+    #La scala si stima qui su tutto il dataset, se non è già stata fissata da un aggiornamento precedente
+    def addestra(self, X: np.ndarray, y: np.ndarray, epoche: int = 5):
+        with self._lock_aggiornamento:
+            if not hasattr(self._scalatore, "mean_"):
+                self._scalatore.fit(self._polinomio.transform(X))
+
+        rng = np.random.default_rng(self.modello.random_state)
+        for _ in range(epoche):
+            ordine = rng.permutation(len(X))
+            for inizio in range(0, len(X), self.dimensione_batch):
+                indici = ordine[inizio:inizio + self.dimensione_batch]
+                self.aggiorna(X[indici], y[indici])
+
+        print(f"\nModello online: {self.campioni_visti} campioni visti, versione {self.versione}")
+
+    def stima(self, lunghezza: float, orario: int, affollamento: float) -> float:
+        X = np.array([[lunghezza, orario, affollamento]])
+        return float(self.predici_batch(X)[0])
+
+    def predici_batch(self, X: np.ndarray) -> np.ndarray:
+        pubblicato = self._pubblicato  # una sola lettura: versione coerente anche durante un aggiornamento
+        if pubblicato is None:
+            raise RuntimeError("Modello non addestrato")
+
+        # Stesso calcolo di StandardScaler.transform e SGDRegressor.predict
+        media, scala, coefficienti, intercetta = pubblicato
+        X_scalato = (self._polinomio.transform(X) - media) / scala
+        return np.maximum(0.0, X_scalato @ coefficienti + intercetta[0])
+
+    #Accoda osservazioni senza bloccare: le elabora il thread di aggiornamento
+    #Senza thread avviato le osservazioni non verrebbero mai usate
+    def ingerisci(self, osservazioni: Iterable[Osservazione]) -> None:
+        with self._lock_coda:
+            if not self._attivo:
+                raise RuntimeError("Aggiornamento online non avviato: chiamare avvia() prima di ingerisci()")
+            for osservazione in osservazioni:
+                self._coda.put(osservazione)
+
+    #Avvia il thread che raccoglie mini-batch dalla coda
+    def avvia(self) -> None:
+        with self._lock_coda:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._ciclo_aggiornamento, daemon=True)
+            self._thread.start()
+            self._attivo = True
+
+    #Elabora quanto già in coda e ferma il thread
+    def ferma(self) -> None:
+        with self._lock_coda:
+            if self._thread is None:
+                return
+            self._attivo = False
+            self._coda.put(None)
+        self._thread.join()
+        self._thread = None
+
+    #Aspetta che tutte le osservazioni accodate siano state usate
+    def attendi(self) -> None:
+        self._coda.join()
+
+    def _ciclo_aggiornamento(self) -> None:
+        while True:
+            # Aspetta la prima osservazione, poi prende quelle già disponibili fino alla dimensione del batch
+            batch = [self._coda.get()]
+            while len(batch) < self.dimensione_batch:
+                try:
+                    batch.append(self._coda.get_nowait())
+                except queue.Empty:
+                    break
+
+            fine = batch[-1] is None
+            osservazioni = [o for o in batch if o is not None]
+            try:
+                if osservazioni:
+                    self.aggiorna(*self.converti_osservazioni(osservazioni))
+            finally:
+                for _ in batch:
+                    self._coda.task_done()
+
+            if fine:
+                return
+
+    def __str__(self):
+        return "Online SGD"
@@ -0,0 +1,159 @@
+#Cache su disco di dataset e modelli addestrati
+#Ogni artefatto è indirizzato dall'impronta (hash) di tutto ciò da cui dipende:
+#grafo, parametri del simulatore, impostazioni del dataset e iperparametri del modello
+#Oltre dimensione_massima si eliminano gli artefatti usati meno di recente
+import os
+import json
+import random
+import hashlib
+import joblib
+import numpy as np
+from typing import Tuple
+
+from src.ml.dataset import GeneratoreDataset
+
+
+# Da incrementare quando cambia il codice che genera gli artefatti, invalida la cache esistente
+VERSIONE_CACHE = 1
+
+CARTELLA_PREDEFINITA = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".cache"))
+
+DIMENSIONE_MASSIMA_PREDEFINITA = 2 * 1024 ** 3  # 2 GB
+
+# Parametri sklearn che non cambiano il modello addestrato
+PARAMETRI_ININFLUENTI = {"n_jobs", "verbose"}
+
+
+#Hash stabile di oggetti serializzabili in JSON
+def impronta(*oggetti) -> str:
+    testo = json.dumps(oggetti, sort_keys=True, default=str)
+    return hashlib.sha256(testo.encode("utf-8")).hexdigest()[:24]
+
+
+class CacheArtefatti:
+
+    #attiva=False: non legge e non scrive nulla, utile per confronti o per forzare la rigenerazione
+    #dimensione_massima: byte occupati dalla cartella dopo ogni scrittura (None: nessun limite)
+    def __init__(self, cartella: str = CARTELLA_PREDEFINITA, attiva: bool = True,
+                 dimensione_massima: int = DIMENSIONE_MASSIMA_PREDEFINITA):
+        self.cartella = cartella
+        self.attiva = attiva
+        self.dimensione_massima = dimensione_massima
+        self.hit = 0
+        self.miss = 0
+
+    def _percorso(self, tipo: str, chiave: str) -> str:
+        return os.path.join(self.cartella, f"{tipo}_{chiave}.joblib")
+
+    #Scrittura atomica: un processo interrotto non lascia file a metà
+    def _salva(self, oggetto, percorso: str) -> None:
+        os.makedirs(self.cartella, exist_ok=True)
+        temporaneo = f"{percorso}.{os.getpid()}.tmp"
+        joblib.dump(oggetto, temporaneo)
+        os.replace(temporaneo, percorso)
+        self._libera_spazio(percorso)
+
+    #Un hit aggiorna la data di modifica: l'eliminazione segue l'ultimo uso, non la creazione
+    def _segna_uso(self, percorso: str) -> None:
+        try:
+            os.utime(percorso)
+        except OSError:
+            pass
+
+    #Elimina gli artefatti usati meno di recente finché la cartella non rientra nel limite
+    #Il file appena scritto (mantieni) non viene mai eliminato
+    def _libera_spazio(self, mantieni: str) -> None:
+        if self.dimensione_massima is None:
+            return
+
+        artefatti = []
+        for nome in os.listdir(self.cartella):
+            if not nome.endswith(".joblib"):
+                continue
+            percorso = os.path.join(self.cartella, nome)
+            try:
+                info = os.stat(percorso)
+            except FileNotFoundError:  # eliminato da un altro processo
+                continue
+            artefatti.append((info.st_mtime, info.st_size, percorso))
+
+        occupati = sum(dimensione for _, dimensione, _ in artefatti)
+        for _, dimensione, percorso in sorted(artefatti):
+            if occupati <= self.dimensione_massima:
+                break
+            if percorso == mantieni:
+                continue
+            try:
+                os.remove(percorso)
+            except FileNotFoundError:
+                pass
+            occupati -= dimensione
+
+    #Restituisce il dataset stratificato (X, y) e la sua chiave
+    #In caso di hit ripristina anche lo stato dei generatori casuali dopo la generazione,
+    #così il resto dell'esperimento procede come se il dataset fosse stato rigenerato
+    def ottieni_dataset(self, grafo, simulatore, campioni_per_cella: int, seed: int,
+                        dtype=np.float64) -> Tuple[np.ndarray, np.ndarray, str]:
+
+        chiave = impronta(
+            "dataset", VERSIONE_CACHE,
+            grafo.ottieni_archi(), simulatore.parametri(),
+            campioni_per_cella, seed, np.dtype(dtype).name
+        )
+        percorso = self._percorso("dataset", chiave)
+
+        if self.attiva and os.path.exists(percorso):
+            self.hit += 1
+            self._segna_uso(percorso)
+            dati = joblib.load(percorso, mmap_mode="r")  # gli array restano su disco
+            random.setstate(dati["stato_random"])
+            np.random.set_state(dati["stato_numpy"])
+            print(f"Dataset caricato dalla cache ({chiave})")
+            return dati["X"], dati["y"], chiave
+
+        self.miss += 1
+        X, y = GeneratoreDataset(grafo, simulatore).genera_stratificato(
+            campioni_per_cella=campioni_per_cella,
+            seed=seed,
+            dtype=dtype
+        )
+
+        if self.attiva:
+            self._salva({
+                "X": X,
+                "y": y,
+                "stato_random": random.getstate(),
+                "stato_numpy": np.random.get_state()
+            }, percorso)
+
+        return X, y, chiave
+
+    #Chiave dei dati di addestramento: dataset più i parametri dello split
+    def chiave_split(self, chiave_dataset: str, test_size: float, seed: int) -> str:
+        return impronta("split", chiave_dataset, test_size, seed)
+
+    #Restituisce il modello addestrato su (X_train, y_train)
+    #modello: istanza non addestrata, i suoi iperparametri fanno parte della chiave
+    #chiave_dati: identifica X_train, y_train (vedi chiave_split)
+    def ottieni_modello(self, modello, X_train: np.ndarray, y_train: np.ndarray, chiave_dati: str):
+
+        parametri = {
+            nome: valore for nome, valore in modello.modello.get_params().items()
+            if nome not in PARAMETRI_ININFLUENTI
+        }
+        chiave = impronta("modello", VERSIONE_CACHE, type(modello).__name__, parametri, chiave_dati)
+        percorso = self._percorso("modello", chiave)
+
+        if self.attiva and os.path.exists(percorso):
+            self.hit += 1
+            self._segna_uso(percorso)
+            print(f"{modello} caricato dalla cache ({chiave})")
+            return joblib.load(percorso, mmap_mode="r")
+
+        self.miss += 1
+        modello.addestra(X_train, y_train)
+
+        if self.attiva:
+            self._salva(modello, percorso)
+
+        return modello
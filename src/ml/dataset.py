@@ -2,9 +2,27 @@
 
 
 #Serve a creare esempi per insegnare a un modello ML quanto tempi ci vuole per percorrere un corridoio
+import os
+import json
+import time
 import random
 import numpy as np
-from typing import List, Tuple, Literal
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple, Literal
+
+
+# Definizione strati
+FASCE_ORARIE = {
+    "notte": [0, 1, 2, 3, 4, 5, 6, 22, 23],
+    "giorno": [10, 11, 12, 13, 14, 15, 16],
+    "picco": [7, 8, 9, 17, 18, 19]
+}
+
+LIVELLI_AFFOLLAMENTO = {
+    "basso": (0.0, 0.3),
+    "medio": (0.3, 0.7),
+    "alto": (0.7, 1.0)
+}
 
 
 #Genera dati sintetici per addestrare il modello
@@ -18,59 +36,207 @@ class GeneratoreDataset:
 
 
 #Per evitare di addestrare il modello su dataset sbilanciati, genera dataset per coprire uniformemente lo spazio
-    def genera_stratificato(self,campioni_per_cella: int = 10,seed: int = None) -> Tuple[np.ndarray, np.ndarray]: #return (x,y)
+    #dtype: tipo degli array restituiti, np.float32 dimezza la memoria
+    def genera_stratificato(self,campioni_per_cella: int = 10,seed: int = None, dtype=np.float64) -> Tuple[np.ndarray, np.ndarray]: #return (x,y)
 
         #Rende l'esperimento riproducibile utilizzando lo stesso seed->stesso dataset
         if seed is not None:
             random.seed(seed)
             np.random.seed(seed)
 
-        X = [] #feature->[lunghezza,orario,affollamento]
-        y = [] #target-> tempo reale
+        X = [] #blocchi di feature->[lunghezza,orario,affollamento], uno per cella
+        y = [] #blocchi di target-> tempo reale
+
+        #Ogni tipo di corridoio, in ogni fascia oraria a ogni livello di affollamento
+        #ogni cella viene campionata in blocco invece che un campione alla volta
+        for tipo, lunghezze, ore, (aff_min, aff_max) in self._celle_stratificazione():
+            X_cella, y_cella = self._campiona_cella(
+                lunghezze, tipo, ore, aff_min, aff_max, campioni_per_cella, np.random
+            )
+            X.append(X_cella)
+            y.append(y_cella)
+
+        X = np.concatenate(X)
+        y = np.concatenate(y)
 
-        # Definizione strati
-        fasce_orarie = {
-            "notte": [0, 1, 2, 3, 4, 5, 6, 22, 23],
-            "giorno": [10, 11, 12, 13, 14, 15, 16],
-            "picco": [7, 8, 9, 17, 18, 19]
+        # Shuffle: serve per rompere l'ordine artificiale
+        #mantenendo la coppia feature+target
+        indices = np.random.permutation(len(X)) #scelgo l'ordine
+        return X[indices].astype(dtype, copy=False), y[indices].astype(dtype, copy=False) #mescolo x e y in base all'ordine scelto
+
+
+    #Genera il dataset stratificato distribuendo le celle su un pool di processi
+    #Ogni cella ha un proprio flusso casuale derivato dal seed (SeedSequence.spawn):
+    #il risultato è riproducibile e non dipende dal numero di processi
+    #Stampa e salva in self.statistiche_processi i campioni al secondo di ogni processo
+    def genera_stratificato_parallelo(self, campioni_per_cella: int = 10, seed: int = None,
+                                      num_processi: int = None, dtype=np.float64) -> Tuple[np.ndarray, np.ndarray]:
+
+        celle = self._celle_stratificazione()
+        # Un flusso per cella più uno per il mescolamento finale
+        flussi = np.random.SeedSequence(seed).spawn(len(celle) + 1)
+        compiti = [(cella, campioni_per_cella, flusso) for cella, flusso in zip(celle, flussi)]
+
+        inizio = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=num_processi, initializer=_inizializza_processo,
+                                 initargs=(self,)) as esecutore:
+            # map restituisce i risultati nell'ordine delle celle, qualunque processo li abbia calcolati
+            risultati = list(esecutore.map(_genera_cella, compiti))
+        tempo_totale = time.perf_counter() - inizio
+
+        X = np.concatenate([r[0] for r in risultati])
+        y = np.concatenate([r[1] for r in risultati])
+
+        # Statistiche per processo: campioni generati e tempo di lavoro
+        per_processo = {}
+        for _, y_cella, pid, secondi in risultati:
+            campioni, tempo = per_processo.get(pid, (0, 0.0))
+            per_processo[pid] = (campioni + len(y_cella), tempo + secondi)
+
+        self.statistiche_processi = {
+            "tempo_totale": tempo_totale,
+            "campioni_al_secondo": len(X) / tempo_totale if tempo_totale > 0 else 0.0,
+            "processi": {
+                pid: {
+                    "campioni": campioni,
+                    "tempo": tempo,
+                    "campioni_al_secondo": campioni / tempo if tempo > 0 else 0.0
+                }
+                for pid, (campioni, tempo) in per_processo.items()
+            }
         }
 
-        livelli_affollamento = {
-            "basso": (0.0, 0.3),
-            "medio": (0.3, 0.7),
-            "alto": (0.7, 1.0)
+        print(f"Dataset parallelo: {len(X)} campioni in {tempo_totale:.2f}s "
+              f"({self.statistiche_processi['campioni_al_secondo']:.0f} campioni/s)")
+        for pid, stat in self.statistiche_processi["processi"].items():
+            print(f"  Processo {pid}: {stat['campioni']} campioni, {stat['campioni_al_secondo']:.0f} campioni/s")
+
+        rng = np.random.default_rng(flussi[-1])
+        indices = rng.permutation(len(X))
+        return X[indices].astype(dtype, copy=False), y[indices].astype(dtype, copy=False)
+
+
+    #Versione in streaming di genera_stratificato per dataset che non stanno in memoria
+    #Restituisce blocchi (X, y) float32 di al massimo dimensione_blocco righe, mescolati
+    #I campioni sono ordinati a giri (un campione per cella a ogni giro) e tagliati in intervalli consecutivi:
+    #ogni blocco contiene una quota di ogni cella, o una fetta di celle se le celle sono più dei campioni di un blocco
+    def genera_a_blocchi(self, campioni_per_cella: int = 10, dimensione_blocco: int = 1_000_000,
+                         seed: int = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+
+        celle = self._celle_stratificazione()
+        totale = len(celle) * campioni_per_cella
+        num_blocchi = max(1, -(-totale // dimensione_blocco))  # divisione per eccesso
+
+        # Il campione globale g appartiene alla cella g % num_celle
+        # Campioni di ogni cella con indice globale minore di x
+        num_celle = len(celle)
+        indici_celle = np.arange(num_celle)
+
+        def campioni_prima_di(x: int) -> np.ndarray:
+            return np.maximum(0, -(-(x - indici_celle) // num_celle))
+
+        for b in range(num_blocchi):
+            inizio = b * dimensione_blocco
+            fine = min(totale, inizio + dimensione_blocco)
+            quote = campioni_prima_di(fine) - campioni_prima_di(inizio)
+
+            X_blocco = []
+            y_blocco = []
+            for (tipo, lunghezze, ore, (aff_min, aff_max)), quota in zip(celle, quote.tolist()):
+                if quota == 0:
+                    continue
+                X_cella, y_cella = self._campiona_cella(lunghezze, tipo, ore, aff_min, aff_max, quota, np.random)
+                X_blocco.append(X_cella)
+                y_blocco.append(y_cella)
+
+            X_blocco = np.concatenate(X_blocco).astype(np.float32)
+            y_blocco = np.concatenate(y_blocco).astype(np.float32)
+
+            indices = np.random.permutation(len(X_blocco))
+            yield X_blocco[indices], y_blocco[indices]
+
+
+    #Scrive il dataset in streaming su due file .npy preallocati (X: n x 3, y: n) in float32
+    #e un manifest con seed e parametri del simulatore per poterlo rigenerare
+    #Restituisce i due array come memmap in sola lettura
+    def scrivi_memmap(self, cartella: str, campioni_per_cella: int = 10, dimensione_blocco: int = 1_000_000,
+                      seed: int = None) -> Tuple[np.ndarray, np.ndarray]:
+
+        os.makedirs(cartella, exist_ok=True)
+
+        totale = len(self._celle_stratificazione()) * campioni_per_cella
+        X = np.lib.format.open_memmap(os.path.join(cartella, "X.npy"), mode="w+", dtype=np.float32, shape=(totale, 3))
+        y = np.lib.format.open_memmap(os.path.join(cartella, "y.npy"), mode="w+", dtype=np.float32, shape=(totale,))
+
+        # Ogni blocco viene scritto nella sua porzione del file e poi scartato
+        inizio = 0
+        for X_blocco, y_blocco in self.genera_a_blocchi(campioni_per_cella, dimensione_blocco, seed):
+            fine = inizio + len(X_blocco)
+            X[inizio:fine] = X_blocco
+            y[inizio:fine] = y_blocco
+            inizio = fine
+
+        X.flush()
+        y.flush()
+        del X, y
+
+        manifest = {
+            "num_campioni": totale,
+            "campioni_per_cella": campioni_per_cella,
+            "dimensione_blocco": dimensione_blocco,
+            "seed": seed,
+            "dtype": "float32",
+            "feature": ["lunghezza", "orario", "affollamento"],
+            "simulatore": self.simulatore.parametri(),
+            "stratificazione": {
+                "fasce_orarie": FASCE_ORARIE,
+                "livelli_affollamento": LIVELLI_AFFOLLAMENTO
+            },
+            "file": {"X": "X.npy", "y": "y.npy"}
         }
+        with open(os.path.join(cartella, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        X, y, _ = carica_memmap(cartella)
+        return X, y
+
+
+    #Celle della stratificazione: (tipo, lunghezze dei corridoi di quel tipo, ore della fascia, intervallo affollamento)
+    def _celle_stratificazione(self) -> List[Tuple[str, np.ndarray, np.ndarray, Tuple[float, float]]]:
 
         # Estrai archi raggruppati per tipo
         archi_per_tipo = self._raggruppa_archi_per_tipo()
 
-        #Ogni tipo di corridoio, in ogni fascia oraria a ogni livello di affollamento
+        celle = []
         for tipo, archi in archi_per_tipo.items():
-            for fascia_nome, ore in fasce_orarie.items():
-                for livello_nome, (aff_min, aff_max) in livelli_affollamento.items():
+            lunghezze = np.array([lunghezza for lunghezza, _ in archi], dtype=float)
+            for ore in FASCE_ORARIE.values():
+                for intervallo in LIVELLI_AFFOLLAMENTO.values():
+                    celle.append((tipo, lunghezze, np.array(ore), intervallo))
+        return celle
 
-                    for _ in range(campioni_per_cella):
-                        # Campiona da questa cella
-                        lunghezza, tipo_arco = random.choice(archi)
-                        orario = random.choice(ore)
-                        affollamento = random.uniform(aff_min, aff_max)
 
-                        #Impara dal simulatore
-                        tempo_reale = self.simulatore.tempo_percorrenza(
-                            lunghezza, orario, affollamento, tipo_arco
-                        )
+    #Campiona n esempi da una cella: archi, ore e affollamenti estratti come array
+    #e tempi reali calcolati con una sola chiamata al simulatore
+    #rng: generatore numpy (o il modulo np.random per usare lo stato globale)
+    def _campiona_cella(self, lunghezze: np.ndarray, tipo: str, ore: np.ndarray, aff_min: float, aff_max: float,
+                        n: int, rng) -> Tuple[np.ndarray, np.ndarray]:
 
-                        X.append([lunghezza, orario, affollamento])
-                        y.append(tempo_reale)
+        lunghezza = lunghezze[rng.choice(len(lunghezze), size=n)]
+        orario = rng.choice(ore, size=n)
+        affollamento = rng.uniform(aff_min, aff_max, n)
 
-        # Shuffle: serve per rompere l'ordine artificiale
-        #mantenendo la coppia feature+target
-        indices = np.arange(len(X))
-        np.random.shuffle(indices) #scelgo l'ordine
-        X = np.array(X)[indices] #mescolo x in base all'ordine scelto
-        y = np.array(y)[indices] #mescolo y in base all'ordine scelto
+        #Impara dal simulatore
+        tempo_reale = self.simulatore.tempo_percorrenza_batch(
+            lunghezza, orario, affollamento, tipo, rng=rng
+        )
 
-        return X, y
+        X = np.column_stack([lunghezza, orario, affollamento])
+        return X, tempo_reale
 
 
     #Estrae ogni corridoio una sola volta (lunghezza, tipo), evitando duplicazioni dovute alla bidirezionalità
@@ -110,6 +276,26 @@ class GeneratoreDataset:
 
 
 
+#Generatore condiviso dai processi del pool, inviato una sola volta per processo
+_generatore_processo = None
+
+
+def _inizializza_processo(generatore) -> None:
+    global _generatore_processo
+    _generatore_processo = generatore
+
+
+#Campiona una cella dentro un processo del pool con il suo flusso casuale
+def _genera_cella(compito):
+    (tipo, lunghezze, ore, (aff_min, aff_max)), campioni_per_cella, flusso = compito
+
+    inizio = time.perf_counter()
+    rng = np.random.default_rng(flusso)
+    X, y = _generatore_processo._campiona_cella(lunghezze, tipo, ore, aff_min, aff_max, campioni_per_cella, rng)
+    return X, y, os.getpid(), time.perf_counter() - inizio
+
+
+
 #Divide il dataset in due parti, il modello non vede i dati di test durante l'addestramento
  #il 20% dei dati va nel test
 def split_train_test( X: np.ndarray,y: np.ndarray, test_size: float = 0.2, seed: int = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
@@ -118,3 +304,24 @@ def split_train_test( X: np.ndarray,y: np.ndarray, test_size: float = 0.2, seed:
     return train_test_split(X, y, test_size=test_size, random_state=seed)#ottenere sempre la stessa divisione
 
 #Restituisce X_train,X_test, Y_train, y_test
+
+
+
+#Apre un dataset scritto con scrivi_memmap senza caricarlo in memoria
+#Restituisce X, y (memmap in sola lettura) e il manifest
+def carica_memmap(cartella: str) -> Tuple[np.ndarray, np.ndarray, dict]:
+    with open(os.path.join(cartella, "manifest.json"), "r") as f:
+        manifest = json.load(f)
+
+    X = np.load(os.path.join(cartella, manifest["file"]["X"]), mmap_mode="r")
+    y = np.load(os.path.join(cartella, manifest["file"]["y"]), mmap_mode="r")
+    return X, y, manifest
+
+
+#Come split_train_test ma divide per indice: le prime righe vanno nel train, le ultime nel test
+#Restituisce viste sugli array (anche memmap) senza copiarli
+#Va usato su dataset già mescolati, come quelli prodotti da genera_a_blocchi
+def split_train_test_per_indice(X: np.ndarray, y: np.ndarray, test_size: float = 0.2) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    num_test = int(np.ceil(len(X) * test_size))
+    num_train = len(X) - num_test
+    return X[:num_train], X[num_train:], y[:num_train], y[num_train:]
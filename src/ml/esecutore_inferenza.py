@@ -0,0 +1,128 @@
+#Esecutore di inferenza condiviso tra pianificatori concorrenti
+#Le richieste di stima di più thread (o task asyncio) vengono raccolte per una breve finestra
+#e servite con una sola predizione batch: il costo fisso di ogni chiamata al modello viene ammortizzato
+import time
+import queue
+import asyncio
+import threading
+import numpy as np
+from concurrent.futures import Future
+
+
+class EsecutoreInferenza:
+
+    #dimensione_massima_batch: richieste servite al massimo da una predizione
+    #attesa_massima: secondi di attesa di altre richieste dopo la prima di un batch
+    def __init__(self, modello, dimensione_massima_batch: int = 256, attesa_massima: float = 0.001):
+        self.modello = modello
+        self.dimensione_massima_batch = dimensione_massima_batch
+        self.attesa_massima = attesa_massima
+
+        self._coda = queue.Queue()
+        self._thread = None
+        # Accodamento e arresto sono esclusivi: nessuna richiesta finisce in coda dopo il segnale di fine
+        self._lock = threading.Lock()
+        self._attivo = False
+
+        # Statistiche
+        self.batch_eseguiti = 0
+        self.richieste_servite = 0
+
+    # Versione del modello servito, così CacheStime si invalida anche attraverso l'esecutore
+    @property
+    def versione(self):
+        return getattr(self.modello, "versione", 0)
+
+    def avvia(self) -> "EsecutoreInferenza":
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._ciclo, daemon=True)
+                self._thread.start()
+            self._attivo = True
+        return self
+
+    #Serve le richieste già in coda e ferma il thread
+    def ferma(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                return
+            self._attivo = False
+            self._coda.put(None)
+        self._thread.join()
+        self._thread = None
+
+        # Richieste rimaste in coda (es. thread terminato per un errore): non restano mai in attesa
+        while True:
+            try:
+                richiesta = self._coda.get_nowait()
+            except queue.Empty:
+                break
+            if richiesta is not None:
+                richiesta[1].set_exception(RuntimeError("Esecutore di inferenza fermato"))
+
+    def __enter__(self):
+        return self.avvia()
+
+    def __exit__(self, *eccezione):
+        self.ferma()
+
+    #Accoda una richiesta e restituisce il Future che riceverà la stima
+    #L'esecutore deve essere avviato: altrimenti nessuno risolverebbe il Future
+    def richiedi(self, lunghezza: float, orario: int, affollamento: float) -> Future:
+        futuro = Future()
+        with self._lock:
+            if not self._attivo:
+                raise RuntimeError("Esecutore di inferenza non avviato: chiamare avvia() o usare with")
+            self._coda.put(((lunghezza, orario, affollamento), futuro))
+        return futuro
+
+    #Stessa firma di ModelloCosto.stima: l'esecutore si può passare a crea_funzione_costo_ml_dinamica
+    def stima(self, lunghezza: float, orario: int, affollamento: float) -> float:
+        return self.richiedi(lunghezza, orario, affollamento).result()
+
+    #Versione per task asyncio
+    async def stima_async(self, lunghezza: float, orario: int, affollamento: float) -> float:
+        return await asyncio.wrap_future(self.richiedi(lunghezza, orario, affollamento))
+
+    #Le richieste già in forma di matrice non hanno bisogno di essere raccolte
+    def predici_batch(self, X: np.ndarray) -> np.ndarray:
+        return self.modello.predici_batch(X)
+
+    #Dimensione media dei batch eseguiti
+    def dimensione_media_batch(self) -> float:
+        return self.richieste_servite / self.batch_eseguiti if self.batch_eseguiti else 0.0
+
+    def _ciclo(self) -> None:
+        fine = False
+        while not fine:
+            primo = self._coda.get()
+            if primo is None:
+                return
+
+            # Raccoglie altre richieste fino alla dimensione massima o alla scadenza
+            batch = [primo]
+            scadenza = time.perf_counter() + self.attesa_massima
+            while len(batch) < self.dimensione_massima_batch:
+                restante = scadenza - time.perf_counter()
+                try:
+                    richiesta = self._coda.get(timeout=restante) if restante > 0 else self._coda.get_nowait()
+                except queue.Empty:
+                    break
+                if richiesta is None:
+                    fine = True
+                    break
+                batch.append(richiesta)
+
+            X = np.array([righe for righe, _ in batch], dtype=float)
+            try:
+                stime = self.modello.predici_batch(X)
+            except Exception as errore:
+                for _, futuro in batch:
+                    futuro.set_exception(errore)
+                continue
+
+            for (_, futuro), valore in zip(batch, stime):
+                futuro.set_result(float(valore))
+
+            self.batch_eseguiti += 1
+            self.richieste_servite += len(batch)
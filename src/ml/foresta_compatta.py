@@ -0,0 +1,96 @@
+#Versione compatta in float32 di una Random Forest addestrata, per l'inferenza
+#Tutti gli alberi vengono appiattiti in pochi array (figli int32, feature int8, soglie e valori float32)
+#e percorsi insieme con operazioni vettoriali su tutte le righe e tutti gli alberi
+import numpy as np
+
+from src.ml.modelli import ModelloCosto
+
+
+#Converte a float32 arrotondando verso il basso: per x float32 vale x <= s  <=>  x <= s32
+#così le decisioni degli alberi restano identiche a quelle di sklearn (che confronta X in float32)
+def _soglie_float32(soglie: np.ndarray) -> np.ndarray:
+    soglie32 = soglie.astype(np.float32)
+    troppo_alte = soglie32.astype(np.float64) > soglie
+    soglie32[troppo_alte] = np.nextafter(soglie32[troppo_alte], np.float32(-np.inf))
+    return soglie32
+
+
+class ForestaCompatta(ModelloCosto):
+
+    #modello_rf: ModelloRandomForest addestrato
+    def __init__(self, modello_rf, righe_per_blocco: int = 4096):
+        if not modello_rf.addestrato:
+            raise RuntimeError("Modello non addestrato")
+
+        self.righe_per_blocco = righe_per_blocco  # limita la matrice temporanea righe x alberi
+        alberi = [stimatore.tree_ for stimatore in modello_rf.modello.estimators_]
+
+        radici = []
+        sinistro, destro, feature, soglie, valori = [], [], [], [], []
+        scostamento = 0
+        for albero in alberi:
+            n = albero.node_count
+            foglie = albero.children_left < 0
+            indici = np.arange(n) + scostamento
+
+            # Le foglie puntano a se stesse: dopo la profondità massima ogni riga è su una foglia
+            sinistro.append(np.where(foglie, indici, albero.children_left + scostamento))
+            destro.append(np.where(foglie, indici, albero.children_right + scostamento))
+            feature.append(np.where(foglie, 0, albero.feature))
+            soglie.append(albero.threshold)
+            valori.append(albero.value[:, 0, 0])
+
+            radici.append(scostamento)
+            scostamento += n
+
+        self.radici = np.array(radici, dtype=np.int32)
+        self.sinistro = np.concatenate(sinistro).astype(np.int32)
+        self.destro = np.concatenate(destro).astype(np.int32)
+        self.feature = np.concatenate(feature).astype(np.int8)
+        self.soglie = _soglie_float32(np.concatenate(soglie))
+        self.valori = np.concatenate(valori).astype(np.float32)
+        self.profondita = max(albero.max_depth for albero in alberi)
+
+        self.addestrato = True
+        self.versione = getattr(modello_rf, "versione", 0)
+
+    def addestra(self, X: np.ndarray, y: np.ndarray):
+        raise RuntimeError("La foresta compatta si esporta da un ModelloRandomForest addestrato")
+
+    def stima(self, lunghezza: float, orario: int, affollamento: float) -> float:
+        X = np.array([[lunghezza, orario, affollamento]], dtype=np.float32)
+        return float(self.predici_batch(X)[0])
+
+    def predici_batch(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        risultato = np.empty(len(X), dtype=np.float32)
+
+        for inizio in range(0, len(X), self.righe_per_blocco):
+            blocco = X[inizio:inizio + self.righe_per_blocco]
+            righe = np.arange(len(blocco))[:, None]
+
+            # Un passo per livello: tutte le righe scendono di un nodo in tutti gli alberi
+            nodi = np.broadcast_to(self.radici, (len(blocco), len(self.radici)))
+            for _ in range(self.profondita):
+                valori_feature = blocco[righe, self.feature[nodi]]
+                nodi = np.where(valori_feature <= self.soglie[nodi], self.sinistro[nodi], self.destro[nodi])
+
+            risultato[inizio:inizio + len(blocco)] = self.valori[nodi].mean(axis=1)
+
+        return np.maximum(0.0, risultato)
+
+    #Memoria degli array di inferenza in byte
+    def memoria(self) -> int:
+        return sum(a.nbytes for a in (self.radici, self.sinistro, self.destro, self.feature, self.soglie, self.valori))
+
+    def __str__(self):
+        return "Random Forest compatta (float32)"
+
+
+#Memoria occupata dagli alberi sklearn (nodi float64 e valori) in byte
+def memoria_foresta_sklearn(modello_rf) -> int:
+    totale = 0
+    for stimatore in modello_rf.modello.estimators_:
+        stato = stimatore.tree_.__getstate__()
+        totale += stato["nodes"].nbytes + stato["values"].nbytes
+    return totale
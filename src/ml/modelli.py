@@ -1,7 +1,15 @@
 #Modelli di ML per stimare il tempo di percorrenza di un corridoio
+import io
+import os
+import sys
+import time
+import contextlib
 import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from threadpoolctl import threadpool_limits
 from sklearn.linear_model import LinearRegression #implementazioni pronte di Ml
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score #valutare quando sbaglia il modello
 
 
@@ -20,7 +28,13 @@ class ModelloCosto:
     def stima(self, lunghezza: float, orario: int, affollamento: float) -> float:
         raise NotImplementedError
 
+    #Ogni modello stima molti corridoi con una sola chiamata al modello sottostante
+    #x->matrice con righe (lunghezza, orario, affollamento), tempi negativi portati a 0
+    def predici_batch(self, X: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
     #Capire quanto bene il modello predice sui dati che non ha visto durante l'addestramento
+    #Una sola predizione su tutto il set
     def valuta(self, X: np.ndarray, y: np.ndarray) -> dict:
         y_pred = self.predici_batch(X)
 
@@ -39,14 +53,6 @@ class ModelloCosto:
             "mape": mape,
         }
 
-
-#x->lunghezza orario e affollamento
-    def predici_batch(self, X: np.ndarray) -> np.ndarray:
-        return np.array([
-            self.stima(x[0], x[1], x[2]) for x in X
-        ])
-        #per ogni riga del dataset prende lunghezza orario e affollamento e chiama stima che restituisce il tempo stimato
-
 #Modello regressione lineare, eredita da modello costo
 class ModelloRegressioneLineare(ModelloCosto):
 
@@ -54,6 +60,7 @@ class ModelloRegressioneLineare(ModelloCosto):
     def __init__(self):
         self.modello = LinearRegression() #modello
         self.addestrato = False #Finchè non chiamo addestra non può stimare
+        self.versione = 0 #Incrementata ad ogni addestramento, invalida le stime in cache
 
 
     #Addestra il modello
@@ -62,6 +69,7 @@ class ModelloRegressioneLineare(ModelloCosto):
 
         self.modello.fit(X, y) #impara i coefficienti
         self.addestrato = True
+        self.versione += 1
 
         # Stampa coefficienti
         print("\nCoefficienti Regressione Lineare:")
@@ -72,11 +80,15 @@ class ModelloRegressioneLineare(ModelloCosto):
 
   # Prende un solo corridoio e definisce un tempo stimato, usa il modello
     def stima(self, lunghezza: float, orario: int, affollamento: float) -> float:
+        X = np.array([[lunghezza, orario, affollamento]])
+        return float(self.predici_batch(X)[0])
+
+    #Tutte le righe con una sola predict
+    def predici_batch(self, X: np.ndarray) -> np.ndarray:
         if not self.addestrato:
             raise RuntimeError("Modello non addestrato")
 
-        X = np.array([[lunghezza, orario, affollamento]])
-        return max(0.0, self.modello.predict(X)[0]) #restituisce un array tempo
+        return np.maximum(0.0, self.modello.predict(X)) #restituisce un array di tempi
 
     def __str__(self):
         return "Regressione Lineare"
@@ -89,15 +101,19 @@ class ModelloRandomForest(ModelloCosto):
             self,
             numero_alberi: int = 100, # più alberi più accuratezza ma più costo
             profondita_massima: int = None,
-            seed: int = 42
+            seed: int = 42,
+            min_campioni_foglia: int = 1,  # foglie più grandi: alberi più piccoli e più veloci
+            n_jobs: int = -1  # -1 usa tutti i core della CPU
     ):
         self.modello = RandomForestRegressor(
             n_estimators=numero_alberi,
             max_depth=profondita_massima,
+            min_samples_leaf=min_campioni_foglia,
             random_state=seed,
-            n_jobs=-1  # Usa tutti i core della CPU
+            n_jobs=n_jobs
         )
         self.addestrato = False
+        self.versione = 0
         self.feature_importances_ = None
 
 
@@ -107,6 +123,7 @@ class ModelloRandomForest(ModelloCosto):
 
         self.modello.fit(X, y)
         self.addestrato = True
+        self.versione += 1
 
         # Salva feature importance
         self.feature_importances_ = self.modello.feature_importances_
@@ -120,47 +137,170 @@ class ModelloRandomForest(ModelloCosto):
 
     #Questa è la funzione che A* chiama
     def stima(self, lunghezza: float, orario: int, affollamento: float) -> float:
+        X = np.array([[lunghezza, orario, affollamento]])
+        return float(self.predici_batch(X)[0]) #stima del costo
+
+    #Tutte le righe con una sola predict: gli alberi vengono percorsi una volta per l'intera matrice
+    def predici_batch(self, X: np.ndarray) -> np.ndarray:
         if not self.addestrato:
             raise RuntimeError("Modello non addestrato")
 
-        X = np.array([[lunghezza, orario, affollamento]])
-        return max(0.0, self.modello.predict(X)[0]) #stima del costo, predict restituisce un array
+        return np.maximum(0.0, self.modello.predict(X))
 
     def __str__(self):
         return "Random Forest"
 
 
 
+#Modello Gradient Boosting a istogrammi
+#Le feature vengono discretizzate in bin e gli alberi sono poco profondi: predizione molto più economica della Random Forest
+class ModelloGradientBoosting(ModelloCosto):
+
+    def __init__(
+            self,
+            numero_iterazioni: int = 200,  # alberi aggiunti in sequenza
+            tasso_apprendimento: float = 0.1,
+            foglie_massime: int = 31,
+            profondita_massima: int = None,
+            seed: int = 42
+    ):
+        self.modello = HistGradientBoostingRegressor(
+            max_iter=numero_iterazioni,
+            learning_rate=tasso_apprendimento,
+            max_leaf_nodes=foglie_massime,
+            max_depth=profondita_massima,
+            random_state=seed
+        )
+        self.addestrato = False
+        self.versione = 0
+
+    def addestra(self, X: np.ndarray, y: np.ndarray):
+
+        self.modello.fit(X, y)
+        self.addestrato = True
+        self.versione += 1
+
+        print(f"\nGradient Boosting: {self.modello.n_iter_} iterazioni")
+
+    def stima(self, lunghezza: float, orario: int, affollamento: float) -> float:
+        X = np.array([[lunghezza, orario, affollamento]])
+        return float(self.predici_batch(X)[0])
+
+    def predici_batch(self, X: np.ndarray) -> np.ndarray:
+        if not self.addestrato:
+            raise RuntimeError("Modello non addestrato")
+
+        return np.maximum(0.0, self.modello.predict(X))
+
+    def __str__(self):
+        return "Gradient Boosting"
+
+
+
+#Dati condivisi dai processi di confronta_modelli, inviati una sola volta per processo
+_dati_processo = None
+
+
+def _inizializza_processo(dati) -> None:
+    global _dati_processo
+    _dati_processo = dati
+
+
+#Addestra e valuta un modello misurando i tempi di ogni fase
+#thread_per_modello limita i thread interni del modello (n_jobs e OpenMP) per non sovraccaricare la CPU
+#Le stampe vengono raccolte e restituite, così il processo principale le mostra in ordine
+def _addestra_e_valuta(modello, thread_per_modello: int):
+    X_train, y_train, X_test, y_test, cache, chiave_dati = _dati_processo
+
+    uscita = io.StringIO()
+    with contextlib.redirect_stdout(uscita), threadpool_limits(limits=thread_per_modello):
+
+        # n_jobs ridotto solo per l'addestramento, poi torna quello configurato anche in caso di errore
+        # Con un hit della cache il modello restituito è un altro oggetto: si ripristinano entrambi
+        originale = modello
+        n_jobs_originale = modello.modello.get_params().get("n_jobs")
+        if n_jobs_originale is not None:
+            modello.modello.set_params(n_jobs=thread_per_modello)
+
+        try:
+            # Addestra
+            print("Addestramento...")
+            inizio = time.perf_counter()
+            if cache is not None:
+                modello = cache.ottieni_modello(modello, X_train, y_train, chiave_dati)
+            else:
+                modello.addestra(X_train, y_train)
+            tempo_addestramento = time.perf_counter() - inizio
+
+            # Valuta su train e su test
+            inizio = time.perf_counter()
+            metriche_train = modello.valuta(X_train, y_train)
+            tempo_valutazione_train = time.perf_counter() - inizio
+
+            inizio = time.perf_counter()
+            metriche_test = modello.valuta(X_test, y_test)
+            tempo_valutazione_test = time.perf_counter() - inizio
+        finally:
+            if n_jobs_originale is not None:
+                originale.modello.set_params(n_jobs=n_jobs_originale)
+                modello.modello.set_params(n_jobs=n_jobs_originale)
+
+    tempi = {
+        "addestramento": tempo_addestramento,
+        "valutazione_train": tempo_valutazione_train,
+        "valutazione_test": tempo_valutazione_test
+    }
+    return modello, metriche_train, metriche_test, tempi, uscita.getvalue()
+
+
 #input lista modelli usati, dati su cui il modello impara, dati di test
-def confronta_modelli(modelli: list,X_train: np.ndarray,y_train: np.ndarray, X_test: np.ndarray,y_test: np.ndarray
+#cache (opzionale): CacheArtefatti da cui recuperare i modelli già addestrati su chiave_dati
+#num_processi: modelli addestrati contemporaneamente (default: uno per modello, al massimo uno per core)
+#num_core: core a disposizione (default: tutti); chi è già in un processo di un pool (es. uno sweep)
+#passa num_processi=1 e i propri core, così non si apre un secondo pool dentro il primo
+def confronta_modelli(modelli: list,X_train: np.ndarray,y_train: np.ndarray, X_test: np.ndarray,y_test: np.ndarray,
+                      cache=None, chiave_dati: str = None, num_processi: int = None, num_core: int = None
 ):
-#Dizionario->nome modello, metriche
+#Dizionario->nome modello, metriche, modello addestrato e tempi
 
     print("=" * 70)
     print("CONFRONTO MODELLI ML")
     print("=" * 70)
 
+    num_core = num_core or os.cpu_count() or 1
+    if num_processi is None:
+        num_processi = min(len(modelli), num_core)
+    # I core vengono divisi tra i modelli addestrati insieme
+    thread_per_modello = max(1, num_core // num_processi)
+
+    dati = (X_train, y_train, X_test, y_test, cache, chiave_dati)
+    inizio = time.perf_counter()
+
+    if num_processi <= 1:
+        _inizializza_processo(dati)
+        esiti = [_addestra_e_valuta(modello, thread_per_modello) for modello in modelli]
+    else:
+        with ProcessPoolExecutor(max_workers=num_processi, initializer=_inizializza_processo,
+                                 initargs=(dati,)) as esecutore:
+            futuri = [esecutore.submit(_addestra_e_valuta, modello, thread_per_modello) for modello in modelli]
+            esiti = [futuro.result() for futuro in futuri]
+
+    tempo_totale = time.perf_counter() - inizio
+
     risultati = {}
 
-    for modello in modelli:
+    for modello, metriche_train, metriche_test, tempi, uscita in esiti:
         nome = str(modello)
         print(f"\n{nome}:")
         print("-" * 70)
+        print(uscita, end="")
 
-        # Addestra
-        print("Addestramento...")
-        modello.addestra(X_train, y_train)
-
-        # Valuta su train
-        metriche_train = modello.valuta(X_train, y_train)
         print(f"\nPrestazioni su TRAIN set:")
         print(f"  MAE:  {metriche_train['mae']:.3f}s")
         print(f"  RMSE: {metriche_train['rmse']:.3f}s")
         print(f"  R²:   {metriche_train['r2']:.3f}")
         print(f"  MAPE: {metriche_train['mape']:.1f}%")
 
-        # Valuta su test
-        metriche_test = modello.valuta(X_test, y_test)
         print(f"\nPrestazioni su TEST set:")
         print(f"  MAE:  {metriche_test['mae']:.3f}s")
         print(f"  RMSE: {metriche_test['rmse']:.3f}s")
@@ -171,7 +311,8 @@ def confronta_modelli(modelli: list,X_train: np.ndarray,y_train: np.ndarray, X_t
         risultato = {
             "metriche_train": metriche_train,
             "metriche_test": metriche_test,
-            "modello": modello
+            "modello": modello,
+            "tempi": tempi
         }
 
         # Aggiungi feature importance se Random Forest
@@ -194,13 +335,93 @@ def confronta_modelli(modelli: list,X_train: np.ndarray,y_train: np.ndarray, X_t
         m = res['metriche_test']
         print(f"{nome:<30} {m['mae']:<10.3f} {m['rmse']:<10.3f} {m['r2']:<10.3f} {m['mape']:<10.1f}%")
 
+    print(f"\nTempi ({num_processi} processi, {thread_per_modello} thread per modello, totale {tempo_totale:.2f}s):")
+    for nome, res in risultati.items():
+        t = res['tempi']
+        print(f"  {nome:<28} addestramento {t['addestramento']:.3f}s, "
+              f"valutazione {t['valutazione_train'] + t['valutazione_test']:.3f}s")
+
     return risultati
 
 
 
+#Memoria limitata delle stime di un modello, condivisa tra tutte le query
+#Chiave: (lunghezza, orario, affollamento quantizzato), quando è piena scarta la stima usata meno di recente
+#Se il modello viene riaddestrato (cambia la versione) la memoria viene svuotata
+class CacheStime:
+
+    def __init__(self, modello: ModelloCosto, dimensione_massima: int = 100_000, quantizzazione: float = 0.0):
+        #quantizzazione: passo a cui arrotondare l'affollamento (0 = nessun arrotondamento)
+        self.modello = modello
+        self.dimensione_massima = dimensione_massima
+        self.quantizzazione = quantizzazione
+
+        self._stime = OrderedDict()
+        self._versione = getattr(modello, "versione", 0)
+
+        self.hit = 0
+        self.miss = 0
+        self.invalidazioni = 0
+
+    def stima(self, lunghezza: float, orario: int, affollamento: float) -> float:
+        versione = getattr(self.modello, "versione", 0)
+        if versione != self._versione:
+            self.svuota()
+            self._versione = versione
+            self.invalidazioni += 1
+
+        if self.quantizzazione > 0:
+            affollamento = round(round(affollamento / self.quantizzazione) * self.quantizzazione, 10)
+
+        chiave = (lunghezza, orario, affollamento)
+        valore = self._stime.get(chiave)
+        if valore is not None:
+            self.hit += 1
+            self._stime.move_to_end(chiave)
+            return valore
+
+        self.miss += 1
+        valore = self.modello.stima(lunghezza, orario, affollamento)
+        self._stime[chiave] = valore
+        if len(self._stime) > self.dimensione_massima:
+            self._stime.popitem(last=False)
+        return valore
+
+    def svuota(self) -> None:
+        self._stime.clear()
+
+    #Hit rate e memoria occupata (stima in byte di dizionario, chiavi e valori)
+    def statistiche(self) -> dict:
+        richieste = self.hit + self.miss
+        memoria = sys.getsizeof(self._stime) + sum(
+            sys.getsizeof(chiave) + sum(sys.getsizeof(c) for c in chiave) + sys.getsizeof(valore)
+            for chiave, valore in self._stime.items()
+        )
+        return {
+            "hit": self.hit,
+            "miss": self.miss,
+            "hit_rate": self.hit / richieste if richieste else 0.0,
+            "voci": len(self._stime),
+            "memoria_byte": memoria,
+            "invalidazioni": self.invalidazioni
+        }
+
+    def __str__(self):
+        s = self.statistiche()
+        return (f"Cache stime: {s['hit_rate'] * 100:.1f}% hit ({s['hit']}/{s['hit'] + s['miss']}), "
+                f"{s['voci']} voci, {s['memoria_byte'] / 1024:.1f} KB")
+
+
+
 #Funge da ponte tra A* e il modello
 #Riceve un modello Ml già addestrato
-def crea_funzione_costo_ml_dinamica(modello: ModelloCosto):
+#cache (opzionale): CacheStime dello stesso modello, riusata da tutte le funzioni costo create
+def crea_funzione_costo_ml_dinamica(modello: ModelloCosto, cache: CacheStime = None):
+
+    if cache is not None and cache.modello is not modello:
+        raise ValueError("La cache appartiene a un altro modello")
+
+    stima = cache.stima if cache is not None else modello.stima
 
 
 #Factory per funzione costo che accetta parametri dinamici.
@@ -215,8 +436,65 @@ def crea_funzione_costo_ml_dinamica(modello: ModelloCosto):
             else:
                 aff_eff = affollamento
             #usa il modello addestrato
-            return modello.stima(lunghezza, orario, aff_eff)
+            return stima(lunghezza, orario, aff_eff)
+
+        return funzione_costo
+
+    return factory
+
+#Stima di un insieme di archi con una sola predici_batch
+#affollamenti: scalare o un valore per arco, aggiustato per tipo di corridoio come in crea_funzione_costo_ml_dinamica
+def stima_costi_archi(modello: ModelloCosto, lunghezze: np.ndarray, tipi: np.ndarray, orario: int,
+                      affollamenti) -> np.ndarray:
+    aff_eff = np.broadcast_to(np.asarray(affollamenti, dtype=float), lunghezze.shape).copy()
+    centrali = tipi == "centrale"
+    isolati = tipi == "isolato"
+    aff_eff[centrali] = np.minimum(1.0, aff_eff[centrali] + 0.3)
+    aff_eff[isolati] = np.maximum(0.0, aff_eff[isolati] - 0.3)
+
+    X = np.column_stack([lunghezze, np.full(len(lunghezze), orario, dtype=float), aff_eff])
+    return modello.predici_batch(X)
+
+
+#Come crea_funzione_costo_ml_dinamica, ma per ogni contesto stima tutti gli archi del grafo
+#con una sola predici_batch; A* legge poi i costi da un dizionario
+#La chiave è il contesto esatto (orario, affollamento): tutte le ricerche dello stesso contesto,
+#es. tutte le coppie di un test, leggono la stessa tabella. Tra test diversi l'affollamento cambia,
+#quindi conviene tenere in memoria più contesti solo se chi pianifica torna su contesti già visti
+def crea_funzione_costo_ml_batch(modello: ModelloCosto, grafo, contesti_in_memoria: int = 1):
+
+    archi = grafo.ottieni_archi()
+    chiavi = [(n1, n2) for n1, n2, _, _ in archi]
+    lunghezze = np.array([lunghezza for _, _, lunghezza, _ in archi], dtype=float)
+    tipi = np.array([tipo for _, _, _, tipo in archi])
+
+    costi_per_contesto = OrderedDict()
+    versione = [getattr(modello, "versione", 0)]
+
+    def costi_archi(orario: int, affollamento: float) -> dict:
+        # Modello riaddestrato: i costi calcolati non valgono più
+        if getattr(modello, "versione", 0) != versione[0]:
+            costi_per_contesto.clear()
+            versione[0] = getattr(modello, "versione", 0)
+
+        contesto = (orario, affollamento)
+        if contesto in costi_per_contesto:
+            costi_per_contesto.move_to_end(contesto)
+            return costi_per_contesto[contesto]
+
+        costi = dict(zip(chiavi, stima_costi_archi(modello, lunghezze, tipi, orario, affollamento).tolist()))
+
+        costi_per_contesto[contesto] = costi
+        if len(costi_per_contesto) > contesti_in_memoria:
+            costi_per_contesto.popitem(last=False)
+        return costi
+
+    def factory(orario: int, affollamento: float):
+        costi = costi_archi(orario, affollamento)
+
+        def funzione_costo(n1: str, n2: str, lunghezza: float, tipo: str) -> float:
+            return costi[(n1, n2) if n1 < n2 else (n2, n1)]
 
         return funzione_costo
 
-    return factory
\ No newline at end of file
+    return factory
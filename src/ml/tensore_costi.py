@@ -0,0 +1,106 @@
+#Costi ML precalcolati per un grafo e un modello fissati
+#Il costo stimato di un arco dipende solo da orario (24 valori) e affollamento:
+#si valuta il modello una volta su archi x ore x livelli di affollamento e A* legge la tabella
+import os
+import json
+import numpy as np
+from typing import Dict, List, Tuple
+
+
+class TensoreCosti:
+
+    #num_livelli: livelli di affollamento equispaziati in [0, 1], tra due livelli si interpola
+    def __init__(self, grafo, modello=None, num_livelli: int = 21):
+        self.grafo = grafo
+        self.modello = modello
+        self.livelli = np.linspace(0.0, 1.0, num_livelli)
+
+        # Ordine degli archi nella prima dimensione del tensore
+        self.archi = grafo.ottieni_archi()
+        self.chiavi: List[Tuple[str, str]] = [(n1, n2) for n1, n2, _, _ in self.archi]
+        self.indice: Dict[Tuple[str, str], int] = {chiave: i for i, chiave in enumerate(self.chiavi)}
+
+        self.costi: np.ndarray = None  # float32 (archi, 24, livelli)
+
+    #Valuta il modello su tutte le combinazioni con una sola predizione
+    def costruisci(self) -> np.ndarray:
+        if self.modello is None:
+            raise RuntimeError("Serve un modello per costruire il tensore")
+
+        num_archi = len(self.archi)
+        num_livelli = len(self.livelli)
+
+        lunghezze = np.array([lunghezza for _, _, lunghezza, _ in self.archi], dtype=float)
+
+        # Affollamento effettivo per arco e livello, come in crea_funzione_costo_ml_dinamica
+        affollamenti = np.empty((num_archi, num_livelli))
+        for i, (_, _, _, tipo) in enumerate(self.archi):
+            if tipo == "centrale":
+                affollamenti[i] = np.minimum(1.0, self.livelli + 0.3)
+            elif tipo == "isolato":
+                affollamenti[i] = np.maximum(0.0, self.livelli - 0.3)
+            else:
+                affollamenti[i] = self.livelli
+
+        forma = (num_archi, 24, num_livelli)
+        X = np.column_stack([
+            np.broadcast_to(lunghezze[:, None, None], forma).ravel(),
+            np.broadcast_to(np.arange(24)[None, :, None], forma).ravel(),
+            np.broadcast_to(affollamenti[:, None, :], forma).ravel()
+        ])
+
+        self.costi = self.modello.predici_batch(X).reshape(forma).astype(np.float32)
+        return self.costi
+
+    #Costo di tutti gli archi per un contesto, interpolando linearmente tra i livelli di affollamento
+    def costi_contesto(self, orario: int, affollamento: float) -> np.ndarray:
+        posizione = min(max(affollamento, 0.0), 1.0) * (len(self.livelli) - 1)
+        i = min(int(posizione), len(self.livelli) - 2)
+        peso = posizione - i
+
+        fetta = self.costi[:, orario]
+        return fetta[:, i] * (1.0 - peso) + fetta[:, i + 1] * peso
+
+    #Stessa interfaccia di crea_funzione_costo_ml_dinamica: factory(orario, affollamento) -> funzione_costo
+    #il lavoro per contesto è un'interpolazione vettoriale, per arco una lettura da dizionario
+    def crea_funzione_costo(self):
+        if self.costi is None:
+            raise RuntimeError("Tensore non costruito")
+
+        def factory(orario: int, affollamento: float):
+            costi = dict(zip(self.chiavi, self.costi_contesto(orario, affollamento).tolist()))
+
+            def funzione_costo(n1: str, n2: str, lunghezza: float, tipo: str) -> float:
+                return costi[(n1, n2) if n1 < n2 else (n2, n1)]
+
+            return funzione_costo
+
+        return factory
+
+    #Salva il tensore (costi.npy) e la descrizione di archi e livelli (manifest.json)
+    def salva(self, cartella: str) -> None:
+        os.makedirs(cartella, exist_ok=True)
+        np.save(os.path.join(cartella, "costi.npy"), self.costi)
+
+        manifest = {
+            "modello": str(self.modello),
+            "versione_modello": getattr(self.modello, "versione", 0),
+            "forma": list(self.costi.shape),
+            "livelli": self.livelli.tolist(),
+            "archi": [list(chiave) for chiave in self.chiavi]
+        }
+        with open(os.path.join(cartella, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    #Ricarica un tensore salvato, di default mappato in memoria (sola lettura)
+    @classmethod
+    def carica(cls, cartella: str, grafo, mmap: bool = True) -> "TensoreCosti":
+        with open(os.path.join(cartella, "manifest.json"), "r") as f:
+            manifest = json.load(f)
+
+        tensore = cls(grafo, modello=None, num_livelli=len(manifest["livelli"]))
+        if [list(chiave) for chiave in tensore.chiavi] != manifest["archi"]:
+            raise ValueError("Il tensore salvato è stato costruito per un altro grafo")
+
+        tensore.costi = np.load(os.path.join(cartella, "costi.npy"), mmap_mode="r" if mmap else None)
+        return tensore